@@ -2,7 +2,6 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import json
-import time
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import logging
@@ -13,6 +12,10 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_INTERACTIVE
+from model_code_index import parse_model_codes
+from debug_artifacts import get_debug_store
 
 app = Flask(__name__)
 CORS(app)
@@ -25,6 +28,10 @@ class DeviceInfoScraper:
     def __init__(self):
         self.base_url = "https://www.gsmarena.com"
         self.session = requests.Session()
+        self.transport = get_transport()
+        self.transport.mount(self.session)
+        # 实时查询：与批量导入共用按主机限速，优先放行
+        self.scheduler = get_scheduler()
         # 设置更真实的请求头
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -54,7 +61,7 @@ class DeviceInfoScraper:
             chrome_options.add_argument('--window-size=1920,1080')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = self.transport.create_driver(lambda: webdriver.Chrome(options=chrome_options))
             self.driver.set_page_load_timeout(30)
             logger.info("Selenium WebDriver 初始化成功")
         except Exception as e:
@@ -72,6 +79,7 @@ class DeviceInfoScraper:
             logger.info(f"搜索设备: {search_url}")
             
             # 使用Selenium访问页面
+            self.scheduler.wait(search_url, PRIORITY_INTERACTIVE)
             self.driver.get(search_url)
             
             # 等待JavaScript解密内容
@@ -84,7 +92,7 @@ class DeviceInfoScraper:
                 )
                 
                 # 再等待一下确保内容完全加载
-                time.sleep(2)
+                self.transport.pause(2)
                 
                 # 检查是否有实际内容
                 decrypted_content = decrypted_element.get_attribute('innerHTML')
@@ -159,6 +167,7 @@ class DeviceInfoScraper:
         try:
             logger.info(f"获取设备详情: {device_url}")
             
+            self.scheduler.wait(device_url, PRIORITY_INTERACTIVE)
             response = self.session.get(device_url, timeout=10)
             response.raise_for_status()
             
@@ -223,6 +232,7 @@ class DeviceInfoScraper:
                             elif 'Models' in cell_text and i + 1 < len(cell_texts):
                                 models_info = cell_texts[i + 1]
                                 device_info['model_code'] = models_info
+                                device_info['model_codes'] = parse_model_codes(models_info)
                         
                         # 存储所有规格到specifications字典
                         if len(cell_texts) >= 2:
@@ -250,6 +260,7 @@ class DeviceInfoScraper:
                 for key, value in device_info['specifications'].items():
                     if 'model' in key.lower():
                         device_info['model_code'] = value
+                        device_info['model_codes'] = parse_model_codes(value)
                         break
             
             logger.info(f"设备信息提取完成: {device_name}")
@@ -312,6 +323,7 @@ class DeviceInfoScraper:
                     'search_model': model_code,
                     'device_name': device_details['name'],
                     'model_code': device_details['model_code'],
+                    'model_codes': device_details.get('model_codes', []),
                     'announced_date': device_details['announced_date'],
                     'release_date': device_details['release_date'],
                     'price': device_details['price'],
@@ -408,7 +420,7 @@ if __name__ == '__main__':
             logger.info(f"搜索设备: {search_url}")
             
             # 添加更多的请求头和延迟
-            time.sleep(1)  # 添加延迟避免被封
+            self.transport.pause(1)  # 添加延迟避免被封
             
             response = self.session.get(search_url, timeout=10)
             response.raise_for_status()
@@ -451,10 +463,8 @@ if __name__ == '__main__':
             
             if not device_links:
                 logger.warning(f"未找到设备链接: {model_code}")
-                # 调试：保存HTML到文件
-                with open(f'debug_{model_code}.html', 'w', encoding='utf-8') as f:
-                    f.write(str(soup.prettify()))
-                logger.info(f"HTML已保存到 debug_{model_code}.html")
+                # 调试：异步保存压缩后的页面
+                get_debug_store().capture(f'gsmarena_search_{model_code}', lambda: str(soup), reason='no_results')
                 return None
             
             # 获取第一个设备的详细页面链接
@@ -538,6 +548,7 @@ if __name__ == '__main__':
                             device_info['price'] = value
                         elif 'Models' in key:
                             device_info['model_code'] = value
+                            device_info['model_codes'] = parse_model_codes(value)
                         
                         # 存储所有规格
                         device_info['specifications'][key] = value
@@ -584,6 +595,7 @@ if __name__ == '__main__':
                     'search_model': model_code,
                     'device_name': device_details['name'],
                     'model_code': device_details['model_code'],
+                    'model_codes': device_details.get('model_codes', []),
                     'announced_date': device_details['announced_date'],
                     'release_date': device_details['release_date'],
                     'price': device_details['price'],
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发布/上市日期标准化
+把 announced_date / release_date 的原始字符串（"2019, September 21"、"Released 2019, October"、
+"Coming soon. Exp. release 2024, Q2"、"3Q 2020" 等）解析为日期 + 精度标记，
+写入 announced_on / release_on（周期起始日）并建索引，按年份的设备队列查询直接走索引范围扫描
+"""
+
+import re
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+PRECISION_YEAR = 'year'
+PRECISION_QUARTER = 'quarter'
+PRECISION_MONTH = 'month'
+PRECISION_DAY = 'day'
+
+DATE_INDEXES = [
+    [("announced_on", ASCENDING)],
+    [("release_on", ASCENDING)],
+    [("manufacture", ASCENDING), ("announced_on", ASCENDING)],
+]
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+# "2019, September 21" / "2019, Sep" / "2019"
+YEAR_MONTH_DAY_PATTERN = re.compile(
+    r'\b(?P<year>19\d{2}|20\d{2})\b(?:\s*,?\s*(?P<month>[A-Za-z]{3,9})\.?(?:\s+(?P<day>\d{1,2})\b)?)?'
+)
+# "2021, Q3" / "Q3 2021" / "3Q 2020"
+QUARTER_PATTERN = re.compile(
+    r'(?:\b(?P<year1>19\d{2}|20\d{2})\s*,?\s*Q(?P<q1>[1-4])\b)'
+    r'|(?:\bQ(?P<q2>[1-4])\s*,?\s*(?P<year2>19\d{2}|20\d{2})\b)'
+    r'|(?:\b(?P<q3>[1-4])Q\s*,?\s*(?P<year3>19\d{2}|20\d{2})\b)',
+    re.IGNORECASE
+)
+
+RELEASE_STATUS_KEYWORDS = [
+    ('cancelled', 'cancelled'),
+    ('discontinued', 'discontinued'),
+    ('coming soon', 'expected'),
+    ('exp. release', 'expected'),
+    ('rumored', 'expected'),
+    ('released', 'released'),
+    ('available', 'released'),
+]
+
+
+def parse_date(text):
+    """解析日期字符串
+
+    Returns:
+        (datetime, precision) 或 (None, None)；日期取周期起始日
+    """
+    if not text:
+        return None, None
+    text = str(text)
+
+    match = QUARTER_PATTERN.search(text)
+    if match:
+        year = match.group('year1') or match.group('year2') or match.group('year3')
+        quarter = match.group('q1') or match.group('q2') or match.group('q3')
+        return datetime(int(year), (int(quarter) - 1) * 3 + 1, 1), PRECISION_QUARTER
+
+    match = YEAR_MONTH_DAY_PATTERN.search(text)
+    if not match:
+        return None, None
+
+    year = int(match.group('year'))
+    month = MONTHS.get((match.group('month') or '')[:3].lower())
+    if not month:
+        return datetime(year, 1, 1), PRECISION_YEAR
+
+    day = match.group('day')
+    if day:
+        try:
+            return datetime(year, month, int(day)), PRECISION_DAY
+        except ValueError:
+            pass
+    return datetime(year, month, 1), PRECISION_MONTH
+
+
+def parse_release_status(text):
+    lowered = str(text or '').lower()
+    for keyword, status in RELEASE_STATUS_KEYWORDS:
+        if keyword in lowered:
+            return status
+    return None
+
+
+def normalize_dates(announced_date, release_date):
+    """日期标准化字段"""
+    announced_on, announced_precision = parse_date(announced_date)
+
+    release_text = str(release_date or '')
+    # "Available. Released 2019, October" / "Coming soon. Exp. release 2024, March"
+    release_part = re.split(r'released|exp\. release', release_text, flags=re.IGNORECASE)[-1]
+    release_on, release_precision = parse_date(release_part)
+
+    return {
+        'announced_on': announced_on,
+        'announced_precision': announced_precision,
+        'release_on': release_on,
+        'release_precision': release_precision,
+        'release_status': parse_release_status(release_text),
+    }
+
+
+def year_range_filter(start_year=None, end_year=None, field='announced_on'):
+    """按年份区间（含两端）构造索引友好的范围查询条件"""
+    condition = {}
+    if start_year is not None:
+        condition['$gte'] = datetime(int(start_year), 1, 1)
+    if end_year is not None:
+        condition['$lt'] = datetime(int(end_year) + 1, 1, 1)
+    return {field: condition} if condition else {}
+
+
+def ensure_date_indexes(collection):
+    for keys in DATE_INDEXES:
+        collection.create_index(keys)
+
+
+def backfill_dates(collection, batch_size=1000, only_missing=True):
+    """为已有文档批量补写日期字段（只读取两个日期字段）
+
+    only_missing 时也重新处理季度日期曾被记为 month 精度的文档
+    """
+    quarter_text = {"$regex": r"Q[1-4]|[1-4]Q", "$options": "i"}
+    query = {"$or": [
+        {"announced_precision": {"$exists": False}},
+        {"announced_precision": PRECISION_MONTH, "announced_date": quarter_text},
+        {"release_precision": PRECISION_MONTH, "release_date": quarter_text},
+    ]} if only_missing else {}
+
+    operations = []
+    updated = 0
+    for doc in collection.find(query, {"announced_date": 1, "release_date": 1}, batch_size=batch_size):
+        operations.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": normalize_dates(doc.get('announced_date'), doc.get('release_date'))}
+        ))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+
+    logger.info(f"日期字段回填完成: 更新 {updated} 个文档")
+    return updated
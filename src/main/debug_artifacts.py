@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调试页面存储
+只在解析失败时（或按采样率）保存页面，gzip压缩后由后台线程异步写盘，
+目录总大小超过上限时按最近最少使用（LRU）淘汰旧文件，不再在热路径上同步写未压缩的HTML。
+
+环境变量:
+  DEBUG_ARTIFACT_DIR          保存目录（默认 debug_artifacts）
+  DEBUG_ARTIFACT_MAX_MB       目录大小上限（默认 200）
+  DEBUG_ARTIFACT_SAMPLE_RATE  成功页面的采样率 0-1（默认 0，只保存失败页面）
+"""
+
+import os
+import re
+import gzip
+import queue
+import atexit
+import random
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = 'debug_artifacts'
+DEFAULT_MAX_MB = 200
+SUFFIX = '.html.gz'
+
+_UNSAFE_CHARS = re.compile(r'[^0-9A-Za-z._-]+')
+
+
+class DebugArtifactStore:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 sample_rate=0.0, queue_size=100):
+        """初始化调试页面存储
+
+        Args:
+            directory (str): 保存目录
+            max_bytes (int): 目录中调试文件的总大小上限
+            sample_rate (float): 非失败页面的采样率
+            queue_size (int): 待写队列容量，写不过来时直接丢弃新的页面
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.counters = {'captured': 0, 'written': 0, 'dropped': 0, 'evicted': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self.files = OrderedDict()  # 文件名 -> 大小，越靠后越新
+        existing = [name for name in os.listdir(directory) if name.endswith(SUFFIX)]
+        for name in sorted(existing, key=lambda n: os.path.getmtime(os.path.join(directory, n))):
+            self.files[name] = os.path.getsize(os.path.join(directory, name))
+        self.total_bytes = sum(self.files.values())
+
+        self.writer = threading.Thread(target=self._write_loop, name='debug-artifact-writer', daemon=True)
+        self.writer.start()
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.counters, files=len(self.files), total_bytes=self.total_bytes)
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def capture(self, name, content, reason='failure'):
+        """提交一个页面（不阻塞）
+
+        Args:
+            name (str): 文件名（不含扩展名）
+            content (str 或 callable): 页面内容；传入函数时只在确实保存时才生成
+            reason (str): 保存原因，作为文件名前缀
+        """
+        if callable(content):
+            content = content()
+        filename = f"{_UNSAFE_CHARS.sub('_', f'{reason}_{name}')[:150]}{SUFFIX}"
+        try:
+            self.queue.put_nowait((filename, content))
+            self._count('captured')
+        except queue.Full:
+            self._count('dropped')
+
+    def capture_if(self, failed, name, content, reason='failure'):
+        """失败时保存；成功时按采样率保存"""
+        if failed:
+            self.capture(name, content, reason)
+        elif self.should_sample():
+            self.capture(name, content, 'sample')
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logger.warning(f"调试页面写入失败: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, filename, content):
+        path = os.path.join(self.directory, filename)
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(content)
+        size = os.path.getsize(path)
+
+        with self.lock:
+            self.total_bytes += size - self.files.pop(filename, 0)
+            self.files[filename] = size
+            self.counters['written'] += 1
+            while self.total_bytes > self.max_bytes and len(self.files) > 1:
+                oldest, oldest_size = self.files.popitem(last=False)
+                self.total_bytes -= oldest_size
+                self.counters['evicted'] += 1
+                try:
+                    os.remove(os.path.join(self.directory, oldest))
+                except OSError:
+                    pass
+
+    def flush(self):
+        """等待队列中的页面全部写完"""
+        self.queue.join()
+
+    def close(self):
+        self.flush()
+        self.queue.put(None)
+        self.writer.join(timeout=5)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_debug_store():
+    """全局调试页面存储（首次调用时按环境变量初始化）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DebugArtifactStore(
+                directory=os.environ.get('DEBUG_ARTIFACT_DIR', DEFAULT_DIRECTORY),
+                max_bytes=int(float(os.environ.get('DEBUG_ARTIFACT_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024),
+                sample_rate=float(os.environ.get('DEBUG_ARTIFACT_SAMPLE_RATE', 0)),
+            )
+            atexit.register(_store.flush)
+    return _store
@@ -1,12 +1,14 @@
 import pandas as pd
 import pymongo
-from pymongo import MongoClient
 import json
 import logging
 import time
 from datetime import datetime
 import re
 from app import DeviceInfoScraper
+from device_normalizer import apply_normalization
+from device_query import lookup_projection
+from device_store import open_store
 import os
 
 # 配置日志
@@ -20,6 +22,7 @@ class DeviceDBManager:
         """
         self.mongo_uri = mongo_uri
         self.db_name = db_name
+        self.store = None
         self.client = None
         self.db = None
         self.collection = None
@@ -29,17 +32,16 @@ class DeviceDBManager:
         self._init_mongodb()
     
     def _init_mongodb(self):
-        """初始化MongoDB连接"""
+        """初始化存储（mongodb:// 或 sqlite:///，见 device_store）"""
         try:
-            self.client = MongoClient(self.mongo_uri)
-            self.db = self.client[self.db_name]
-            self.collection = self.db['devices']
+            self.store = open_store(self.mongo_uri, self.db_name)
+            # SQLite 后端下为 None
+            self.client, self.db, self.collection = self.store.client, self.store.db, self.store.collection
             
             # 创建索引
-            self.collection.create_index("model_code", unique=True)
-            self.collection.create_index("device_name")
+            self.store.ensure_indexes()
             
-            logger.info(f"MongoDB连接成功: {self.db_name}")
+            logger.info(f"数据库连接成功: {self.db_name}（{self.store.backend}）")
         except Exception as e:
             logger.error(f"MongoDB连接失败: {str(e)}")
             raise
@@ -77,10 +79,10 @@ class DeviceDBManager:
         model_code = device_info['model_code']
         
         try:
-            # 检查是否已存在
-            existing = self.collection.find_one({"model_code": model_code})
+            # 检查是否已存在（包括已抓取机型的兄弟型号）
+            existing = self.store.find_device(model_code, {"model_code": 1})
             if existing:
-                logger.info(f"设备 {model_code} 已存在，跳过")
+                logger.info(f"设备 {model_code} 已存在（{existing['model_code']}），跳过")
                 return True
             
             # 爬取设备信息
@@ -104,8 +106,9 @@ class DeviceDBManager:
                     "specifications": data['specifications']  # 完整规格信息
                 }
                 
-                # 插入数据库
-                self.collection.insert_one(device_doc)
+                # 标准化规格字段后插入数据库
+                apply_normalization(device_doc)
+                self.store.insert_device(device_doc)
                 logger.info(f"✅ 成功存储设备: {model_code} - {data['device_name']}")
                 logger.info(f"   价格: {data['price']}")
                 return True
@@ -178,33 +181,29 @@ class DeviceDBManager:
         logger.info(f"CSV文件: {csv_filename}")
         logger.info(f"JSON文件: {json_filename}")
     
-    def query_device(self, model_code):
-        """查询单个设备信息"""
+    def query_device(self, model_code, fields=None):
+        """查询单个设备信息
+        
+        Args:
+            model_code (str): 型号
+            fields: 返回的字段（逗号分隔或列表），默认轻量视图（不含 specifications），all 表示全部
+        """
         try:
-            device = self.collection.find_one({"model_code": model_code})
-            if device:
-                # 移除MongoDB的_id字段
-                device.pop('_id', None)
-                return device
-            else:
-                return None
+            # 投影中已排除MongoDB的_id字段
+            return self.store.find_device(model_code, lookup_projection(fields))
         except Exception as e:
             logger.error(f"查询设备失败: {str(e)}")
             return None
     
-    def get_all_devices(self, limit=None):
-        """获取所有设备信息"""
+    def get_all_devices(self, limit=None, fields=None):
+        """获取所有设备信息
+        
+        Args:
+            limit (int): 最多返回的设备数
+            fields: 同 query_device
+        """
         try:
-            query = self.collection.find({})
-            if limit:
-                query = query.limit(limit)
-            
-            devices = []
-            for device in query:
-                device.pop('_id', None)  # 移除MongoDB的_id字段
-                devices.append(device)
-            
-            return devices
+            return list(self.store.iter_devices(lookup_projection(fields), limit))
         except Exception as e:
             logger.error(f"获取设备列表失败: {str(e)}")
             return []
@@ -212,19 +211,8 @@ class DeviceDBManager:
     def get_stats(self):
         """获取数据库统计信息"""
         try:
-            total_count = self.collection.count_documents({})
-            with_price = self.collection.count_documents({"price": {"$ne": ""}})
-            with_date = self.collection.count_documents({"announced_date": {"$ne": ""}})
-            
-            stats = {
-                "total_devices": total_count,
-                "devices_with_price": with_price,
-                "devices_with_date": with_date,
-                "price_coverage": f"{with_price/total_count*100:.1f}%" if total_count > 0 else "0%",
-                "date_coverage": f"{with_date/total_count*100:.1f}%" if total_count > 0 else "0%"
-            }
-            
-            return stats
+            # 读增量维护的计数，不再全表计数
+            return self.store.stats()
         except Exception as e:
             logger.error(f"获取统计信息失败: {str(e)}")
             return {}
@@ -233,8 +221,8 @@ class DeviceDBManager:
         """关闭数据库连接"""
         if self.scraper:
             self.scraper.close()
-        if self.client:
-            self.client.close()
+        if self.store:
+            self.store.close()
             logger.info("数据库连接已关闭")
 
 def main():
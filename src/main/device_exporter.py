@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式导出设备数据（CSV / NDJSON / Parquet）
+按 batch_size 逐批迭代游标，边读边写，内存中最多只有一批文档（Parquet 为一个行组），
+峰值内存与集合大小无关。可选把指定的 specifications 键展开为单独的列（spec_<键名>），
+只投影需要的规格键，不把整个规格字典读回来。
+
+Parquet 需要 pyarrow（可选依赖）。
+
+用法:
+  python device_exporter.py devices_export.csv
+  python device_exporter.py devices.ndjson --fields model_code,device_name,price
+  python device_exporter.py devices.parquet --spec-keys Chipset,Internal,OS
+"""
+
+import csv
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, date
+
+from pymongo import MongoClient
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# 与原 view_database.export_to_csv 的列一致
+DEFAULT_EXPORT_FIELDS = [
+    'model_code', 'device_name', 'manufacture', 'announced_date', 'release_date',
+    'price', 'source_url', 'created_at',
+]
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_ROW_GROUP_SIZE = 10000
+SPEC_COLUMN_PREFIX = 'spec_'
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMAT_PARQUET = 'parquet'
+FORMAT_EXTENSIONS = {
+    '.csv': FORMAT_CSV,
+    '.ndjson': FORMAT_NDJSON,
+    '.jsonl': FORMAT_NDJSON,
+    '.parquet': FORMAT_PARQUET,
+}
+
+
+def detect_format(path):
+    """按扩展名判断导出格式"""
+    for extension, fmt in FORMAT_EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return fmt
+    raise ValueError(f"无法从文件名判断导出格式: {path}（支持 {', '.join(FORMAT_EXTENSIONS)}）")
+
+
+def _split_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return list(value)
+
+
+def _cell(value):
+    """CSV / Parquet 单元格：日期转 ISO 字符串，列表/字典转 JSON"""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return value if isinstance(value, str) else str(value)
+
+
+class DeviceExporter:
+    def __init__(self, collection, fields=None, spec_keys=None, query=None, batch_size=DEFAULT_BATCH_SIZE):
+        """初始化导出器
+
+        Args:
+            collection: devices 集合
+            fields: 导出的顶层字段（逗号分隔或列表），默认 DEFAULT_EXPORT_FIELDS
+            spec_keys: 展开为列的 specifications 键（逗号分隔或列表）
+            query (dict): 过滤条件
+            batch_size (int): 游标每批取回的文档数
+        """
+        self.collection = collection
+        self.fields = _split_list(fields) or list(DEFAULT_EXPORT_FIELDS)
+        self.spec_keys = _split_list(spec_keys)
+        self.query = query or {}
+        self.batch_size = batch_size
+        self.columns = self.fields + [SPEC_COLUMN_PREFIX + key for key in self.spec_keys]
+
+    def projection(self):
+        projection = {field: 1 for field in self.fields}
+        projection['_id'] = 0
+        if self.spec_keys and 'specifications' not in projection:
+            # 已经取整个规格字典时再加点路径会报路径冲突
+            if any('.' in key or key.startswith('$') for key in self.spec_keys):
+                # 键名不能用点路径投影时退回取整个规格字典
+                projection['specifications'] = 1
+            else:
+                for key in self.spec_keys:
+                    projection[f'specifications.{key}'] = 1
+        return projection
+
+    def iter_rows(self):
+        """逐个产出扁平化后的行（dict，键为 self.columns）"""
+        cursor = self.collection.find(self.query, self.projection(), batch_size=self.batch_size)
+        try:
+            for doc in cursor:
+                row = {field: doc.get(field) for field in self.fields}
+                if self.spec_keys:
+                    specs = doc.get('specifications') or {}
+                    for key in self.spec_keys:
+                        row[SPEC_COLUMN_PREFIX + key] = specs.get(key)
+                yield row
+        finally:
+            close = getattr(cursor, 'close', None)
+            if close:
+                close()
+
+    def write_csv(self, path):
+        count = 0
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for row in self.iter_rows():
+                writer.writerow([_cell(row[column]) for column in self.columns])
+                count += 1
+        return count
+
+    def write_ndjson(self, path):
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in self.iter_rows():
+                f.write(json.dumps(row, ensure_ascii=False, default=_cell))
+                f.write('\n')
+                count += 1
+        return count
+
+    def write_parquet(self, path, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        """每 row_group_size 行写一个行组（所有列按字符串保存）"""
+        if pa is None:
+            raise RuntimeError("导出 Parquet 需要安装 pyarrow")
+
+        schema = pa.schema([(column, pa.string()) for column in self.columns])
+        count = 0
+        buffer = {column: [] for column in self.columns}
+        with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+            for row in self.iter_rows():
+                for column in self.columns:
+                    value = row[column]
+                    buffer[column].append(None if value is None else _cell(value))
+                count += 1
+                if count % row_group_size == 0:
+                    writer.write_table(pa.Table.from_pydict(buffer, schema=schema))
+                    buffer = {column: [] for column in self.columns}
+            if count % row_group_size:
+                writer.write_table(pa.Table.from_pydict(buffer, schema=schema))
+        return count
+
+    def export(self, path, fmt=None, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        """导出到文件，返回导出的设备数
+
+        Args:
+            path (str): 输出文件
+            fmt (str): csv / ndjson / parquet，默认按扩展名判断
+            row_group_size (int): Parquet 行组大小
+        """
+        fmt = fmt or detect_format(path)
+        started = time.time()
+        if fmt == FORMAT_CSV:
+            count = self.write_csv(path)
+        elif fmt == FORMAT_NDJSON:
+            count = self.write_ndjson(path)
+        elif fmt == FORMAT_PARQUET:
+            count = self.write_parquet(path, row_group_size)
+        else:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        logger.info(f"📤 已导出 {count} 台设备到 {path}（{fmt}，{time.time() - started:.1f} 秒）")
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式导出设备数据')
+    parser.add_argument('output', help='输出文件（.csv / .ndjson / .jsonl / .parquet）')
+    parser.add_argument('--format', choices=[FORMAT_CSV, FORMAT_NDJSON, FORMAT_PARQUET], help='默认按扩展名判断')
+    parser.add_argument('--fields', help='导出的字段（逗号分隔）')
+    parser.add_argument('--spec-keys', help='展开为列的规格键（逗号分隔），如 Chipset,Internal,OS')
+    parser.add_argument('--manufacture', help='只导出该制造商')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db', default='device_info')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(args.mongo_uri)
+    try:
+        query = {'manufacture': args.manufacture} if args.manufacture else None
+        exporter = DeviceExporter(client[args.db]['devices'], args.fields, args.spec_keys, query, args.batch_size)
+        exporter.export(args.output, args.format, args.row_group_size)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备文档入库前的规格标准化
+从原始规格字符串中提取数值字段，写入 normalized 子文档并建立复合索引，
+使范围查询可以直接走索引，而不是 $regex 或 Python 后处理；
+价格、日期字段分别由 price_normalizer / date_normalizer 负责，在同一个入口中一起写入
+"""
+
+import re
+import logging
+from pymongo import ASCENDING, UpdateOne
+from price_normalizer import normalize_price, ensure_price_indexes, backfill_prices
+from date_normalizer import normalize_dates, ensure_date_indexes, backfill_dates
+from model_code_index import device_model_codes, ensure_code_index, backfill_code_index
+
+logger = logging.getLogger(__name__)
+
+# normalized 子文档上的复合索引
+NORMALIZED_INDEXES = [
+    [("manufacture", ASCENDING), ("normalized.announced_year", ASCENDING)],
+    [("normalized.announced_year", ASCENDING), ("normalized.ram_gb", ASCENDING)],
+    [("normalized.ram_gb", ASCENDING), ("normalized.storage_gb", ASCENDING)],
+    [("normalized.has_5g", ASCENDING), ("normalized.announced_year", ASCENDING)],
+    [("normalized.battery_mah", ASCENDING)],
+    [("normalized.display_inches", ASCENDING)],
+]
+
+# 各字段优先查找的规格键（GSMArena / GSMChoice）
+RAM_KEYS = ['Internal', 'RAM memory', 'RAM']
+STORAGE_KEYS = ['Internal', 'Built-in memory', 'Storage']
+BATTERY_KEYS = ['Battery', 'Type', 'Standard battery', 'Battery capacity']
+DISPLAY_KEYS = ['Size', 'Display', 'Display size']
+RESOLUTION_KEYS = ['Resolution', 'Display resolution', 'Display']
+CHIPSET_KEYS = ['Chipset', 'Processor', 'Processor model']
+NETWORK_KEYS = ['Network', 'Technology', 'Network support']
+
+RAM_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(GB|MB)\s*RAM', re.IGNORECASE)
+STORAGE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(TB|GB|MB)\b(?!\s*RAM)', re.IGNORECASE)
+BATTERY_PATTERN = re.compile(r'(\d{3,5})\s*mAh', re.IGNORECASE)
+DISPLAY_PATTERN = re.compile(r'(\d{1,2}(?:\.\d+)?)\s*(?:inches|inch|"|″)', re.IGNORECASE)
+RESOLUTION_PATTERN = re.compile(r'(\d{3,4})\s*[xX×]\s*(\d{3,4})')
+YEAR_PATTERN = re.compile(r'\b(19\d{2}|20\d{2})\b')
+FIVE_G_PATTERN = re.compile(r'\b5G\b')
+
+UNIT_TO_GB = {'TB': 1024.0, 'GB': 1.0, 'MB': 1 / 1024.0}
+
+
+def _spec_values(specs, keys):
+    """按优先级返回规格值列表（存在的键优先），最后附上全部规格值作为兜底"""
+    values = [specs[key] for key in keys if specs.get(key)]
+    return values + [value for key, value in specs.items() if key not in keys and value]
+
+
+def _first_match(pattern, values):
+    for value in values:
+        match = pattern.search(str(value))
+        if match:
+            return match
+    return None
+
+
+def _to_gb(amount, unit):
+    return round(float(amount) * UNIT_TO_GB[unit.upper()], 3)
+
+
+def extract_ram_gb(specs):
+    """RAM（GB），多个版本取最大值"""
+    for value in _spec_values(specs, RAM_KEYS):
+        matches = RAM_PATTERN.findall(str(value))
+        if matches:
+            return max(_to_gb(amount, unit) for amount, unit in matches)
+    # GSMChoice 的 "RAM memory" 值没有 RAM 后缀
+    for key in ('RAM memory', 'RAM'):
+        if specs.get(key):
+            match = STORAGE_PATTERN.search(str(specs[key]))
+            if match:
+                return _to_gb(*match.groups())
+    return None
+
+
+def extract_storage_gb(specs):
+    """存储（GB），多个版本取最大值"""
+    for key in STORAGE_KEYS:
+        if specs.get(key):
+            matches = STORAGE_PATTERN.findall(str(specs[key]))
+            if matches:
+                return max(_to_gb(amount, unit) for amount, unit in matches)
+    return None
+
+
+def extract_battery_mah(specs):
+    match = _first_match(BATTERY_PATTERN, _spec_values(specs, BATTERY_KEYS))
+    return int(match.group(1)) if match else None
+
+
+def extract_display_inches(specs):
+    match = _first_match(DISPLAY_PATTERN, _spec_values(specs, DISPLAY_KEYS))
+    if not match:
+        return None
+    inches = float(match.group(1))
+    return inches if 1.0 <= inches <= 20.0 else None
+
+
+def extract_resolution(specs):
+    """分辨率，返回 (宽, 高)；按较短边为宽"""
+    match = _first_match(RESOLUTION_PATTERN, _spec_values(specs, RESOLUTION_KEYS))
+    if not match:
+        return None, None
+    first, second = int(match.group(1)), int(match.group(2))
+    return min(first, second), max(first, second)
+
+
+def extract_chipset(specs):
+    for key in CHIPSET_KEYS:
+        if specs.get(key):
+            # 去掉制程等括号说明: "Qualcomm SM6125 Snapdragon 665 (11 nm)"
+            chipset = re.sub(r'\s*\([^)]*\)', '', str(specs[key])).strip()
+            if chipset:
+                return chipset
+    return None
+
+
+def extract_has_5g(specs, device_name=''):
+    if any('5G bands' in key for key in specs):
+        return True
+    for key in NETWORK_KEYS:
+        if specs.get(key) and FIVE_G_PATTERN.search(str(specs[key])):
+            return True
+    return bool(FIVE_G_PATTERN.search(device_name or ''))
+
+
+def extract_year(text):
+    match = YEAR_PATTERN.search(str(text or ''))
+    return int(match.group(1)) if match else None
+
+
+def normalize_specs(device_doc):
+    """根据设备文档生成 normalized 子文档"""
+    specs = device_doc.get('specifications') or {}
+    width, height = extract_resolution(specs)
+
+    announced_year = extract_year(device_doc.get('announced_date'))
+    if announced_year is None:
+        announced_year = extract_year(specs.get('Announced') or specs.get('Launch'))
+
+    return {
+        'ram_gb': extract_ram_gb(specs),
+        'storage_gb': extract_storage_gb(specs),
+        'battery_mah': extract_battery_mah(specs),
+        'display_inches': extract_display_inches(specs),
+        'resolution_width': width,
+        'resolution_height': height,
+        'chipset': extract_chipset(specs),
+        'has_5g': extract_has_5g(specs, device_doc.get('device_name', '')),
+        'announced_year': announced_year,
+    }
+
+
+def apply_normalization(device_doc):
+    """入库前的标准化入口，所有写入方共用；直接修改并返回文档"""
+    try:
+        device_doc['normalized'] = normalize_specs(device_doc)
+        device_doc['model_codes'] = device_model_codes(device_doc)
+        device_doc.update(normalize_price(device_doc.get('price', '')))
+        device_doc.update(normalize_dates(device_doc.get('announced_date'), device_doc.get('release_date')))
+    except Exception as e:
+        logger.warning(f"规格标准化失败 {device_doc.get('model_code', '')}: {str(e)}")
+    return device_doc
+
+
+def ensure_normalized_indexes(collection):
+    """创建标准化字段的复合索引"""
+    for keys in NORMALIZED_INDEXES:
+        collection.create_index(keys)
+    ensure_price_indexes(collection)
+    ensure_date_indexes(collection)
+    ensure_code_index(collection.database)
+
+
+def backfill_normalized(collection, batch_size=500, only_missing=True):
+    """为已有文档批量补写 normalized 字段
+
+    Args:
+        collection: MongoDB集合
+        batch_size (int): 每批 bulk_write 的文档数
+        only_missing (bool): 只处理还没有 normalized 字段的文档
+    """
+    query = {"normalized": {"$exists": False}} if only_missing else {}
+    projection = {"model_code": 1, "device_name": 1, "announced_date": 1, "specifications": 1}
+
+    operations = []
+    updated = 0
+    for doc in collection.find(query, projection, batch_size=batch_size):
+        operations.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"normalized": normalize_specs(doc)}}
+        ))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+
+    logger.info(f"normalized 字段回填完成: 更新 {updated} 个文档")
+    return updated
+
+
+def main():
+    """回填已有数据（规格、价格、日期、型号反向索引）并创建索引"""
+    from pymongo import MongoClient
+
+    client = MongoClient("mongodb://localhost:27017/")
+    try:
+        collection = client["device_info"]["devices"]
+        ensure_normalized_indexes(collection)
+        backfill_normalized(collection)
+        backfill_prices(collection)
+        backfill_dates(collection)
+        backfill_code_index(collection.database)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
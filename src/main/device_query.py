@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备列表查询 - 过滤条件、游标分页、字段投影
+
+支持的过滤条件: manufacture（等值）、year_from/year_to、price_min/price_max、
+ram_min/ram_max、storage_min/storage_max。
+每种组合都有对应的复合索引: (manufacture?, 驱动字段, _id)，
+驱动字段取第一个出现的范围条件，其余范围条件在索引扫描结果上过滤（FETCH 阶段，不是索引边界）；
+分页按 (驱动字段, _id) 做键集游标，不使用 skip/limit。
+verify_index_coverage() 用 explain 检查每种组合的 manufacture 和驱动字段确实是索引边界，
+并按 executionStats 检查扫描的键/文档数与返回数之比（需要在有真实数据的库上运行才有意义，
+其余范围条件过滤掉大部分记录的组合会在这里暴露出来）。
+"""
+
+import json
+import base64
+import logging
+import itertools
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from date_normalizer import year_range_filter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# 每返回一条记录最多允许扫描的键/文档数，超过说明大部分记录在索引扫描后才被过滤
+MAX_EXAMINED_PER_RETURNED = 10
+# 扫描量低于该值时不检查比例（小库、空库上的比例没有意义）
+MIN_EXAMINED_TO_CHECK = 100
+# explain 中表示没有限定范围的索引边界
+UNBOUNDED = ('[MinKey, MaxKey]', '[MaxKey, MinKey]')
+# year_from / year_to 的取值范围（year_to 对应 datetime(year + 1, 1, 1)）
+MIN_YEAR = 1
+MAX_YEAR = 9998
+
+# 范围条件: 参数前缀 → 文档字段（顺序即驱动字段优先级）
+RANGE_FIELDS = [
+    ('price', 'price_value'),
+    ('year', 'announced_on'),
+    ('ram', 'normalized.ram_gb'),
+    ('storage', 'normalized.storage_gb'),
+]
+
+# 列表接口允许投影的字段
+LIST_FIELDS = [
+    'model_code', 'device_name', 'manufacture', 'announced_date', 'release_date', 'price',
+    'source_url', 'created_at', 'updated_at', 'price_value', 'price_currency',
+    'announced_on', 'announced_precision', 'release_on', 'release_precision', 'release_status',
+    'normalized', 'specifications',
+]
+DEFAULT_LIST_FIELDS = [
+    'model_code', 'device_name', 'manufacture', 'announced_date', 'release_date', 'price',
+    'price_value', 'price_currency',
+]
+
+# 单个设备查询（/api/device-info、DeviceDBManager）可选的字段；默认轻量视图不含 specifications
+LOOKUP_FIELDS = LIST_FIELDS + ['model_codes']
+DEFAULT_LOOKUP_FIELDS = [
+    'model_code', 'model_codes', 'device_name', 'manufacture', 'announced_date', 'release_date',
+    'price', 'source_url', 'created_at',
+]
+# fields=all 返回完整文档
+ALL_FIELDS = 'all'
+
+
+class QueryError(ValueError):
+    """请求参数不合法"""
+    pass
+
+
+def _index_name(keys):
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+def listing_index_keys(has_manufacture, drive_field):
+    """某个过滤组合对应的复合索引键"""
+    keys = [("manufacture", ASCENDING)] if has_manufacture else []
+    if drive_field:
+        keys.append((drive_field, ASCENDING))
+    keys.append(("_id", ASCENDING))
+    return keys
+
+
+def all_listing_indexes():
+    indexes = []
+    for has_manufacture in (False, True):
+        for drive_field in [None] + [field for _, field in RANGE_FIELDS]:
+            keys = listing_index_keys(has_manufacture, drive_field)
+            if keys != [("_id", ASCENDING)]:
+                indexes.append(keys)
+    return indexes
+
+
+def ensure_listing_indexes(collection):
+    """创建列表查询需要的全部复合索引"""
+    for keys in all_listing_indexes():
+        collection.create_index(keys, name=_index_name(keys))
+
+
+def _parse_number(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"参数 {name} 必须是数字")
+
+
+def _year_bound(value, name):
+    """年份参数必须落在 datetime 能表示的范围内（year_to 还要 +1）"""
+    if value is None:
+        return None
+    if not MIN_YEAR <= value <= MAX_YEAR:
+        raise QueryError(f"参数 {name} 必须是 {MIN_YEAR}-{MAX_YEAR} 之间的年份")
+    return int(value)
+
+
+def _range_condition(prefix, field, params):
+    low_name = f"{prefix}_from" if prefix == 'year' else f"{prefix}_min"
+    high_name = f"{prefix}_to" if prefix == 'year' else f"{prefix}_max"
+    low = _parse_number(params, low_name)
+    high = _parse_number(params, high_name)
+    if low is None and high is None:
+        return None
+    if prefix == 'year':
+        return year_range_filter(_year_bound(low, low_name), _year_bound(high, high_name), field)[field]
+    condition = {}
+    if low is not None:
+        condition['$gte'] = low
+    if high is not None:
+        condition['$lte'] = high
+    return condition
+
+
+def encode_cursor(drive_value, doc_id):
+    if isinstance(drive_value, datetime):
+        payload = {'t': 'date', 'v': drive_value.isoformat(), 'id': str(doc_id)}
+    else:
+        payload = {'t': 'raw', 'v': drive_value, 'id': str(doc_id)}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        value = payload['v']
+        if payload['t'] == 'date':
+            value = datetime.fromisoformat(value)
+        return value, ObjectId(payload['id'])
+    except Exception:
+        raise QueryError("cursor 参数无效")
+
+
+def build_projection(fields=None, allowed=LIST_FIELDS, default=DEFAULT_LIST_FIELDS):
+    """把逗号分隔的字段列表转换为Mongo投影"""
+    if not fields:
+        selected = list(default)
+    elif fields == ALL_FIELDS:
+        selected = list(allowed)
+    else:
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed]
+        if unknown:
+            raise QueryError(f"不支持的字段: {', '.join(unknown)}")
+        selected = list(fields)
+    return {field: 1 for field in selected}
+
+
+def lookup_projection(fields=None):
+    """单个设备查询的投影（不含 _id）"""
+    projection = build_projection(fields, allowed=LOOKUP_FIELDS, default=DEFAULT_LOOKUP_FIELDS)
+    projection['_id'] = 0
+    return projection
+
+
+def select_fields(data, projection, keep=('search_model',)):
+    """按投影裁剪已组装好的结果（爬虫实时获取的结果也返回同样的字段）"""
+    return {key: value for key, value in data.items() if key in projection or key in keep}
+
+
+class DeviceListQuery:
+    def __init__(self, params):
+        """解析列表查询参数
+
+        Args:
+            params (dict): 查询参数（request.args）
+        """
+        self.manufacture = (params.get('manufacture') or '').strip() or None
+
+        self.ranges = []
+        for prefix, field in RANGE_FIELDS:
+            condition = _range_condition(prefix, field, params)
+            if condition:
+                self.ranges.append((field, condition))
+        self.drive_field = self.ranges[0][0] if self.ranges else None
+
+        limit = _parse_number(params, 'limit')
+        self.limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+        if not 1 <= self.limit <= MAX_PAGE_SIZE:
+            raise QueryError(f"limit 必须在 1-{MAX_PAGE_SIZE} 之间")
+
+        self.cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+        self.projection = build_projection(params.get('fields'))
+
+    @property
+    def index_keys(self):
+        return listing_index_keys(self.manufacture is not None, self.drive_field)
+
+    @property
+    def sort(self):
+        return [(field, direction) for field, direction in self.index_keys if field != 'manufacture']
+
+    def build_filter(self):
+        conditions = []
+        if self.manufacture:
+            conditions.append({"manufacture": self.manufacture})
+        for field, condition in self.ranges:
+            conditions.append({field: condition})
+
+        if self.cursor:
+            last_value, last_id = self.cursor
+            if self.drive_field:
+                conditions.append({"$or": [
+                    {self.drive_field: {"$gt": last_value}},
+                    {self.drive_field: last_value, "_id": {"$gt": last_id}},
+                ]})
+            else:
+                conditions.append({"_id": {"$gt": last_id}})
+
+        if not conditions:
+            return {}
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def _find(self, collection):
+        projection = dict(self.projection)
+        # 父字段已在投影中时不能再投影子路径（路径冲突）
+        if self.drive_field and self.drive_field.split('.')[0] not in projection:
+            projection[self.drive_field] = 1
+        return collection.find(self.build_filter(), projection) \
+            .sort(self.sort) \
+            .hint(self.index_keys) \
+            .limit(self.limit)
+
+    def execute(self, collection):
+        """执行查询，返回 (设备列表, 下一页游标)"""
+        devices = list(self._find(collection))
+
+        next_cursor = None
+        if len(devices) == self.limit:
+            last = devices[-1]
+            drive_value = last
+            if self.drive_field:
+                for part in self.drive_field.split('.'):
+                    drive_value = (drive_value or {}).get(part)
+            else:
+                drive_value = None
+            next_cursor = encode_cursor(drive_value, last['_id'])
+
+        # 游标字段只是为了翻页才取出，调用方没要求就去掉
+        extra_field = self.drive_field.split('.')[0] if self.drive_field else None
+        for device in devices:
+            device.pop('_id', None)
+            if extra_field and extra_field not in self.projection:
+                device.pop(extra_field, None)
+        return devices, next_cursor
+
+    def explain(self, collection):
+        """返回查询计划摘要: 使用的索引、是否有全表扫描、哪些条件是索引边界、扫描量与返回量"""
+        plan = self._find(collection).explain()
+        winning_plan = plan.get('queryPlanner', {}).get('winningPlan', {})
+        stats = plan.get('executionStats', {})
+        stages = []
+        bounds = {}
+
+        def walk(stage):
+            if not isinstance(stage, dict):
+                return
+            stages.append((stage.get('stage'), stage.get('indexName')))
+            for field, ranges in (stage.get('indexBounds') or {}).items():
+                # 多个索引扫描（翻页条件的 $or）中任何一个没有限定范围都不算边界
+                bounded = list(ranges) not in [[bound] for bound in UNBOUNDED]
+                bounds[field] = bounds.get(field, True) and bounded
+            for key in ('inputStage', 'queryPlan'):
+                walk(stage.get(key))
+            for child in stage.get('inputStages', []):
+                walk(child)
+
+        walk(winning_plan)
+        # 有条件的字段中，在索引边界里的 / 只能在 FETCH 阶段过滤的
+        conditioned = ['manufacture'] if self.manufacture else []
+        conditioned += [field for field, _ in self.ranges]
+        return {
+            'index': _index_name(self.index_keys),
+            'stages': [stage for stage, _ in stages if stage],
+            'indexes_used': sorted({name for _, name in stages if name}),
+            'collection_scan': any(stage == 'COLLSCAN' for stage, _ in stages),
+            'bounded_fields': [field for field in conditioned if bounds.get(field)],
+            'filtered_fields': [field for field in conditioned if not bounds.get(field)],
+            'returned': stats.get('nReturned', 0),
+            'keys_examined': stats.get('totalKeysExamined', 0),
+            'docs_examined': stats.get('totalDocsExamined', 0),
+        }
+
+
+def supported_filter_combinations():
+    """枚举所有支持的过滤组合（用于 explain 校验）"""
+    samples = {
+        'price': {'price_min': '100', 'price_max': '500'},
+        'year': {'year_from': '2019', 'year_to': '2022'},
+        'ram': {'ram_min': '4'},
+        'storage': {'storage_min': '64', 'storage_max': '256'},
+    }
+    prefixes = [prefix for prefix, _ in RANGE_FIELDS]
+    for has_manufacture in (False, True):
+        for size in range(len(prefixes) + 1):
+            for combo in itertools.combinations(prefixes, size):
+                params = {'manufacture': 'Samsung'} if has_manufacture else {}
+                for prefix in combo:
+                    params.update(samples[prefix])
+                yield params
+
+
+def coverage_problems(query, summary):
+    """根据 explain 摘要列出查询计划的问题（空列表表示没有问题）"""
+    problems = []
+    if summary['collection_scan']:
+        problems.append('全表扫描')
+    if summary['index'] not in summary['indexes_used']:
+        problems.append('未使用复合索引')
+    # 复合索引保证 manufacture 和驱动字段是索引边界，不是的话说明整个索引都要扫
+    for field in (['manufacture'] if query.manufacture else []) + ([query.drive_field] if query.drive_field else []):
+        if field not in summary['bounded_fields']:
+            problems.append(f'{field} 不是索引边界')
+    examined = max(summary['keys_examined'], summary['docs_examined'])
+    if examined >= MIN_EXAMINED_TO_CHECK and examined > MAX_EXAMINED_PER_RETURNED * max(summary['returned'], 1):
+        problems.append(f"扫描 {examined} 条只返回 {summary['returned']} 条"
+                        f"（在 FETCH 阶段过滤: {', '.join(summary['filtered_fields']) or '无'}）")
+    return problems
+
+
+def verify_index_coverage(collection):
+    """用 explain（executionStats）校验每种过滤组合（含翻页）的查询计划，返回有问题的组合
+
+    查询都带 hint，所以"用了哪个索引"本身说明不了什么；这里检查的是索引边界和扫描量。
+    扫描量检查依赖库中的实际数据，空库上只能查出索引边界的问题。
+    """
+    failures = []
+    for params in supported_filter_combinations():
+        first_page = DeviceListQuery(params)
+        drive_value = datetime(2020, 1, 1) if first_page.drive_field == 'announced_on' else 1
+        next_page = DeviceListQuery(dict(params, cursor=encode_cursor(drive_value, ObjectId())))
+
+        for query in (first_page, next_page):
+            summary = query.explain(collection)
+            problems = coverage_problems(query, summary)
+            if problems:
+                failures.append({'params': params, 'cursor': query.cursor is not None,
+                                 'problems': problems, 'plan': summary})
+    if failures:
+        logger.warning(f"❌ {len(failures)} 个过滤组合的查询计划有问题")
+    else:
+        logger.info("✅ 所有过滤组合的索引边界和扫描量正常")
+    return failures
+
+
+def main():
+    """创建列表索引并校验所有过滤组合的查询计划"""
+    from pymongo import MongoClient
+
+    client = MongoClient("mongodb://localhost:27017/")
+    try:
+        collection = client["device_info"]["devices"]
+        ensure_listing_indexes(collection)
+        for failure in verify_index_coverage(collection):
+            print(f"查询计划有问题: {failure['params']} cursor={failure['cursor']} -> {'; '.join(failure['problems'])}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
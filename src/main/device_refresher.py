@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台刷新（stale-while-revalidate）
+按陈旧度挑选设备重新抓取 GSMArena 详情页，只把变化的字段用 $set 写回；
+API 始终直接返回数据库中的缓存副本，查到陈旧记录时只是把它排进下一轮刷新。
+
+陈旧度 = 距上次检查的天数 + 缺价格/缺发布日期/"Coming soon" 的加分，
+每轮最多刷新 budget 个设备，请求走统一调度器的 refresh 优先级。
+刷新失败的设备记录 refresh_failed_at 和连续失败次数 refresh_failures，
+按 MIN_RECHECK_DAYS * 2^失败次数（最多 MAX_FAILURE_BACKOFF_DAYS 天）退避，失效链接不会每轮占满名额。
+
+变化检测: 文档上保存规格区域摘要 content_hash 和 HTTP 校验头（ETag / Last-Modified），
+刷新时带条件请求，304 或摘要不变时不解析、不重写文档，只在本轮结束时批量更新 refreshed_at。
+
+用法:
+  python device_refresher.py --once --budget 50
+  python device_refresher.py --budget 50 --interval 600
+"""
+
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+import requests
+from pymongo import MongoClient, ASCENDING
+
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_REFRESH
+from device_scraper_core import parse_device_details, specs_content_hash
+from device_normalizer import apply_normalization
+from model_code_index import index_device_codes
+from device_stats import record_update
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 50
+DEFAULT_INTERVAL = 600
+# 刷新请求之间的最小间隔（秒），与主机配置取较大值
+DEFAULT_REQUEST_DELAY = 5
+# 同一设备两次检查之间至少间隔的天数（API 请求刷新的除外）
+MIN_RECHECK_DAYS = 1
+# 连续刷新失败时的最长退避天数
+MAX_FAILURE_BACKOFF_DAYS = 30
+# 超过该天数没检查过的记录视为陈旧
+STALE_AFTER_DAYS = 30
+
+# 陈旧度加分（单位：天）
+MISSING_PRICE_SCORE = 30
+MISSING_DATE_SCORE = 30
+EXPECTED_RELEASE_SCORE = 60
+
+# 刷新时比较并写回的字段
+REFRESH_FIELDS = (
+    'device_name', 'announced_date', 'release_date', 'price', 'specifications',
+    'model_codes', 'normalized', 'price_value', 'price_currency', 'price_pairs',
+    'announced_on', 'announced_precision', 'release_on', 'release_precision', 'release_status',
+)
+# 新页面上缺失的原始字段沿用已有值（标准化之前合并，派生字段才会与之一致）
+RAW_FIELDS = ('device_name', 'announced_date', 'release_date', 'price', 'specifications')
+
+# is_stale 需要的字段
+STALENESS_FIELDS = ('refreshed_at', 'updated_at', 'created_at', 'release_status', 'price_value')
+
+_DAY_MS = 24 * 3600 * 1000
+
+
+def _last_checked_expr():
+    return {"$ifNull": ["$refreshed_at", {"$ifNull": ["$updated_at", "$created_at"]}]}
+
+
+def _failure_backoff_expr(now, min_recheck_days):
+    """上次刷新失败后是否已过退避期（退避天数随连续失败次数翻倍，有上限）"""
+    backoff_days = {"$min": [
+        {"$multiply": [min_recheck_days, {"$pow": [2, {"$ifNull": ["$refresh_failures", 1]}]}]},
+        MAX_FAILURE_BACKOFF_DAYS,
+    ]}
+    return {"$or": [
+        {"$eq": [{"$ifNull": ["$refresh_failed_at", None]}, None]},
+        {"$lt": ["$refresh_failed_at", {"$subtract": [now, {"$multiply": [backoff_days, _DAY_MS]}]}]},
+    ]}
+
+
+def staleness_pipeline(now, limit, min_recheck_days=MIN_RECHECK_DAYS):
+    """按陈旧度从高到低挑选候选设备的聚合管道"""
+    recheck_before = now - timedelta(days=min_recheck_days)
+    return [
+        {"$match": {
+            "source_url": {"$regex": "^http"},
+            "$or": [
+                {"refreshed_at": {"$lt": recheck_before}},
+                {"refreshed_at": {"$exists": False}},
+            ],
+            "$expr": _failure_backoff_expr(now, min_recheck_days),
+        }},
+        {"$addFields": {"staleness": {"$add": [
+            {"$divide": [{"$subtract": [now, _last_checked_expr()]}, _DAY_MS]},
+            {"$cond": [{"$eq": [{"$ifNull": ["$price_value", None]}, None]}, MISSING_PRICE_SCORE, 0]},
+            {"$cond": [{"$eq": [{"$ifNull": ["$announced_on", None]}, None]}, MISSING_DATE_SCORE, 0]},
+            {"$cond": [{"$eq": ["$release_status", "expected"]}, EXPECTED_RELEASE_SCORE, 0]},
+        ]}}},
+        {"$sort": {"staleness": -1}},
+        {"$limit": limit},
+    ]
+
+
+def is_stale(doc, now=None):
+    """API 命中的记录是否需要排进刷新"""
+    now = now or datetime.now()
+    last_checked = doc.get('refreshed_at') or doc.get('updated_at') or doc.get('created_at')
+    if not last_checked or now - last_checked > timedelta(days=STALE_AFTER_DAYS):
+        return True
+    if doc.get('release_status') == 'expected':
+        return True
+    return 'price_value' in doc and doc['price_value'] is None
+
+
+def keep_raw_fields(existing, fresh):
+    """新页面上缺失的原始字段用已有值补上（在 apply_normalization 之前调用）"""
+    for field in RAW_FIELDS:
+        if fresh.get(field) in ('', None, {}, 'Unknown') and existing.get(field):
+            fresh[field] = existing[field]
+    return fresh
+
+
+def changed_fields(existing, fresh):
+    """比较新旧文档，返回需要 $set 的字段"""
+    return {field: fresh[field] for field in REFRESH_FIELDS
+            if field in fresh and existing.get(field) != fresh[field]}
+
+
+class DeviceRefresher:
+    def __init__(self, collection, budget=DEFAULT_BUDGET, interval=DEFAULT_INTERVAL,
+                 request_delay=DEFAULT_REQUEST_DELAY):
+        """初始化后台刷新器
+
+        Args:
+            collection: devices 集合
+            budget (int): 每轮最多刷新的设备数
+            interval (int): 两轮之间的间隔（秒）
+            request_delay (float): 两次刷新请求之间的最小间隔（秒）
+        """
+        self.collection = collection
+        self.db = collection.database
+        self.budget = budget
+        self.interval = interval
+        self.request_delay = request_delay
+
+        self.session = requests.Session()
+        self.transport = get_transport()
+        self.transport.mount(self.session)
+        self.scheduler = get_scheduler()
+
+        self.requested = set()
+        self.requested_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_run = {}
+        # 本轮确认未变化、只需更新 refreshed_at 的文档
+        self.unchanged_ids = []
+        # 本轮刷新失败、需要记录失败时间和次数的文档
+        self.failed_ids = []
+
+    def ensure_indexes(self):
+        self.collection.create_index([("refreshed_at", ASCENDING)])
+        self.collection.create_index([("refresh_failed_at", ASCENDING)])
+
+    def request_refresh(self, model_code):
+        """API 命中陈旧记录时调用：下一轮优先刷新（不阻塞请求）"""
+        with self.requested_lock:
+            if len(self.requested) < self.budget * 10:
+                self.requested.add(model_code)
+
+    def candidates(self, limit):
+        """本轮要刷新的设备：API 请求的优先，其余按陈旧度"""
+        with self.requested_lock:
+            requested = list(self.requested)[:limit]
+            self.requested.difference_update(requested)
+
+        docs = list(self.collection.find({"model_code": {"$in": requested}})) if requested else []
+        if len(docs) < limit:
+            seen = {doc["_id"] for doc in docs}
+            for doc in self.collection.aggregate(staleness_pipeline(datetime.now(), limit)):
+                if doc["_id"] not in seen and len(docs) < limit:
+                    docs.append(doc)
+        return docs
+
+    def fetch(self, url, doc):
+        """条件请求：带上次保存的 ETag / Last-Modified"""
+        headers = {}
+        if doc.get('http_etag'):
+            headers['If-None-Match'] = doc['http_etag']
+        if doc.get('http_last_modified'):
+            headers['If-Modified-Since'] = doc['http_last_modified']
+        self.scheduler.wait(url, PRIORITY_REFRESH, self.request_delay)
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def refresh_device(self, doc):
+        """重新抓取一个设备，返回 'changed' / 'unchanged' / 'not_modified' / 'hash_unchanged' / 'failed'"""
+        result = self._refresh_device(doc)
+        if result == 'failed':
+            self.failed_ids.append(doc['_id'])
+        return result
+
+    def _refresh_device(self, doc):
+        try:
+            response = self.fetch(doc['source_url'], doc)
+            validators = {
+                'http_etag': response.headers.get('ETag') or doc.get('http_etag'),
+                'http_last_modified': response.headers.get('Last-Modified') or doc.get('http_last_modified'),
+            }
+            validators_changed = any(doc.get(k) != v for k, v in validators.items())
+
+            if response.status_code == 304:
+                self.unchanged_ids.append(doc['_id'])
+                return 'not_modified'
+
+            content_hash = specs_content_hash(response.content)
+            if content_hash == doc.get('content_hash') and not validators_changed:
+                self.unchanged_ids.append(doc['_id'])
+                return 'hash_unchanged'
+
+            now = datetime.now()
+            update = dict(validators, content_hash=content_hash, refreshed_at=now)
+            changes = {}
+            if content_hash != doc.get('content_hash'):
+                details = parse_device_details(response.content)
+                if not details:
+                    return 'failed'
+
+                fresh = {
+                    'model_code': doc['model_code'],
+                    'device_name': details['name'],
+                    'announced_date': details['announced_date'],
+                    'release_date': details['release_date'],
+                    'price': details['price'],
+                    'specifications': details['specifications'],
+                    'model_codes': details.get('model_codes', []),
+                }
+                apply_normalization(keep_raw_fields(doc, fresh))
+                changes = changed_fields(doc, fresh)
+                update.update(changes)
+                if changes:
+                    update['updated_at'] = now
+            self.collection.update_one({"_id": doc["_id"]},
+                                       {"$set": update, "$unset": {"refresh_failed_at": "", "refresh_failures": ""}})
+
+            if 'model_codes' in changes:
+                index_device_codes(self.db, dict(doc, **changes))
+            if changes:
+                record_update(self.db, doc, dict(doc, **changes))
+            if changes:
+                logger.info(f"🔄 已刷新 {doc['model_code']}: {', '.join(sorted(changes))}")
+                return 'changed'
+            return 'unchanged'
+
+        except Exception as e:
+            logger.warning(f"刷新设备失败 {doc.get('model_code')}: {str(e)}")
+            return 'failed'
+
+    def _flush_unchanged(self):
+        """本轮未变化的文档一次性更新检查时间，失败的文档记录失败时间和次数"""
+        now = datetime.now()
+        if self.unchanged_ids:
+            self.collection.update_many({"_id": {"$in": self.unchanged_ids}},
+                                        {"$set": {"refreshed_at": now},
+                                         "$unset": {"refresh_failed_at": "", "refresh_failures": ""}})
+            self.unchanged_ids = []
+        if self.failed_ids:
+            self.collection.update_many({"_id": {"$in": self.failed_ids}},
+                                        {"$set": {"refresh_failed_at": now}, "$inc": {"refresh_failures": 1}})
+            self.failed_ids = []
+
+    def run_once(self, budget=None):
+        """刷新一轮，返回统计"""
+        started = time.time()
+        stats = {'changed': 0, 'unchanged': 0, 'not_modified': 0, 'hash_unchanged': 0, 'failed': 0}
+        try:
+            for doc in self.candidates(budget or self.budget):
+                if self.stop_event.is_set():
+                    break
+                stats[self.refresh_device(doc)] += 1
+        finally:
+            self._flush_unchanged()
+        stats['skipped'] = stats['not_modified'] + stats['hash_unchanged']
+        stats['seconds'] = round(time.time() - started, 1)
+        self.last_run = stats
+        logger.info(f"📊 刷新完成: {stats}")
+        return stats
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"刷新轮次失败: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self.thread:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='device-refresher', daemon=True)
+        self.thread.start()
+        logger.info(f"🔁 后台刷新已启动: 每 {self.interval} 秒最多刷新 {self.budget} 个设备")
+
+    def stop(self):
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join(timeout=30)
+            self.thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='设备数据后台刷新')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db', default='device_info')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET, help='每轮最多刷新的设备数')
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help='两轮之间的间隔（秒）')
+    parser.add_argument('--delay', type=float, default=DEFAULT_REQUEST_DELAY, help='两次刷新请求之间的间隔（秒）')
+    parser.add_argument('--once', action='store_true', help='只运行一轮')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(args.mongo_uri)
+    refresher = DeviceRefresher(client[args.db]['devices'], args.budget, args.interval, args.delay)
+    refresher.ensure_indexes()
+    try:
+        if args.once:
+            refresher.run_once()
+        else:
+            refresher._loop()
+    except KeyboardInterrupt:
+        logger.info("已停止")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
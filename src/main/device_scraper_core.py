@@ -8,7 +8,6 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import json
-import time
 import logging
 from urllib.parse import urljoin, quote_plus
 from selenium import webdriver
@@ -18,31 +17,138 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import hashlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import queue
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_BULK
+from model_code_index import parse_model_codes
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def specs_content_hash(html):
+    """详情页标题和规格区域的内容摘要（只做字节查找，不解析HTML），页面其它部分（广告、评论数等）变化不影响结果"""
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    digest = hashlib.sha1()
+    title = html.find(b'specs-phone-name-title')
+    if title != -1:
+        digest.update(html[title:html.find(b'</h1>', title)])
+    start = html.find(b'id="specs-list"')
+    end = html.rfind(b'</table>')
+    if start != -1 and end > start:
+        digest.update(html[start:end])
+    else:
+        digest.update(html)
+    return digest.hexdigest()
+
+
+def parse_device_details(html):
+    """解析GSMArena详情页（纯CPU，无网络/共享状态，可以在子进程中运行）
+
+    Args:
+        html (bytes): 详情页原始响应内容
+
+    Returns:
+        dict: device_info，解析失败返回 None
+    """
+    try:
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        device_name = soup.find('h1', class_='specs-phone-name-title')
+        if device_name:
+            device_name = device_name.get_text(strip=True)
+        else:
+            device_name = "Unknown"
+        
+        device_info = {
+            'name': device_name,
+            'model_code': '',
+            'announced_date': '',
+            'release_date': '',
+            'price': '',
+            'specifications': {},
+            'content_hash': specs_content_hash(html)
+        }
+        
+        specs_tables = soup.find_all('table', cellspacing='0')
+        
+        for table in specs_tables:
+            rows = table.find_all('tr')
+            
+            for row in rows:
+                cells = row.find_all(['th', 'td'])
+                if len(cells) >= 2:
+                    cell_texts = [cell.get_text(strip=True) for cell in cells]
+                    
+                    for i, cell_text in enumerate(cell_texts):
+                        if 'Announced' in cell_text and i + 1 < len(cell_texts):
+                            announced_info = cell_texts[i + 1]
+                            device_info['announced_date'] = announced_info
+                            
+                            if 'Released' in announced_info:
+                                parts = announced_info.split('Released')
+                                if len(parts) > 1:
+                                    device_info['release_date'] = f"Released {parts[1].strip()}"
+                                announced_part = parts[0].replace('.', '').strip()
+                                device_info['announced_date'] = announced_part
+                            
+                        elif 'Status' in cell_text and i + 1 < len(cell_texts):
+                            status_info = cell_texts[i + 1]
+                            if not device_info['release_date']:
+                                device_info['release_date'] = status_info
+                            
+                        elif 'Price' in cell_text and i + 1 < len(cell_texts):
+                            price_info = cell_texts[i + 1]
+                            device_info['price'] = price_info
+                            
+                        elif 'Models' in cell_text and i + 1 < len(cell_texts):
+                            models_info = cell_texts[i + 1]
+                            device_info['model_code'] = models_info
+                            device_info['model_codes'] = parse_model_codes(models_info)
+                    
+                    if len(cell_texts) >= 2:
+                        key = next((text for text in cell_texts if text), '')
+                        value = cell_texts[-1]
+                        
+                        if key and value and key != value:
+                            device_info['specifications'][key] = value
+        
+        return device_info
+        
+    except Exception as e:
+        logger.error(f"解析设备详情失败: {str(e)}")
+        return None
+
+
 class DeviceInfoScraper:
-    def __init__(self, max_workers=5, timeout=60, request_delay=5):
+    def __init__(self, max_workers=5, timeout=60, request_delay=5, parse_workers=None, priority=PRIORITY_BULK):
         """初始化设备信息爬虫
         
         Args:
             max_workers (int): 最大并发线程数（默认5个）
             timeout (int): WebDriver超时时间（秒）
             request_delay (int): 请求间隔时间（秒）
+            parse_workers (int): 批量处理时的解析进程数（默认CPU核数，0表示不用进程池）
+            priority (str): 在统一调度器中的优先级（interactive / refresh / bulk）
         """
         self.base_url = "https://www.gsmarena.com"
         self.max_workers = max_workers
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
         self.timeout = timeout
         self.request_delay = request_delay
         self.session = requests.Session()
+        self.transport = get_transport()
+        # 所有线程共用一个session，每个主机的连接池按线程数配置，避免超出后反复握手
+        self.transport.mount(self.session, pool_size=max_workers)
         
-        # 请求时间控制
-        self.last_request_time = {}
-        self.request_lock = threading.Lock()
+        # 请求时间控制（与API实时查询共用调度器，批量任务优先级较低）
+        self.priority = priority
+        self.scheduler = get_scheduler()
         
         # 设置请求头
         self.session.headers.update({
@@ -58,6 +164,10 @@ class DeviceInfoScraper:
             'Cache-Control': 'max-age=0'
         })
         
+        # 解析进程池：第一次批量处理时创建，之后各批次复用，close() 时关闭
+        self.parse_pool = None
+        self.parse_pool_lock = threading.Lock()
+        
         # WebDriver池
         self.driver_pool = queue.Queue()
         self.driver_lock = threading.Lock()
@@ -65,18 +175,11 @@ class DeviceInfoScraper:
         # 初始化WebDriver池
         self._init_driver_pool()
     
-    def _wait_for_request(self, thread_id):
-        """控制请求间隔"""
-        with self.request_lock:
-            current_time = time.time()
-            last_time = self.last_request_time.get(thread_id, 0)
-            
-            if current_time - last_time < self.request_delay:
-                wait_time = self.request_delay - (current_time - last_time)
-                logger.info(f"线程 {thread_id} 等待 {wait_time:.1f} 秒...")
-                time.sleep(wait_time)
-            
-            self.last_request_time[thread_id] = time.time()
+    def _wait_for_request(self, url):
+        """控制请求间隔：经统一调度器按主机限速（每个线程 request_delay 秒一次，即主机间隔 request_delay / 线程数）"""
+        waited = self.scheduler.wait(url, self.priority, self.request_delay / max(self.max_workers, 1))
+        if waited >= 1:
+            logger.info(f"等待 {waited:.1f} 秒后请求 {url}")
     
     def _init_driver_pool(self):
         """初始化WebDriver池"""
@@ -111,7 +214,7 @@ class DeviceInfoScraper:
             chrome_options.add_argument('--disable-images')  # 不加载图片，提高速度
             chrome_options.add_argument(f'--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
             
-            driver = webdriver.Chrome(options=chrome_options)
+            driver = self.transport.create_driver(lambda: webdriver.Chrome(options=chrome_options))
             driver.set_page_load_timeout(self.timeout)
             driver.implicitly_wait(10)
             
@@ -140,8 +243,12 @@ class DeviceInfoScraper:
         """搜索设备（Selenium方式，控制请求频率）"""
         thread_id = threading.current_thread().ident
         
+        # URL编码优化：空格转换为+号
+        encoded_model = quote_plus(model_code)
+        search_url = f"{self.base_url}/res.php3?sSearch={encoded_model}"
+        
         # 控制请求间隔
-        self._wait_for_request(thread_id)
+        self._wait_for_request(search_url)
         
         driver = self._get_driver()
         if not driver:
@@ -149,9 +256,6 @@ class DeviceInfoScraper:
             return self.try_direct_access(model_code)
             
         try:
-            # URL编码优化：空格转换为+号
-            encoded_model = quote_plus(model_code)
-            search_url = f"{self.base_url}/res.php3?sSearch={encoded_model}"
             logger.info(f"搜索设备: {model_code} (线程: {thread_id})")
             
             driver.get(search_url)
@@ -165,7 +269,7 @@ class DeviceInfoScraper:
                 
                 # 等待内容解密
                 wait.until(lambda d: decrypted_element.get_attribute('innerHTML').strip() != '')
-                time.sleep(2)  # 稍微等待确保内容完全加载
+                self.transport.pause(2)  # 稍微等待确保内容完全加载
                 
                 decrypted_content = decrypted_element.get_attribute('innerHTML')
                 if not decrypted_content or decrypted_content.strip() == '':
@@ -246,76 +350,47 @@ class DeviceInfoScraper:
             }
         return None
     
-    def extract_device_details(self, device_url):
-        """提取设备详细信息"""
+    def fetch_device_page(self, device_url):
+        """获取设备详情页原始内容（只做网络I/O）"""
         try:
             response = self.session.get(device_url, timeout=30)
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            device_name = soup.find('h1', class_='specs-phone-name-title')
-            if device_name:
-                device_name = device_name.get_text(strip=True)
-            else:
-                device_name = "Unknown"
-            
-            device_info = {
-                'name': device_name,
-                'model_code': '',
-                'announced_date': '',
-                'release_date': '',
-                'price': '',
-                'specifications': {}
-            }
-            
-            specs_tables = soup.find_all('table', cellspacing='0')
-            
-            for table in specs_tables:
-                rows = table.find_all('tr')
-                
-                for row in rows:
-                    cells = row.find_all(['th', 'td'])
-                    if len(cells) >= 2:
-                        cell_texts = [cell.get_text(strip=True) for cell in cells]
-                        
-                        for i, cell_text in enumerate(cell_texts):
-                            if 'Announced' in cell_text and i + 1 < len(cell_texts):
-                                announced_info = cell_texts[i + 1]
-                                device_info['announced_date'] = announced_info
-                                
-                                if 'Released' in announced_info:
-                                    parts = announced_info.split('Released')
-                                    if len(parts) > 1:
-                                        device_info['release_date'] = f"Released {parts[1].strip()}"
-                                    announced_part = parts[0].replace('.', '').strip()
-                                    device_info['announced_date'] = announced_part
-                                
-                            elif 'Status' in cell_text and i + 1 < len(cell_texts):
-                                status_info = cell_texts[i + 1]
-                                if not device_info['release_date']:
-                                    device_info['release_date'] = status_info
-                                
-                            elif 'Price' in cell_text and i + 1 < len(cell_texts):
-                                price_info = cell_texts[i + 1]
-                                device_info['price'] = price_info
-                                
-                            elif 'Models' in cell_text and i + 1 < len(cell_texts):
-                                models_info = cell_texts[i + 1]
-                                device_info['model_code'] = models_info
-                        
-                        if len(cell_texts) >= 2:
-                            key = next((text for text in cell_texts if text), '')
-                            value = cell_texts[-1]
-                            
-                            if key and value and key != value:
-                                device_info['specifications'][key] = value
-            
-            return device_info
-            
+            return response.content
         except Exception as e:
-            logger.error(f"提取设备详情失败: {str(e)}")
+            logger.error(f"获取设备详情页失败: {str(e)}")
+            return None
+    
+    def extract_device_details(self, device_url):
+        """提取设备详细信息"""
+        html = self.fetch_device_page(device_url)
+        if html is None:
             return None
+        return parse_device_details(html)
+    
+    def _build_result(self, model_code, search_result, device_details):
+        """组装 get_device_info 的返回结果"""
+        if not device_details:
+            return {
+                'success': False,
+                'message': f'无法获取设备 {search_result["name"]} 的详细信息'
+            }
+        
+        return {
+            'success': True,
+            'source': 'scraper',
+            'data': {
+                'search_model': model_code,
+                'device_name': device_details['name'],
+                'model_code': device_details['model_code'],
+                'model_codes': device_details.get('model_codes', []),
+                'announced_date': device_details['announced_date'],
+                'release_date': device_details['release_date'],
+                'price': device_details['price'],
+                'source_url': search_result['url'],
+                'specifications': device_details['specifications'],
+                'content_hash': device_details.get('content_hash')
+            }
+        }
     
     def get_device_info(self, model_code):
         """获取单个设备信息"""
@@ -328,88 +403,129 @@ class DeviceInfoScraper:
                 }
             
             device_details = self.extract_device_details(search_result['url'])
-            if not device_details:
-                return {
+            return self._build_result(model_code, search_result, device_details)
+            
+        except Exception as e:
+            logger.error(f"获取设备信息失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'获取设备信息时发生错误: {str(e)}'
+            }
+    
+    def fetch_device(self, model_code):
+        """批量处理的抓取阶段：搜索 + 下载详情页，不做解析
+
+        Returns:
+            (search_result, html)；失败时返回 (None, 失败结果dict)
+        """
+        try:
+            search_result = self.search_device(model_code)
+            if not search_result:
+                return None, {
                     'success': False,
-                    'message': f'无法获取设备 {search_result["name"]} 的详细信息'
+                    'message': f'未找到型号 {model_code} 的设备信息'
                 }
             
-            result = {
-                'success': True,
-                'source': 'scraper',
-                'data': {
-                    'search_model': model_code,
-                    'device_name': device_details['name'],
-                    'model_code': device_details['model_code'],
-                    'announced_date': device_details['announced_date'],
-                    'release_date': device_details['release_date'],
-                    'price': device_details['price'],
-                    'source_url': search_result['url'],
-                    'specifications': device_details['specifications']
+            html = self.fetch_device_page(search_result['url'])
+            if html is None:
+                return None, {
+                    'success': False,
+                    'message': f'无法获取设备 {search_result["name"]} 的详细信息'
                 }
-            }
-            
-            return result
+            return search_result, html
             
         except Exception as e:
             logger.error(f"获取设备信息失败: {str(e)}")
-            return {
+            return None, {
                 'success': False,
                 'message': f'获取设备信息时发生错误: {str(e)}'
             }
     
+    def _get_parse_pool(self):
+        """返回共用的解析进程池（parse_workers=0 时为 None）"""
+        if self.parse_workers <= 0:
+            return None
+        with self.parse_pool_lock:
+            if self.parse_pool is None:
+                # 抓取线程已在运行，fork 带锁的多线程进程可能死锁，解析进程用 spawn 启动
+                self.parse_pool = ProcessPoolExecutor(
+                    max_workers=self.parse_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self.parse_pool
+    
     def batch_get_device_info(self, device_list, progress_callback=None):
-        """批量并行获取设备信息"""
+        """批量并行获取设备信息
+        
+        抓取线程只做搜索和下载；详情页解析交给进程池（parse_workers 个进程），不再和抓取线程争GIL。
+        进程池在多次调用之间复用（分布式导入每批只有几个设备），用完后需调用 close()。
+        parse_workers=0 时在主线程中解析。
+        """
         results = []
         failed_devices = []
+        total = len(device_list)
+        completed = 0
         
-        logger.info(f"开始并行处理 {len(device_list)} 个设备，线程数: {self.max_workers}")
+        logger.info(f"开始并行处理 {total} 个设备，抓取线程数: {self.max_workers}，解析进程数: {self.parse_workers}")
         
+        def finish(device, result):
+            nonlocal completed
+            completed += 1
+            if result['success']:
+                # 添加制造商信息
+                result['data']['manufacture'] = device['manufacture']
+                results.append({
+                    'device_info': device,
+                    'scrape_result': result
+                })
+                logger.info(f"✅ [{completed}/{total}] 成功: {device['model_code']} - {result['data']['device_name']}")
+            else:
+                failed_devices.append(device)
+                logger.warning(f"❌ [{completed}/{total}] 失败: {device['model_code']} - {result['message']}")
+            
+            # 调用进度回调
+            if progress_callback:
+                progress_callback(completed, total, len(results), len(failed_devices))
+        
+        parse_pool = self._get_parse_pool()
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交所有任务
-            future_to_device = {
-                executor.submit(self.get_device_info, device['model_code']): device 
+            # future -> (阶段, 设备, 搜索结果)
+            pending = {
+                executor.submit(self.fetch_device, device['model_code']): ('fetch', device, None)
                 for device in device_list
             }
             
-            completed = 0
-            total = len(device_list)
-            
-            # 处理完成的任务
-            for future in as_completed(future_to_device):
-                device = future_to_device[future]
-                completed += 1
-                
-                try:
-                    result = future.result()
-                    if result['success']:
-                        # 添加制造商信息
-                        result['data']['manufacture'] = device['manufacture']
-                        results.append({
-                            'device_info': device,
-                            'scrape_result': result
-                        })
-                        logger.info(f"✅ [{completed}/{total}] 成功: {device['model_code']} - {result['data']['device_name']}")
-                    else:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, device, search_result = pending.pop(future)
+                    try:
+                        if stage == 'fetch':
+                            search_result, payload = future.result()
+                            if search_result is None:
+                                finish(device, payload)
+                            elif parse_pool:
+                                pending[parse_pool.submit(parse_device_details, payload)] = ('parse', device, search_result)
+                            else:
+                                finish(device, self._build_result(device['model_code'], search_result,
+                                                                  parse_device_details(payload)))
+                        else:
+                            finish(device, self._build_result(device['model_code'], search_result, future.result()))
+                    except Exception as e:
+                        completed += 1
                         failed_devices.append(device)
-                        logger.warning(f"❌ [{completed}/{total}] 失败: {device['model_code']} - {result['message']}")
-                        
-                except Exception as e:
-                    failed_devices.append(device)
-                    logger.error(f"❌ [{completed}/{total}] 异常: {device['model_code']} - {str(e)}")
-                
-                # 调用进度回调
-                if progress_callback:
-                    progress_callback(completed, total, len(results), len(failed_devices))
-                
-                # 添加小延迟避免过于频繁
-                time.sleep(0.1)
+                        logger.error(f"❌ [{completed}/{total}] 异常: {device['model_code']} - {str(e)}")
         
         logger.info(f"批量处理完成: 成功 {len(results)}, 失败 {len(failed_devices)}")
+        logger.info(f"🔌 连接复用: {self.transport.connection_stats()}")
         return results, failed_devices
     
     def close(self):
-        """关闭所有WebDriver"""
+        """关闭解析进程池和所有WebDriver"""
+        with self.parse_pool_lock:
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown()
+                self.parse_pool = None
+        
         logger.info("正在关闭WebDriver池...")
         
         # 关闭池中的所有WebDriver
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备搜索索引 - 内存中的三元组(trigram) + 前缀索引
+对 device_name / model_code / manufacture 建索引，返回按相关度排序的结果，
+替代 $or + $regex 的全表扫描。
+
+索引首次使用时全量加载（只读取搜索字段），之后按 updated_at 水位增量刷新；
+同一进程内的写入方也可以直接调用 upsert() 立即生效。
+"""
+
+import re
+import bisect
+import heapq
+import logging
+import threading
+import time
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = {"model_code": 1, "device_name": 1, "manufacture": 1, "price": 1, "updated_at": 1}
+DEFAULT_REFRESH_INTERVAL = 30
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text):
+    """小写并把非字母数字字符变成空格"""
+    return _NON_ALNUM.sub(' ', str(text or '').lower()).strip()
+
+
+def trigrams(text):
+    """文本的三元组集合；每个词单独加边界，另外加上去掉空格的整体形式（匹配 "sm a155" ↔ "SM-A155F"）"""
+    grams = set()
+    normalized = normalize_text(text)
+    if not normalized:
+        return grams
+    words = normalized.split()
+    for word in words + [''.join(words)]:
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def ensure_search_indexes(collection):
+    """增量刷新按 updated_at 查询"""
+    collection.create_index([("updated_at", ASCENDING)])
+
+
+class DeviceSearchIndex:
+    def __init__(self, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        """初始化搜索索引
+
+        Args:
+            refresh_interval (int): 两次增量刷新之间的最短间隔（秒）
+        """
+        self.refresh_interval = refresh_interval
+        self.lock = threading.RLock()
+        self.entries = {}       # model_code -> 设备摘要
+        self.grams = {}         # model_code -> 该设备的三元组集合
+        self.forms = {}         # model_code -> (型号, 名称, 制造商) 的规范化形式
+        self.postings = {}      # 三元组 -> model_code 集合
+        self.tokens = ([], [], [])  # 型号/名称/制造商 各一个排好序的 (词, model_code) 列表，用于短查询的前缀匹配
+        self.tokens_dirty = False
+        self.watermark = None
+        self.loaded = False
+        self.last_refresh = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remove(self, model_code):
+        self.forms.pop(model_code, None)
+        for gram in self.grams.pop(model_code, ()):
+            codes = self.postings.get(gram)
+            if codes:
+                codes.discard(model_code)
+                if not codes:
+                    del self.postings[gram]
+        if self.entries.pop(model_code, None) is not None:
+            self.tokens_dirty = True
+
+    def upsert(self, device):
+        """加入或更新一台设备（写入方在入库后调用）"""
+        model_code = device.get('model_code')
+        if not model_code:
+            return
+        entry = {field: device.get(field, '') for field in ('model_code', 'device_name', 'manufacture', 'price')}
+        grams = set()
+        for field in ('model_code', 'device_name', 'manufacture'):
+            grams |= trigrams(entry[field])
+
+        with self.lock:
+            self._remove(model_code)
+            self.entries[model_code] = entry
+            self.grams[model_code] = grams
+            self.forms[model_code] = (
+                normalize_text(entry['model_code']).replace(' ', ''),
+                normalize_text(entry['device_name']),
+                normalize_text(entry['manufacture']),
+            )
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(model_code)
+            self.tokens_dirty = True
+            updated_at = device.get('updated_at')
+            if updated_at and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+
+    def remove(self, model_code):
+        with self.lock:
+            self._remove(model_code)
+
+    def load(self, collection):
+        """全量加载（只读取搜索字段）"""
+        start_time = time.time()
+        with self.lock:
+            self.entries, self.grams, self.forms, self.postings = {}, {}, {}, {}
+            self.watermark = None
+            for device in collection.find({}, SEARCH_FIELDS, batch_size=1000):
+                self.upsert(device)
+            self._rebuild_tokens()
+            self.loaded = True
+            self.last_refresh = time.time()
+        logger.info(f"搜索索引加载完成: {len(self.entries)} 台设备, 耗时 {time.time() - start_time:.2f}秒")
+
+    def refresh(self, collection, force=False):
+        """增量刷新：读取 updated_at 大于水位的文档"""
+        if not self.loaded:
+            self.load(collection)
+            return len(self.entries)
+        if not force and time.time() - self.last_refresh < self.refresh_interval:
+            return 0
+
+        with self.lock:
+            # 用 $gte: 与水位同一时刻写入的文档也要取到，重复 upsert 无副作用
+            query = {"updated_at": {"$gte": self.watermark}} if self.watermark else {}
+            changed = 0
+            for device in collection.find(query, SEARCH_FIELDS):
+                self.upsert(device)
+                changed += 1
+            if changed:
+                self._rebuild_tokens()
+            self.last_refresh = time.time()
+        if changed:
+            logger.info(f"搜索索引增量刷新: {changed} 台设备")
+        return changed
+
+    def _rebuild_tokens(self):
+        tokens = ([], [], [])
+        for model_code, (code, name, brand) in self.forms.items():
+            tokens[0].append((code, model_code))
+            words = set(name.split()) | {name.replace(' ', '')}
+            tokens[1].extend((word, model_code) for word in words if word)
+            if brand:
+                tokens[2].append((brand.replace(' ', ''), model_code))
+        for field_tokens in tokens:
+            field_tokens.sort()
+        self.tokens = tokens
+        self.tokens_dirty = False
+
+    def _prefix_search(self, prefix, limit):
+        """短查询（少于3个字符）：按词前缀匹配
+
+        按得分从高到低逐档取结果，取够 limit 条就停，不扫描全部匹配项
+        档位（字段, 是否完全相等, 得分）: 型号 > 名称 > 制造商，完全相等 > 前缀
+        """
+        if self.tokens_dirty:
+            self._rebuild_tokens()
+        tiers = [(0, True, 2.5), (1, True, 2.0), (0, False, 1.5), (2, True, 1.5), (1, False, 1.0), (2, False, 0.5)]
+
+        ranked = []
+        seen = set()
+        for field, exact, score in tiers:
+            field_tokens = self.tokens[field]
+            i = bisect.bisect_left(field_tokens, (prefix,))
+            while i < len(field_tokens) and field_tokens[i][0].startswith(prefix):
+                word, model_code = field_tokens[i]
+                i += 1
+                if exact and word != prefix:
+                    break
+                if word == prefix and not exact or model_code in seen:
+                    continue
+                seen.add(model_code)
+                ranked.append((model_code, score))
+                if len(ranked) >= limit:
+                    return ranked
+        return ranked
+
+    def _score(self, query, query_grams, model_code):
+        compact_query = query.replace(' ', '')
+        code, name, brand = self.forms[model_code]
+
+        score = len(query_grams & self.grams[model_code]) / len(query_grams)
+
+        if compact_query == code:
+            score += 3.0
+        elif code.startswith(compact_query):
+            score += 1.5
+        if query == name or compact_query == name.replace(' ', ''):
+            score += 2.0
+        elif name.startswith(query) or any(word.startswith(query) for word in name.split()):
+            score += 1.0
+        if query == brand:
+            score += 0.5
+        return score
+
+    def _gram_candidates(self, query_grams, min_overlap):
+        """至少共享 min_overlap 个三元组的设备
+
+        只需要合并最稀有的 n - min_overlap + 1 个三元组的倒排表：
+        共享 min_overlap 个以上三元组的设备必然出现在其中之一
+        """
+        ranked = sorted(query_grams, key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = set()
+        for gram in ranked[:len(ranked) - min_overlap + 1]:
+            candidates.update(self.postings.get(gram, ()))
+        return candidates
+
+    def search(self, keyword, limit=10, min_overlap=0.5):
+        """搜索设备
+
+        Args:
+            keyword (str): 关键词（名称、型号或制造商，支持部分匹配）
+            limit (int): 最多返回条数
+            min_overlap (float): 候选设备至少要共享的查询三元组比例
+
+        Returns:
+            按得分排序的 [{model_code, device_name, manufacture, price, score}]
+        """
+        query = normalize_text(keyword)
+        if not query:
+            return []
+
+        with self.lock:
+            if len(query.replace(' ', '')) < 3:
+                ranked = self._prefix_search(query.replace(' ', ''), limit)
+            else:
+                query_grams = trigrams(query)
+                required = max(1, int(len(query_grams) * min_overlap))
+                scored = []
+                for model_code in self._gram_candidates(query_grams, required):
+                    if len(query_grams & self.grams[model_code]) >= required:
+                        scored.append((model_code, self._score(query, query_grams, model_code)))
+                ranked = heapq.nlargest(limit, scored, key=lambda item: (item[1], item[0]))
+
+            return [dict(self.entries[model_code], score=round(score, 3)) for model_code, score in ranked]
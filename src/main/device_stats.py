@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备统计汇总
+总数 / 有价格 / 有日期 / 各品牌设备数 保存在 device_stats 集合的一个汇总文档里，
+写入设备的代码（导入、恢复、后台刷新）插入或修改文档时用 $inc 增量更新计数，
+统计接口只读这一个文档（O(1)），不再每次对 devices 做多次全表 count。
+
+增量计数可能因进程崩溃、手工修改数据等原因漂移，reconcile() 用一次聚合重新计算并覆盖汇总文档，
+由 StatsReconciler 定期执行（或 python device_stats.py --once 手动执行）；汇总文档不存在时首次读取会先对账一次。
+
+口径与原来的 count_documents 一致: 有价格 = price != ""，有日期 = announced_date != ""。
+
+用法:
+  python device_stats.py --once
+  python device_stats.py --interval 3600
+"""
+
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = 'device_stats'
+SUMMARY_ID = 'devices'
+DEFAULT_RECONCILE_INTERVAL = 3600
+UNKNOWN_BRAND = 'Unknown'
+TOP_BRANDS = 10
+
+
+def brand_key(manufacture):
+    """品牌名作为字段名（去掉 Mongo 字段名中不能出现的 . 和开头的 $）"""
+    name = str(manufacture or '').strip() or UNKNOWN_BRAND
+    return name.replace('.', '_').lstrip('$') or UNKNOWN_BRAND
+
+
+def contribution(doc):
+    """一个设备文档对各计数的贡献"""
+    return {
+        'total': 1,
+        'with_price': int(doc.get('price') != ''),
+        'with_date': int(doc.get('announced_date') != ''),
+        f'brands.{brand_key(doc.get("manufacture"))}': 1,
+    }
+
+
+def _apply(db, increments):
+    increments = {field: value for field, value in increments.items() if value}
+    if not increments:
+        return
+    try:
+        db[STATS_COLLECTION].update_one(
+            {"_id": SUMMARY_ID},
+            {"$inc": increments, "$set": {"updated_at": datetime.now()}},
+            upsert=True
+        )
+    except Exception as e:
+        # 统计失败不影响设备写入，下次对账时修正
+        logger.warning(f"更新统计汇总失败: {str(e)}")
+
+
+def record_insert(db, doc):
+    """插入设备文档后调用"""
+    _apply(db, contribution(doc))
+
+
+def record_delete(db, doc):
+    """删除设备文档后调用"""
+    _apply(db, {field: -value for field, value in contribution(doc).items()})
+
+
+def record_update(db, old_doc, new_doc):
+    """修改设备文档后调用（new_doc 为修改后的完整字段）"""
+    increments = {field: -value for field, value in contribution(old_doc).items()}
+    for field, value in contribution(new_doc).items():
+        increments[field] = increments.get(field, 0) + value
+    _apply(db, increments)
+
+
+def record_batch(db, changes):
+    """批量写入后一次性更新计数
+
+    Args:
+        changes (list): [(修改前的文档或 None, 修改后的文档)]
+    """
+    increments = {}
+    for old_doc, new_doc in changes:
+        if old_doc is not None:
+            for field, value in contribution(old_doc).items():
+                increments[field] = increments.get(field, 0) - value
+        for field, value in contribution(new_doc).items():
+            increments[field] = increments.get(field, 0) + value
+    _apply(db, increments)
+
+
+def compute_stats(db):
+    """一次聚合扫描算出全部计数"""
+    facet = {
+        "counts": [{"$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "with_price": {"$sum": {"$cond": [{"$ne": ["$price", ""]}, 1, 0]}},
+            "with_date": {"$sum": {"$cond": [{"$ne": ["$announced_date", ""]}, 1, 0]}},
+        }}],
+        "brands": [{"$group": {"_id": "$manufacture", "count": {"$sum": 1}}}],
+    }
+    result = next(db['devices'].aggregate([{"$facet": facet}]), {})
+    counts = (result.get('counts') or [{}])[0]
+    brands = {}
+    for row in result.get('brands', []):
+        key = brand_key(row['_id'])
+        brands[key] = brands.get(key, 0) + row['count']
+    return {
+        'total': counts.get('total', 0),
+        'with_price': counts.get('with_price', 0),
+        'with_date': counts.get('with_date', 0),
+        'brands': brands,
+    }
+
+
+def reconcile(db):
+    """重新计算并覆盖汇总文档，返回新的汇总；与原计数不一致时记录漂移"""
+    started = time.time()
+    stats = compute_stats(db)
+    collection = db[STATS_COLLECTION]
+    previous = collection.find_one({"_id": SUMMARY_ID})
+    now = datetime.now()
+    collection.replace_one(
+        {"_id": SUMMARY_ID},
+        dict(stats, updated_at=now, reconciled_at=now),
+        upsert=True
+    )
+
+    if previous:
+        drift = {field: stats[field] - previous.get(field, 0)
+                 for field in ('total', 'with_price', 'with_date') if stats[field] != previous.get(field, 0)}
+        if drift:
+            logger.warning(f"⚠️ 统计汇总有漂移，已修正: {drift}")
+    logger.info(f"📊 统计对账完成: 共 {stats['total']} 台设备（{time.time() - started:.1f} 秒）")
+    return dict(stats, reconciled_at=now)
+
+
+def get_summary(db):
+    """读取汇总文档（不存在时先对账）"""
+    summary = db[STATS_COLLECTION].find_one({"_id": SUMMARY_ID})
+    if summary is None:
+        summary = reconcile(db)
+    return summary
+
+
+def format_stats(summary, top_brands=TOP_BRANDS):
+    """转换为原 get_stats 的返回格式，另附品牌分布"""
+    total = summary.get('total', 0)
+    with_price = summary.get('with_price', 0)
+    with_date = summary.get('with_date', 0)
+    brands = sorted(((name, count) for name, count in (summary.get('brands') or {}).items() if count > 0),
+                    key=lambda item: -item[1])
+    return {
+        "total_devices": total,
+        "devices_with_price": with_price,
+        "devices_with_date": with_date,
+        "price_coverage": f"{with_price/total*100:.1f}%" if total > 0 else "0%",
+        "date_coverage": f"{with_date/total*100:.1f}%" if total > 0 else "0%",
+        "brands": [{"manufacture": name, "count": count} for name, count in brands[:top_brands]],
+        "reconciled_at": summary.get('reconciled_at'),
+    }
+
+
+def device_stats(db):
+    """统计接口共用：读汇总文档并格式化"""
+    return format_stats(get_summary(db))
+
+
+class StatsReconciler:
+    def __init__(self, db, interval=DEFAULT_RECONCILE_INTERVAL):
+        """定期对账
+
+        Args:
+            db: pymongo Database
+            interval (int): 两次对账之间的间隔（秒）
+        """
+        self.db = db
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                reconcile(self.db)
+            except Exception as e:
+                logger.error(f"统计对账失败: {str(e)}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        """启动后台对账线程"""
+        if self.thread:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name='stats-reconciler', daemon=True)
+        self.thread.start()
+        logger.info(f"📊 统计对账已启动: 每 {self.interval} 秒一次")
+
+    def stop(self):
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join(timeout=30)
+            self.thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='设备统计汇总对账')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db', default='device_info')
+    parser.add_argument('--interval', type=int, default=DEFAULT_RECONCILE_INTERVAL, help='两次对账之间的间隔（秒）')
+    parser.add_argument('--once', action='store_true', help='只对账一次')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(args.mongo_uri)
+    try:
+        if args.once:
+            print(format_stats(reconcile(client[args.db])))
+        else:
+            StatsReconciler(client[args.db], args.interval)._loop()
+    except KeyboardInterrupt:
+        logger.info("已停止")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
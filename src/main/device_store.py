@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备存储后端
+DeviceDBManager / DataImporter / HybridDeviceScraper / DeviceInfoService 通过 open_store() 取得存储，
+按连接串选择后端:
+  mongodb://...         MongoDB（默认），型号反向索引、统计汇总沿用 model_code_index / device_stats
+  sqlite:///path.db     内嵌 SQLite（WAL 模式），不需要数据库服务，适合边缘部署和 CI
+
+两个后端提供相同的操作: 按型号查询（含兄弟型号反向索引）、插入/更新、批量 upsert、投影、统计。
+设备列表筛选、搜索、后台刷新、分布式队列等依赖 MongoDB 聚合的功能在 SQLite 后端下不可用。
+
+SQLite 表结构:
+  devices(model_code 主键, 常用字段列, doc JSON)  完整文档存在 doc 列，日期以 {"$date": ISO} 保存
+  device_codes(code 主键, model_code)             型号反向索引
+  device_stats(key 主键, count)                   触发器维护的计数（total / with_price / with_date / brand:品牌）
+
+环境变量:
+  DEVICE_STORE  覆盖各组件默认的 MongoDB 连接串，如 sqlite:///data/devices.db
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+from pymongo import MongoClient, UpdateOne
+
+from device_normalizer import ensure_normalized_indexes
+from model_code_index import canonical_code, device_model_codes, find_by_code, index_device_codes, known_codes
+from device_stats import UNKNOWN_BRAND, device_stats, format_stats, record_batch, record_insert, record_update
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SCHEME = 'sqlite://'
+BACKEND_MONGODB = 'mongodb'
+BACKEND_SQLITE = 'sqlite'
+
+
+def _project(doc, projection):
+    """在内存中按 Mongo 风格的投影裁剪文档（支持包含式和排除式，包含式支持 a.b 点路径）"""
+    if not projection:
+        return doc
+    included = [field for field, value in projection.items() if value and field != '_id']
+    if not included:
+        excluded = {field for field, value in projection.items() if not value}
+        return {key: value for key, value in doc.items() if key not in excluded}
+
+    result = {}
+    for field in included:
+        if '.' in field:
+            parent, child = field.split('.', 1)
+            value = doc.get(parent)
+            if isinstance(value, dict) and child in value:
+                result.setdefault(parent, {})[child] = value[child]
+        elif field in doc:
+            result[field] = doc[field]
+    return result
+
+
+class MongoDeviceStore:
+    backend = BACKEND_MONGODB
+
+    def __init__(self, uri="mongodb://localhost:27017/", db_name="device_info"):
+        """MongoDB 后端
+
+        Args:
+            uri (str): MongoDB 连接串
+            db_name (str): 数据库名
+        """
+        self.client = MongoClient(uri)
+        self.db = self.client[db_name]
+        self.collection = self.db['devices']
+
+    def ensure_indexes(self):
+        self.collection.create_index("model_code", unique=True)
+        self.collection.create_index("device_name")
+        ensure_normalized_indexes(self.collection)
+
+    def find_device(self, model_code, projection=None):
+        """按型号查询（本身不存在时通过反向索引找兄弟型号）"""
+        return find_by_code(self.db, model_code, projection)
+
+    def find_exact(self, model_code, projection=None):
+        """只按 model_code 精确查询"""
+        return self.collection.find_one({"model_code": model_code}, projection)
+
+    def insert_device(self, doc):
+        self.collection.insert_one(doc)
+        index_device_codes(self.db, doc)
+        record_insert(self.db, doc)
+
+    def update_device(self, existing, doc):
+        """用 doc 的字段更新已有文档"""
+        self.collection.update_one({"model_code": existing['model_code']}, {"$set": doc})
+        index_device_codes(self.db, doc)
+        record_update(self.db, existing, dict(existing, **doc))
+
+    def bulk_upsert(self, docs):
+        """按 model_code 批量 upsert（$set 合并），返回写入的文档数"""
+        if not docs:
+            return 0
+        existing = {doc['model_code']: doc for doc in self.collection.find(
+            {"model_code": {"$in": [doc['model_code'] for doc in docs]}},
+            {"_id": 0, "model_code": 1, "price": 1, "announced_date": 1, "manufacture": 1}
+        )}
+        self.collection.bulk_write(
+            [UpdateOne({"model_code": doc['model_code']}, {"$set": doc}, upsert=True) for doc in docs],
+            ordered=False
+        )
+        for doc in docs:
+            index_device_codes(self.db, doc)
+        old_docs = [existing.get(doc['model_code']) for doc in docs]
+        record_batch(self.db, [(old, dict(old or {}, **doc)) for old, doc in zip(old_docs, docs)])
+        return len(docs)
+
+    def model_codes(self):
+        """全部设备的 model_code"""
+        return [doc['model_code'] for doc in self.collection.find({}, {"_id": 0, "model_code": 1})]
+
+    def known_codes(self):
+        return known_codes(self.db)
+
+    def iter_devices(self, projection=None, limit=None):
+        cursor = self.collection.find({}, projection)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def stats(self):
+        return device_stats(self.db)
+
+    def close(self):
+        self.client.close()
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"无法序列化: {type(value).__name__}")
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    model_code TEXT PRIMARY KEY,
+    device_name TEXT,
+    manufacture TEXT,
+    price TEXT,
+    announced_date TEXT,
+    updated_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_devices_device_name ON devices(device_name);
+CREATE INDEX IF NOT EXISTS idx_devices_manufacture ON devices(manufacture);
+
+CREATE TABLE IF NOT EXISTS device_codes (
+    code TEXT PRIMARY KEY,
+    model_code TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_device_codes_model_code ON device_codes(model_code);
+
+CREATE TABLE IF NOT EXISTS device_stats (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_devices_stats_insert AFTER INSERT ON devices BEGIN
+    INSERT INTO device_stats(key, count) VALUES ('total', 1)
+        ON CONFLICT(key) DO UPDATE SET count = count + 1;
+    INSERT INTO device_stats(key, count) VALUES ('with_price', NEW.price IS NOT '')
+        ON CONFLICT(key) DO UPDATE SET count = count + (NEW.price IS NOT '');
+    INSERT INTO device_stats(key, count) VALUES ('with_date', NEW.announced_date IS NOT '')
+        ON CONFLICT(key) DO UPDATE SET count = count + (NEW.announced_date IS NOT '');
+    INSERT INTO device_stats(key, count)
+        VALUES ('brand:' || COALESCE(NULLIF(TRIM(NEW.manufacture), ''), '{unknown}'), 1)
+        ON CONFLICT(key) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_devices_stats_delete AFTER DELETE ON devices BEGIN
+    UPDATE device_stats SET count = count - 1 WHERE key = 'total';
+    UPDATE device_stats SET count = count - (OLD.price IS NOT '') WHERE key = 'with_price';
+    UPDATE device_stats SET count = count - (OLD.announced_date IS NOT '') WHERE key = 'with_date';
+    UPDATE device_stats SET count = count - 1
+        WHERE key = 'brand:' || COALESCE(NULLIF(TRIM(OLD.manufacture), ''), '{unknown}');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_devices_stats_update AFTER UPDATE OF price, announced_date, manufacture ON devices BEGIN
+    UPDATE device_stats SET count = count - (OLD.price IS NOT '') + (NEW.price IS NOT '') WHERE key = 'with_price';
+    UPDATE device_stats SET count = count - (OLD.announced_date IS NOT '') + (NEW.announced_date IS NOT '')
+        WHERE key = 'with_date';
+    UPDATE device_stats SET count = count - 1
+        WHERE key = 'brand:' || COALESCE(NULLIF(TRIM(OLD.manufacture), ''), '{unknown}');
+    INSERT INTO device_stats(key, count)
+        VALUES ('brand:' || COALESCE(NULLIF(TRIM(NEW.manufacture), ''), '{unknown}'), 1)
+        ON CONFLICT(key) DO UPDATE SET count = count + 1;
+END;
+""".replace('{unknown}', UNKNOWN_BRAND)
+
+_UPSERT_SQL = """
+INSERT INTO devices (model_code, device_name, manufacture, price, announced_date, updated_at, doc)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(model_code) DO UPDATE SET
+    device_name = excluded.device_name,
+    manufacture = excluded.manufacture,
+    price = excluded.price,
+    announced_date = excluded.announced_date,
+    updated_at = excluded.updated_at,
+    doc = excluded.doc
+"""
+
+
+class SQLiteDeviceStore:
+    backend = BACKEND_SQLITE
+    # 依赖 MongoDB 的功能（列表筛选、搜索、刷新、分布式队列）据此判断是否可用
+    client = None
+    db = None
+    collection = None
+
+    def __init__(self, path):
+        """内嵌 SQLite 后端（WAL 模式：写入时其它连接/进程仍可并发读）
+
+        Args:
+            path (str): 数据库文件路径（:memory: 表示内存库）
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
+    def ensure_indexes(self):
+        with self.lock:
+            self.conn.executescript(_SQLITE_SCHEMA)
+
+    @staticmethod
+    def _dumps(doc):
+        doc = {key: value for key, value in doc.items() if key != '_id'}
+        return json.dumps(doc, ensure_ascii=False, default=_encode_value)
+
+    @staticmethod
+    def _loads(text):
+        return json.loads(text, object_hook=_decode_object)
+
+    @staticmethod
+    def _text(value):
+        if value is None:
+            return None
+        return value.isoformat() if isinstance(value, datetime) else str(value)
+
+    def _row(self, doc):
+        return (
+            doc['model_code'], self._text(doc.get('device_name')), self._text(doc.get('manufacture')),
+            self._text(doc.get('price')), self._text(doc.get('announced_date')),
+            self._text(doc.get('updated_at')), self._dumps(doc),
+        )
+
+    def _index_codes(self, doc):
+        codes = doc.get('model_codes') or device_model_codes(doc)
+        if codes:
+            self.conn.executemany(
+                "INSERT INTO device_codes (code, model_code) VALUES (?, ?) "
+                "ON CONFLICT(code) DO UPDATE SET model_code = excluded.model_code",
+                [(code, doc['model_code']) for code in codes]
+            )
+
+    def find_exact(self, model_code, projection=None):
+        with self.lock:
+            row = self.conn.execute("SELECT doc FROM devices WHERE model_code = ?", (model_code,)).fetchone()
+        return _project(self._loads(row[0]), projection) if row else None
+
+    def find_device(self, model_code, projection=None):
+        """按型号查询（本身不存在时通过反向索引找兄弟型号）"""
+        device = self.find_exact(model_code, projection)
+        if device:
+            return device
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT d.doc FROM device_codes c JOIN devices d ON d.model_code = c.model_code WHERE c.code = ?",
+                (canonical_code(model_code),)
+            ).fetchone()
+        if not row:
+            return None
+        device = self._loads(row[0])
+        logger.info(f"🔗 型号 {model_code} 通过反向索引命中 {device['model_code']}")
+        return _project(device, projection)
+
+    def insert_device(self, doc):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute(
+                    "INSERT INTO devices (model_code, device_name, manufacture, price, announced_date, updated_at, doc) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", self._row(doc)
+                )
+                self._index_codes(doc)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def update_device(self, existing, doc):
+        """用 doc 的字段更新已有文档"""
+        self.bulk_upsert([dict(doc, model_code=existing['model_code'])])
+
+    def bulk_upsert(self, docs):
+        """按 model_code 批量 upsert（与 $set 一样合并已有字段），一个事务内完成，返回写入的文档数"""
+        if not docs:
+            return 0
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                merged = []
+                codes = [doc['model_code'] for doc in docs]
+                existing = {}
+                # SQLite 默认最多 999 个绑定参数
+                for start in range(0, len(codes), 900):
+                    chunk = codes[start:start + 900]
+                    rows = self.conn.execute(
+                        f"SELECT model_code, doc FROM devices WHERE model_code IN ({','.join('?' * len(chunk))})", chunk
+                    )
+                    existing.update((code, self._loads(text)) for code, text in rows)
+                for doc in docs:
+                    merged.append(dict(existing.get(doc['model_code'], {}), **doc))
+                self.conn.executemany(_UPSERT_SQL, [self._row(doc) for doc in merged])
+                for doc in merged:
+                    self._index_codes(doc)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(docs)
+
+    def model_codes(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT model_code FROM devices")]
+
+    def known_codes(self):
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT code FROM device_codes")}
+
+    def iter_devices(self, projection=None, limit=None):
+        sql = "SELECT doc FROM devices ORDER BY rowid"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [_project(self._loads(row[0]), projection) for row in rows]
+
+    def stats(self):
+        """读触发器维护的计数（O(1)），格式与 device_stats 相同"""
+        with self.lock:
+            rows = self.conn.execute("SELECT key, count FROM device_stats").fetchall()
+        summary = {'brands': {}}
+        for key, count in rows:
+            if key.startswith('brand:'):
+                summary['brands'][key[len('brand:'):]] = count
+            else:
+                summary[key] = count
+        return format_stats(summary)
+
+    def reconcile(self):
+        """按 devices 表重新计算计数"""
+        unknown = UNKNOWN_BRAND
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM device_stats")
+                self.conn.execute(
+                    "INSERT INTO device_stats (key, count) "
+                    "SELECT 'total', COUNT(*) FROM devices "
+                    "UNION ALL SELECT 'with_price', COALESCE(SUM(price IS NOT ''), 0) FROM devices "
+                    "UNION ALL SELECT 'with_date', COALESCE(SUM(announced_date IS NOT ''), 0) FROM devices"
+                )
+                self.conn.execute(
+                    "INSERT INTO device_stats (key, count) "
+                    "SELECT 'brand:' || COALESCE(NULLIF(TRIM(manufacture), ''), ?), COUNT(*) FROM devices "
+                    "GROUP BY 1", (unknown,)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return self.stats()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_store(uri="mongodb://localhost:27017/", db_name="device_info"):
+    """按连接串打开存储后端（环境变量 DEVICE_STORE 优先）"""
+    uri = os.environ.get('DEVICE_STORE') or uri
+    if uri.startswith(SQLITE_SCHEME):
+        path = uri[len(SQLITE_SCHEME):]
+        # sqlite:///relative.db → relative.db，sqlite:////abs/path.db → /abs/path.db
+        path = path[1:] if path.startswith('/') else path
+        store = SQLiteDeviceStore(path or ':memory:')
+        logger.info(f"使用内嵌SQLite存储: {store.path}")
+        return store
+    return MongoDeviceStore(uri, db_name)
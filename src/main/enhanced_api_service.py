@@ -2,9 +2,9 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import json
-import time
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import os
 import logging
 from urllib.parse import urljoin
 from selenium import webdriver
@@ -13,8 +13,18 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from pymongo import MongoClient
 from datetime import datetime
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_INTERACTIVE
+from model_code_index import parse_model_codes
+from device_query import (DeviceListQuery, QueryError, ensure_listing_indexes, lookup_projection, select_fields,
+                          coverage_problems)
+from device_search import DeviceSearchIndex, ensure_search_indexes
+from device_refresher import DeviceRefresher, is_stale, STALENESS_FIELDS
+from device_stats import StatsReconciler
+from device_store import open_store
+from http_cache import (body_etag, etag_matches, compress_response, cache_max_age,
+                        CACHE_PUBLIC, CACHE_REVALIDATE, CACHE_NONE)
 
 app = Flask(__name__)
 CORS(app)
@@ -23,11 +33,18 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 文档缺少字段时返回的默认值
+_FIELD_DEFAULTS = {'model_codes': [], 'specifications': {}, 'normalized': {}}
+
 class DeviceInfoService:
     def __init__(self, mongo_uri="mongodb://localhost:27017/", db_name="device_info"):
         """初始化设备信息服务"""
         self.base_url = "https://www.gsmarena.com"
         self.session = requests.Session()
+        self.transport = get_transport()
+        self.transport.mount(self.session)
+        # 实时查询：与批量导入共用按主机限速，优先放行
+        self.scheduler = get_scheduler()
         
         # 设置请求头
         self.session.headers.update({
@@ -44,9 +61,12 @@ class DeviceInfoService:
         })
         
         # 初始化数据库连接
+        self.store = None
         self.mongo_client = None
         self.db = None
         self.collection = None
+        self.refresher = None
+        self.stats_reconciler = None
         self._init_mongodb(mongo_uri, db_name)
         
         # 初始化Selenium WebDriver
@@ -54,14 +74,49 @@ class DeviceInfoService:
         self._init_driver()
     
     def _init_mongodb(self, mongo_uri, db_name):
-        """初始化MongoDB连接"""
+        """初始化存储（mongodb:// 或 sqlite:///，见 device_store）"""
+        try:
+            self.store = open_store(mongo_uri, db_name)
+            # SQLite 后端下为 None
+            self.mongo_client, self.db, self.collection = self.store.client, self.store.db, self.store.collection
+            logger.info(f"数据库连接成功: {db_name}（{self.store.backend}）")
+        except Exception as e:
+            logger.warning(f"数据库连接失败: {str(e)}, 将只使用爬虫模式")
+            self.store = None
+            return
+
+        if self.collection is None:
+            # 内嵌存储只提供按型号查询和统计，列表筛选/搜索/后台刷新需要MongoDB
+            try:
+                self.store.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"初始化内嵌存储失败: {str(e)}")
+            return
+
         try:
-            self.mongo_client = MongoClient(mongo_uri)
-            self.db = self.mongo_client[db_name]
-            self.collection = self.db['devices']
-            logger.info(f"MongoDB连接成功: {db_name}")
+            ensure_listing_indexes(self.collection)
+            ensure_search_indexes(self.collection)
         except Exception as e:
-            logger.warning(f"MongoDB连接失败: {str(e)}, 将只使用爬虫模式")
+            logger.warning(f"创建列表查询索引失败: {str(e)}")
+
+        # 与导入脚本（另一个进程）共享主机时间槽
+        self.scheduler.share_via(self.db)
+
+        # 后台刷新（环境变量 DEVICE_REFRESHER=1 开启）：查询始终返回缓存，陈旧记录排进后台刷新
+        if os.environ.get('DEVICE_REFRESHER', '').lower() in ('1', 'true', 'yes'):
+            try:
+                self.refresher = DeviceRefresher(self.collection)
+                self.refresher.ensure_indexes()
+                self.refresher.start()
+            except Exception as e:
+                logger.warning(f"启动后台刷新失败: {str(e)}")
+                self.refresher = None
+
+        # 统计汇总定期对账（环境变量 STATS_RECONCILE_INTERVAL=秒数 开启，多实例部署时只需一个实例开启）
+        reconcile_interval = int(os.environ.get('STATS_RECONCILE_INTERVAL', 0) or 0)
+        if reconcile_interval > 0:
+            self.stats_reconciler = StatsReconciler(self.db, reconcile_interval)
+            self.stats_reconciler.start()
     
     def _init_driver(self):
         """初始化Chrome WebDriver"""
@@ -74,36 +129,41 @@ class DeviceInfoService:
             chrome_options.add_argument('--window-size=1920,1080')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = self.transport.create_driver(lambda: webdriver.Chrome(options=chrome_options))
             self.driver.set_page_load_timeout(30)
             logger.info("Selenium WebDriver 初始化成功")
         except Exception as e:
             logger.error(f"初始化WebDriver失败: {str(e)}")
             self.driver = None
     
-    def query_from_database(self, model_code):
-        """从数据库查询设备信息"""
-        if not self.collection:
+    def query_from_database(self, model_code, fields=None):
+        """从数据库查询设备信息
+
+        Args:
+            model_code (str): 型号
+            fields: 返回的字段（逗号分隔或列表），默认轻量视图（不含 specifications），all 表示全部
+        """
+        if self.store is None:
             return None
         
+        projection = lookup_projection(fields)
         try:
-            device = self.collection.find_one({"model_code": model_code})
+            # 本身没有记录时通过型号反向索引查兄弟型号；陈旧度判断需要的字段一并取回
+            device = self.store.find_device(model_code, dict(projection, model_code=1, **{f: 1 for f in STALENESS_FIELDS}))
             if device:
-                # 转换为API格式
+                # stale-while-revalidate: 先返回缓存副本，陈旧的记录交给后台刷新
+                if self.refresher and is_stale(device):
+                    self.refresher.request_refresh(device['model_code'])
+                
+                # 转换为API格式（price 直接返回原始价格）
+                data = {'search_model': model_code}
+                for field in projection:
+                    if field != '_id':
+                        data[field] = device.get(field, _FIELD_DEFAULTS.get(field, ''))
                 result = {
                     'success': True,
                     'source': 'database',
-                    'data': {
-                        'search_model': model_code,
-                        'device_name': device.get('device_name', ''),
-                        'model_code': device.get('model_code', ''),
-                        'announced_date': device.get('announced_date', ''),
-                        'release_date': device.get('release_date', ''),
-                        'price': device.get('price', ''),  # 直接返回原始价格
-                        'source_url': device.get('source_url', ''),
-                        'created_at': device.get('created_at', ''),
-                        'specifications': device.get('specifications', {})
-                    }
+                    'data': data
                 }
                 logger.info(f"从数据库找到设备信息: {model_code}")
                 return result
@@ -124,6 +184,7 @@ class DeviceInfoService:
             search_url = f"{self.base_url}/res.php3?sSearch={model_code}"
             logger.info(f"搜索设备: {search_url}")
             
+            self.scheduler.wait(search_url, PRIORITY_INTERACTIVE)
             self.driver.get(search_url)
             wait = WebDriverWait(self.driver, 15)
             
@@ -131,7 +192,7 @@ class DeviceInfoService:
                 decrypted_element = wait.until(
                     EC.presence_of_element_located((By.ID, "decrypted"))
                 )
-                time.sleep(2)
+                self.transport.pause(2)
                 
                 decrypted_content = decrypted_element.get_attribute('innerHTML')
                 if not decrypted_content or decrypted_content.strip() == '':
@@ -207,6 +268,7 @@ class DeviceInfoService:
     def extract_device_details(self, device_url):
         """提取设备详细信息"""
         try:
+            self.scheduler.wait(device_url, PRIORITY_INTERACTIVE)
             response = self.session.get(device_url, timeout=10)
             response.raise_for_status()
             
@@ -261,6 +323,7 @@ class DeviceInfoService:
                             elif 'Models' in cell_text and i + 1 < len(cell_texts):
                                 models_info = cell_texts[i + 1]
                                 device_info['model_code'] = models_info
+                                device_info['model_codes'] = parse_model_codes(models_info)
                         
                         if len(cell_texts) >= 2:
                             key = next((text for text in cell_texts if text), '')
@@ -275,10 +338,13 @@ class DeviceInfoService:
             logger.error(f"提取设备详情失败: {str(e)}")
             return None
     
-    def get_device_info(self, model_code):
+    def get_device_info(self, model_code, fields=None):
         """获取设备信息（优先从数据库查询）"""
+        # 字段不合法时直接抛出 QueryError
+        projection = lookup_projection(fields)
+        
         # 1. 首先尝试从数据库查询
-        db_result = self.query_from_database(model_code)
+        db_result = self.query_from_database(model_code, fields)
         if db_result:
             return db_result
         
@@ -307,6 +373,7 @@ class DeviceInfoService:
                     'search_model': model_code,
                     'device_name': device_details['name'],
                     'model_code': device_details['model_code'],
+                    'model_codes': device_details.get('model_codes', []),
                     'announced_date': device_details['announced_date'],
                     'release_date': device_details['release_date'],
                     'price': device_details['price'],
@@ -314,6 +381,7 @@ class DeviceInfoService:
                     'specifications': device_details['specifications']
                 }
             }
+            result['data'] = select_fields(result['data'], projection)
             
             return result
             
@@ -326,19 +394,62 @@ class DeviceInfoService:
     
     def close(self):
         """关闭连接"""
+        if self.refresher:
+            self.refresher.stop()
+        if self.stats_reconciler:
+            self.stats_reconciler.stop()
         if self.driver:
             self.driver.quit()
-        if self.mongo_client:
-            self.mongo_client.close()
+        if self.store:
+            self.store.close()
 
 # 创建服务实例
 device_service = DeviceInfoService()
+search_index = DeviceSearchIndex()
+
+def _device_info_response(model_code, fields=None):
+    """查询设备并生成可缓存的响应：响应体只序列化一次，其摘要作为 ETag，命中 If-None-Match 时返回 304"""
+    result = device_service.get_device_info(model_code, fields)
+    if not result['success']:
+        response = jsonify(result)
+        response.status_code = 404
+        response.headers['Cache-Control'] = CACHE_NONE
+        return response
+
+    body = app.json.dumps(result).encode('utf-8')
+    etag = body_etag(body)
+    if result['source'] == 'database':
+        cache_control = CACHE_PUBLIC.format(max_age=cache_max_age())
+    else:
+        cache_control = CACHE_REVALIDATE
 
-@app.route('/api/device-info', methods=['POST'])
-def get_device_info():
-    """API接口：获取设备信息"""
+    matched = etag_matches(request.headers.get('If-None-Match'), etag)
+    if matched:
+        # 客户端持有的可能是压缩后的表示，原样返回它持有的标签
+        response = app.response_class(status=304)
+        response.headers['ETag'] = matched if matched != '*' else etag
+    else:
+        response = app.response_class(body, status=200, mimetype='application/json')
+        response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+@app.route('/api/device-info', methods=['GET', 'POST'])
+@app.route('/api/device-info/<path:model_code>', methods=['GET'])
+def get_device_info(model_code=None):
+    """API接口：获取设备信息
+
+    POST: JSON {model_code, fields}
+    GET:  /api/device-info/<model_code>?fields=... 或 /api/device-info?model_code=...&fields=...（可被客户端/CDN缓存）
+    fields: 逗号分隔或列表，默认不含 specifications；all 返回全部字段
+    """
     try:
-        data = request.get_json()
+        if request.method == 'POST':
+            data = request.get_json()
+        else:
+            data = dict(request.args)
+            if model_code is not None:
+                data['model_code'] = model_code
         if not data or 'model_code' not in data:
             return jsonify({
                 'success': False,
@@ -352,13 +463,13 @@ def get_device_info():
                 'message': 'model_code不能为空'
             }), 400
         
-        result = device_service.get_device_info(model_code)
-        
-        if result['success']:
-            return jsonify(result), 200
-        else:
-            return jsonify(result), 404
+        return _device_info_response(model_code, data.get('fields'))
             
+    except QueryError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"API请求失败: {str(e)}")
         return jsonify({
@@ -366,29 +477,105 @@ def get_device_info():
             'message': f'服务器错误: {str(e)}'
         }), 500
 
+@app.after_request
+def compress_api_response(response):
+    """按 Accept-Encoding 压缩响应（br / gzip）"""
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+@app.route('/api/devices', methods=['GET'])
+def list_devices():
+    """API接口：按条件列出设备（游标分页）
+
+    参数: manufacture, year_from, year_to, price_min, price_max, ram_min, ram_max,
+         storage_min, storage_max, fields（逗号分隔）, limit, cursor, explain=1
+    """
+    try:
+        if device_service.collection is None:
+            return jsonify({
+                'success': False,
+                'message': '数据库未连接（该查询需要MongoDB存储）'
+            }), 500
+
+        query = DeviceListQuery(request.args)
+
+        if request.args.get('explain') == '1':
+            plan = query.explain(device_service.collection)
+            return jsonify({
+                'success': True,
+                'plan': plan,
+                'problems': coverage_problems(query, plan)
+            }), 200
+
+        devices, next_cursor = query.execute(device_service.collection)
+        return jsonify({
+            'success': True,
+            'data': devices,
+            'count': len(devices),
+            'next_cursor': next_cursor
+        }), 200
+
+    except QueryError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"设备列表查询失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'服务器错误: {str(e)}'
+        }), 500
+
+@app.route('/api/search', methods=['GET'])
+def search_devices():
+    """API接口：按名称/型号/制造商搜索设备（相关度排序）"""
+    try:
+        keyword = request.args.get('q', '').strip()
+        if not keyword:
+            return jsonify({
+                'success': False,
+                'message': '请提供q参数'
+            }), 400
+
+        if device_service.collection is None:
+            return jsonify({
+                'success': False,
+                'message': '数据库未连接（该查询需要MongoDB存储）'
+            }), 500
+
+        limit = request.args.get('limit', '10')
+        limit = min(int(limit), 100) if limit.isdigit() and int(limit) > 0 else 10
+
+        search_index.refresh(device_service.collection)
+        results = search_index.search(keyword, limit=limit)
+        return jsonify({
+            'success': True,
+            'query': keyword,
+            'count': len(results),
+            'data': results
+        }), 200
+
+    except Exception as e:
+        logger.error(f"搜索失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'服务器错误: {str(e)}'
+        }), 500
+
 @app.route('/api/database-stats', methods=['GET'])
 def get_database_stats():
     """获取数据库统计信息"""
     try:
-        if not device_service.collection:
+        if device_service.store is None:
             return jsonify({
                 'success': False,
                 'message': '数据库未连接'
             }), 500
         
-        total_count = device_service.collection.count_documents({})
-        with_price = device_service.collection.count_documents({"price": {"$ne": ""}})
-        with_date = device_service.collection.count_documents({"announced_date": {"$ne": ""}})
-        
+        # 读增量维护的计数（O(1)），不再全表计数
         stats = {
             "success": True,
-            "data": {
-                "total_devices": total_count,
-                "devices_with_price": with_price,
-                "devices_with_date": with_date,
-                "price_coverage": f"{with_price/total_count*100:.1f}%" if total_count > 0 else "0%",
-                "date_coverage": f"{with_date/total_count*100:.1f}%" if total_count > 0 else "0%"
-            }
+            "data": device_service.store.stats()
         }
         
         return jsonify(stats), 200
@@ -406,7 +593,8 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'message': '设备信息服务运行正常',
-        'database_connected': device_service.collection is not None,
+        'database_connected': device_service.store is not None,
+        'storage_backend': device_service.store.backend if device_service.store else None,
         'webdriver_status': device_service.driver is not None
     })
 
@@ -415,7 +603,10 @@ def index():
     """首页"""
     return '''
     <h1>设备信息服务</h1>
-    <p>API接口：POST http://172.16.29.227:8080/api/device-info</p>
+    <p>API接口：POST http://172.16.29.227:8080/api/device-info （fields=device_name,price 或 fields=all 返回规格）</p>
+    <p>可缓存查询：GET http://172.16.29.227:8080/api/device-info/SM-A155F?fields=all （支持 ETag / If-None-Match）</p>
+    <p>设备列表：GET http://172.16.29.227:8080/api/devices?manufacture=Samsung&year_from=2020&price_max=500</p>
+    <p>设备搜索：GET http://172.16.29.227:8080/api/search?q=galaxy a15</p>
     <p>数据库统计：GET http://172.16.29.227:8080/api/database-stats</p>
     <p>健康检查：GET http://172.16.29.227:8080/api/health</p>
     '''
\ No newline at end of file
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GSMArena 本地目录 - 设备名称 → 详情页URL
+目录保存在 MongoDB 的 gsmarena_catalog 集合中，启动时加载到内存建立词元倒排索引；
+GSMChoice 得到的设备名称先在本地做模糊词元匹配，置信度达到阈值就直接得到详情页URL，
+不用再打开 GSMArena 搜索页（Selenium加载 + 等待解密）。
+每次在线搜索的结果页上的全部设备链接也会写回目录。
+"""
+
+import re
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urljoin
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+CATALOG_COLLECTION = 'gsmarena_catalog'
+DEFAULT_MATCH_THRESHOLD = 0.8
+
+_TOKEN_PATTERN = re.compile(r'[0-9a-z]+')
+_DIGIT = re.compile(r'\d')
+
+# 区分不同机型的后缀词，和含数字的词元一样必须一致
+VARIANT_WORDS = {
+    'pro', 'max', 'plus', 'lite', 'ultra', 'mini', 'neo', 'prime', 'fe', 'note', 'edge',
+    'fold', 'flip', 'power', 'play', 'go', 'se', 'turbo', 'speed', 'active', 'xl',
+}
+
+
+def _significant(tokens):
+    return {token for token in tokens if _DIGIT.search(token) or token in VARIANT_WORDS}
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(str(text or '').lower())
+
+
+def match_confidence(query_tokens, candidate_tokens):
+    """两个设备名称词元集合的匹配置信度（0-1）
+
+    Dice系数；含数字的词元（型号、代数、5G）或后缀词（Pro、Lite...）不一致时减半，
+    避免 "Galaxy A15" 匹配到 "Galaxy A15 5G"、"Galaxy A16" 或 "BV4900 Pro"
+    """
+    if not query_tokens or not candidate_tokens:
+        return 0.0
+    if ''.join(query_tokens) == ''.join(candidate_tokens):
+        return 1.0
+
+    query_set, candidate_set = set(query_tokens), set(candidate_tokens)
+    score = 2.0 * len(query_set & candidate_set) / (len(query_set) + len(candidate_set))
+
+    if _significant(query_set) != _significant(candidate_set):
+        score *= 0.5
+    return score
+
+
+class GSMArenaCatalog:
+    def __init__(self, db, match_threshold=DEFAULT_MATCH_THRESHOLD):
+        """初始化本地目录
+
+        Args:
+            db: MongoDB数据库
+            match_threshold (float): 本地匹配的最低置信度，低于该值时走在线搜索
+        """
+        self.collection = db[CATALOG_COLLECTION]
+        self.match_threshold = match_threshold
+        self.lock = threading.Lock()
+        self.entries = {}       # url -> {'name', 'tokens'}
+        self.postings = {}      # 词元 -> url集合
+
+        self.collection.create_index([("url", ASCENDING)], unique=True)
+        self.collection.create_index([("brand", ASCENDING)])
+        self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _index(self, url, name):
+        tokens = tokenize(name)
+        if not tokens:
+            return
+        old = self.entries.get(url)
+        if old:
+            for token in old['tokens']:
+                self.postings.get(token, set()).discard(url)
+        self.entries[url] = {'name': name, 'tokens': tokens}
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(url)
+
+    def load(self):
+        with self.lock:
+            self.entries, self.postings = {}, {}
+            for doc in self.collection.find({}, {"_id": 0, "url": 1, "name": 1}):
+                self._index(doc['url'], doc['name'])
+        logger.info(f"📚 GSMArena本地目录: {len(self.entries)} 台设备")
+
+    def add_many(self, devices, source='search'):
+        """写入目录
+
+        Args:
+            devices (list): [{'name', 'url', 'brand'(可选)}]
+            source (str): 来源（search / brand_crawl）
+        """
+        operations = []
+        now = datetime.now()
+        with self.lock:
+            for device in devices:
+                name, url = device.get('name', '').strip(), device.get('url', '').strip()
+                if not name or not url:
+                    continue
+                known = self.entries.get(url)
+                if known and known['name'] == name:
+                    continue
+                self._index(url, name)
+                fields = {"name": name, "source": source, "updated_at": now}
+                if device.get('brand'):
+                    fields["brand"] = device['brand']
+                operations.append(UpdateOne(
+                    {"url": url},
+                    {"$set": fields, "$setOnInsert": {"created_at": now}},
+                    upsert=True
+                ))
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def match(self, device_name, brand=None):
+        """本地模糊匹配
+
+        Args:
+            device_name (str): 设备名称（GSMChoice的名称可能不含品牌）
+            brand (str): 品牌，名称中没有时补上
+
+        Returns:
+            (url, 目录中的名称, 置信度)；没有候选时返回 (None, None, 0.0)
+        """
+        query_tokens = tokenize(device_name)
+        brand_tokens = tokenize(brand)
+        if brand_tokens and query_tokens[:len(brand_tokens)] != brand_tokens:
+            query_tokens = brand_tokens + query_tokens
+        if not query_tokens:
+            return None, None, 0.0
+
+        with self.lock:
+            # 候选: 至少包含一个非品牌词元
+            candidates = set()
+            for token in set(query_tokens) - set(brand_tokens):
+                candidates |= self.postings.get(token, set())
+
+            best = (None, None, 0.0)
+            for url in candidates:
+                entry = self.entries[url]
+                confidence = match_confidence(query_tokens, entry['tokens'])
+                if confidence > best[2]:
+                    best = (url, entry['name'], confidence)
+        return best
+
+    def resolve(self, device_name, brand=None):
+        """置信度达到阈值时返回详情页URL，否则返回None"""
+        url, name, confidence = self.match(device_name, brand)
+        if url and confidence >= self.match_threshold:
+            logger.info(f"📚 本地目录命中: {device_name} -> {name} ({confidence:.2f})")
+            return url
+        if url:
+            logger.info(f"📚 本地目录置信度不足: {device_name} -> {name} ({confidence:.2f})")
+        return None
+
+
+def parse_device_links(soup, base_url):
+    """从 GSMArena 列表/搜索结果页提取 [{'name', 'url'}]"""
+    container = soup.find('div', class_='makers') or soup
+    devices = []
+    for link in container.find_all('a', href=True):
+        href = link['href']
+        if not re.search(r'-\d+\.php$', href) or '-phones-' in href:
+            continue
+        name = link.get_text(' ', strip=True)
+        if not name:
+            image = link.find('img')
+            name = image.get('title', '') if image else ''
+        if name:
+            devices.append({'name': re.sub(r'\s+', ' ', name), 'url': urljoin(base_url + '/', href)})
+    return devices
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GSMArena 品牌目录增量爬取
+按品牌遍历列表页（makers.php3 → {brand}-phones-{id}.php → 分页），把每个机型的名称和URL
+写入本地目录（gsmarena_catalog），搜索路径优先查这个目录。
+
+列表页按发布时间从新到旧排列，详情页URL末尾的数字ID随时间递增；
+每个品牌记录已见过的最大ID（水位），增量模式下翻到某一页没有比水位更新的机型就停止，
+所以每晚的增量爬取通常每个品牌只需要请求第一页。
+
+每晚增量爬取（crontab）:
+  0 3 * * * cd /path/to/src/main && python gsmarena_catalog_crawler.py
+"""
+
+import re
+import logging
+import argparse
+from datetime import datetime
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from pymongo import MongoClient, ASCENDING
+
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_BULK
+from gsmarena_catalog import GSMArenaCatalog, parse_device_links
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = 'gsmarena_catalog_state'
+
+_DEVICE_ID = re.compile(r'-(\d+)\.php$')
+_BRAND_PAGE = re.compile(r'-phones-\d+\.php$')
+
+
+def device_id(url):
+    match = _DEVICE_ID.search(url)
+    return int(match.group(1)) if match else 0
+
+
+class GSMArenaCatalogCrawler:
+    def __init__(self, mongo_uri="mongodb://localhost:27017/", db_name="device_info", request_delay=3):
+        """初始化品牌目录爬虫
+
+        Args:
+            request_delay (int): 两次页面请求之间的间隔（秒）
+        """
+        self.request_delay = request_delay
+        self.gsmarena_base = "https://www.gsmarena.com"
+
+        self.mongo_client = MongoClient(mongo_uri)
+        self.db = self.mongo_client[db_name]
+        self.catalog = GSMArenaCatalog(self.db)
+        self.state = self.db[STATE_COLLECTION]
+        self.state.create_index([("brand", ASCENDING)], unique=True)
+
+        self.session = requests.Session()
+        self.transport = get_transport()
+        self.transport.mount(self.session)
+        self.scheduler = get_scheduler()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.9',
+        })
+
+        self.stats = {'pages': 0, 'new_devices': 0, 'brands': 0}
+
+    def _get_soup(self, url):
+        # 与其它爬虫共用按主机限速，批量优先级
+        self.scheduler.wait(url, PRIORITY_BULK, self.request_delay)
+        response = self.session.get(url, timeout=30)
+        response.raise_for_status()
+        self.stats['pages'] += 1
+        return BeautifulSoup(response.content, 'html.parser')
+
+    def list_brands(self):
+        """品牌列表 [{'brand', 'url'}]"""
+        soup = self._get_soup(f"{self.gsmarena_base}/makers.php3")
+        brands = []
+        for link in soup.find_all('a', href=_BRAND_PAGE):
+            name = link.find(string=True)
+            if name and name.strip():
+                brands.append({'brand': name.strip(), 'url': urljoin(self.gsmarena_base + '/', link['href'])})
+        logger.info(f"🏭 GSMArena品牌: {len(brands)} 个")
+        return brands
+
+    def crawl_brand(self, brand, brand_url, full=False):
+        """增量爬取一个品牌的列表页
+
+        Args:
+            brand (str): 品牌名称
+            brand_url (str): 品牌列表第一页URL
+            full (bool): 忽略水位，遍历全部分页
+
+        Returns:
+            int: 新写入目录的机型数
+        """
+        state = self.state.find_one({"brand": brand}) or {}
+        watermark = 0 if full else state.get('watermark_id', 0)
+        newest = watermark
+        added = 0
+
+        page_url = brand_url
+        visited = set()
+        while page_url and page_url not in visited:
+            visited.add(page_url)
+            soup = self._get_soup(page_url)
+
+            devices = parse_device_links(soup, self.gsmarena_base)
+            for device in devices:
+                if not device['name'].lower().startswith(brand.lower()):
+                    device['name'] = f"{brand} {device['name']}"
+                device['brand'] = brand
+
+            fresh = [device for device in devices if device_id(device['url']) > watermark]
+            added += self.catalog.add_many(fresh, source='brand_crawl')
+            newest = max([newest] + [device_id(device['url']) for device in fresh])
+
+            # 列表从新到旧：本页已经有见过的机型，后面的页不会再有新机型
+            if not fresh or len(fresh) < len(devices):
+                break
+            page_url = self._next_page(soup)
+
+        self.state.update_one(
+            {"brand": brand},
+            {"$set": {
+                "brand_url": brand_url,
+                "watermark_id": newest,
+                "last_crawled_at": datetime.now(),
+            }, "$inc": {"devices": added}},
+            upsert=True
+        )
+        logger.info(f"📚 {brand}: 新增 {added} 台（水位 {watermark} → {newest}）")
+        return added
+
+    def _next_page(self, soup):
+        """分页导航中当前页是 <strong>，它后面的第一个链接就是下一页"""
+        nav = soup.find('div', class_='nav-pages')
+        current = nav.find('strong') if nav else None
+        following = current.find_next_sibling('a', href=True) if current else None
+        return urljoin(self.gsmarena_base + '/', following['href']) if following else None
+
+    def crawl(self, brands=None, full=False):
+        """爬取全部（或指定）品牌
+
+        Args:
+            brands (list): 只爬这些品牌（不区分大小写），None表示全部
+            full (bool): 全量爬取
+        """
+        start_time = datetime.now()
+        wanted = {brand.lower() for brand in brands} if brands else None
+
+        for entry in self.list_brands():
+            if wanted and entry['brand'].lower() not in wanted:
+                continue
+            try:
+                self.stats['new_devices'] += self.crawl_brand(entry['brand'], entry['url'], full)
+                self.stats['brands'] += 1
+            except Exception as e:
+                logger.error(f"❌ 品牌爬取失败 {entry['brand']}: {str(e)}")
+
+        elapsed = (datetime.now() - start_time).total_seconds()
+        logger.info(f"✅ 目录爬取完成: {self.stats['brands']} 个品牌, {self.stats['pages']} 个页面, "
+                    f"新增 {self.stats['new_devices']} 台, 目录共 {len(self.catalog)} 台, 耗时 {elapsed:.0f}秒")
+        return dict(self.stats)
+
+    def close(self):
+        self.mongo_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GSMArena品牌目录增量爬取')
+    parser.add_argument('--brands', nargs='*', help='只爬取指定品牌')
+    parser.add_argument('--full', action='store_true', help='忽略水位全量爬取')
+    parser.add_argument('--delay', type=float, default=3, help='请求间隔（秒）')
+    args = parser.parse_args()
+
+    crawler = GSMArenaCatalogCrawler(request_delay=args.delay)
+    try:
+        crawler.crawl(brands=args.brands, full=args.full)
+    finally:
+        crawler.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,6 @@ import requests
 from bs4 import BeautifulSoup
 import json
 import logging
-import time
 from datetime import datetime
 import os
 import re
@@ -22,11 +21,18 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_BULK
+from debug_artifacts import get_debug_store
+from price_scanner import scan_price, tier_label
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 价格解析出错时写入 price 的值（"Available on Amazon" / "Price not available" 是正常结果，不算解析失败）
+PRICE_EXTRACTION_FAILED = "Price extraction failed"
+
 class EnhancedGSMChoiceScraper:
     def __init__(self, request_delay=3, use_selenium=True):
         """初始化增强的GSMChoice爬虫"""
@@ -37,6 +43,10 @@ class EnhancedGSMChoiceScraper:
         
         # 初始化requests session
         self.session = requests.Session()
+        self.transport = get_transport()
+        self.transport.mount(self.session)
+        # 与其它爬虫共用按主机限速，批量优先级
+        self.scheduler = get_scheduler()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
@@ -62,7 +72,7 @@ class EnhancedGSMChoiceScraper:
             chrome_options.add_argument('--window-size=1920,1080')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = self.transport.create_driver(lambda: webdriver.Chrome(options=chrome_options))
             self.driver.set_page_load_timeout(30)
             logger.info("Selenium WebDriver初始化成功")
         except Exception as e:
@@ -89,7 +99,7 @@ class EnhancedGSMChoiceScraper:
             search_url = f"{self.search_api}?search={encoded_query}&lang=en&v=3"
             logger.info(f"API搜索设备: {search_query}")
             
-            time.sleep(self.request_delay)
+            self.scheduler.wait(search_url, PRIORITY_BULK, self.request_delay)
             
             response = self.session.get(search_url, timeout=30)
             response.raise_for_status()
@@ -121,12 +131,12 @@ class EnhancedGSMChoiceScraper:
             search_url = f"{self.base_url}/en/search/?sSearch4={encoded_query}"
             logger.info(f"网页搜索设备: {search_query}")
             
-            time.sleep(self.request_delay)
+            self.scheduler.wait(search_url, PRIORITY_BULK, self.request_delay)
             
             if self.driver:
                 # 使用Selenium
                 self.driver.get(search_url)
-                time.sleep(3)  # 等待页面加载
+                self.transport.pause(3)  # 等待页面加载
                 soup = BeautifulSoup(self.driver.page_source, 'html.parser')
             else:
                 # 使用requests
@@ -180,7 +190,7 @@ class EnhancedGSMChoiceScraper:
             detail_url = f"{self.base_url}/en/catalogue/{sbrand}/{smodel}/"
             logger.info(f"获取详情页: {detail_url}")
             
-            time.sleep(self.request_delay)
+            self.scheduler.wait(detail_url, PRIORITY_BULK, self.request_delay)
             
             if self.driver:
                 # 使用Selenium获取页面
@@ -192,7 +202,7 @@ class EnhancedGSMChoiceScraper:
                 )
                 
                 # 额外等待JavaScript执行
-                time.sleep(5)
+                self.transport.pause(5)
                 
                 # 尝试等待价格组件加载
                 try:
@@ -210,12 +220,6 @@ class EnhancedGSMChoiceScraper:
                 response.raise_for_status()
                 soup = BeautifulSoup(response.content, 'html.parser')
             
-            # 保存调试HTML
-            debug_filename = f'{sbrand}_{smodel}_enhanced_soup.html'
-            with open(debug_filename, 'w', encoding='utf-8') as f:
-                f.write(str(soup))
-            logger.info(f"调试HTML已保存: {debug_filename}")
-            
             # 提取设备信息
             device_details = {
                 'device_name': device_info.get('model', 'Unknown'),
@@ -232,6 +236,13 @@ class EnhancedGSMChoiceScraper:
             # 增强的价格提取
             self._extract_price_enhanced(soup, device_details)
             
+            # 解析失败（没有规格或价格解析出错）时保存页面（压缩、异步、有总大小上限），其余按采样率保存
+            failed = not device_details['specifications'] or device_details['price'] == PRICE_EXTRACTION_FAILED
+            get_debug_store().capture_if(
+                failed, f'{sbrand}_{smodel}', lambda: str(soup),
+                reason='no_specs' if not device_details['specifications'] else 'price_error'
+            )
+            
             return device_details
             
         except Exception as e:
@@ -276,96 +287,20 @@ class EnhancedGSMChoiceScraper:
             logger.error(f"提取规格信息失败: {str(e)}")
     
     def _extract_price_enhanced(self, soup, device_details):
-        """增强的价格提取"""
+        """增强的价格提取（只扫描已知的价格区域，见 price_scanner）"""
         try:
-            price_found = False
-            
-            # 方法1：查找Amazon价格按钮
-            amazon_buttons = soup.find_all('a', class_=re.compile(r'amazon-button'))
-            for button in amazon_buttons:
-                # 检查是否是购买链接而不是配件链接
-                href = button.get('href', '')
-                text = button.get_text(strip=True)
-                
-                # 跳过配件相关的链接
-                accessory_keywords = ['Handyhülle', 'Schutzfolien', 'Powerbank', 'Kopfhörer', 'USB-Adapter', 'Speicherkarte']
-                if any(keyword in text for keyword in accessory_keywords):
-                    continue
-                
-                # 如果是设备购买链接，尝试从URL中提取价格信息
-                if 'search' in href and len(text) > 5:
-                    # 有时候按钮文本包含价格
-                    price_match = re.search(r'(\d+[.,]\d+|\d+)\s*(€|EUR|Dollar|\$)', text)
-                    if price_match:
-                        device_details['price'] = price_match.group(0)
-                        price_found = True
-                        logger.info(f"从Amazon按钮找到价格: {device_details['price']}")
-                        break
-            
-            # 方法2：查找价格容器和脚本
-            if not price_found:
-                price_containers = soup.find_all('div', class_=re.compile(r'price'))
-                for container in price_containers:
-                    price_text = container.get_text(strip=True)
-                    price_match = re.search(r'(\d+[.,]\d+|\d+)\s*(€|EUR|Dollar|\$)', price_text)
-                    if price_match:
-                        device_details['price'] = price_match.group(0)
-                        price_found = True
-                        logger.info(f"从价格容器找到价格: {device_details['price']}")
-                        break
-            
-            # 方法3：从JavaScript中查找价格信息
-            if not price_found:
-                scripts = soup.find_all('script')
-                for script in scripts:
-                    if script.string:
-                        # 查找价格相关的JavaScript变量
-                        price_match = re.search(r'price["\']?\s*[:=]\s*["\']?(\d+[.,]\d+|\d+)\s*(€|EUR|Dollar|\$)?["\']?', script.string, re.IGNORECASE)
-                        if price_match:
-                            price_value = price_match.group(1)
-                            currency = price_match.group(2) or '€'
-                            device_details['price'] = f"{price_value} {currency}"
-                            price_found = True
-                            logger.info(f"从JavaScript找到价格: {device_details['price']}")
-                            break
-            
-            # 方法4：查找任何包含价格模式的文本
-            if not price_found:
-                all_text = soup.get_text()
-                price_patterns = [
-                    r'(\d+[.,]\d+)\s*€',
-                    r'€\s*(\d+[.,]\d+)',
-                    r'(\d+[.,]\d+)\s*EUR',
-                    r'USD\s*(\d+[.,]\d+)',
-                    r'\$(\d+[.,]\d+)'
-                ]
-                
-                for pattern in price_patterns:
-                    matches = re.findall(pattern, all_text)
-                    if matches:
-                        # 取第一个合理的价格（通常在50-5000范围内）
-                        for match in matches:
-                            price_num = float(match.replace(',', '.'))
-                            if 50 <= price_num <= 5000:
-                                device_details['price'] = f"{match} €"
-                                price_found = True
-                                logger.info(f"从页面文本找到价格: {device_details['price']}")
-                                break
-                    if price_found:
-                        break
-            
-            if not price_found:
-                # 如果找到Amazon购买链接，至少标记为"Available on Amazon"
-                if amazon_buttons:
-                    device_details['price'] = "Available on Amazon"
-                    logger.info("未找到具体价格，但有Amazon购买链接")
-                else:
-                    device_details['price'] = "Price not available"
-                    logger.warning("未找到任何价格信息")
+            price, tier = scan_price(soup, device_details.get('specifications'))
+            device_details['price'] = price
+            if tier:
+                logger.info(f"从{tier_label(tier)}找到价格: {price}")
+            elif price == "Available on Amazon":
+                logger.info("未找到具体价格，但有Amazon购买链接")
+            else:
+                logger.warning("未找到任何价格信息")
             
         except Exception as e:
             logger.error(f"提取价格信息失败: {str(e)}")
-            device_details['price'] = "Price extraction failed"
+            device_details['price'] = PRICE_EXTRACTION_FAILED
     
     def get_device_info(self, manufacture, model):
         """获取完整设备信息"""
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按主机的请求限速
+同一主机的两次请求之间至少间隔 interval 秒，多个线程共用一个限速器；
+不同主机互不影响，所以访问 GSMChoice 和 GSMArena 的阶段可以同时推进。
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    def __init__(self, default_interval=3, intervals=None, pause=None):
+        """初始化限速器
+
+        Args:
+            default_interval (float): 未单独配置的主机的最小请求间隔（秒）
+            intervals (dict): {主机名: 最小请求间隔}
+            pause (callable): 等待函数，默认 time.sleep（传入 transport.pause 可在回放时跳过等待）
+        """
+        self.default_interval = default_interval
+        self.intervals = dict(intervals or {})
+        self.pause = pause or time.sleep
+        self.lock = threading.Lock()
+        self.next_slot = {}
+        self.waited = {}
+
+    @staticmethod
+    def host_of(url):
+        return urlsplit(url).netloc.lower() or url
+
+    def interval_for(self, host):
+        return self.intervals.get(host, self.default_interval)
+
+    @contextmanager
+    def override_intervals(self, intervals):
+        """在 with 块内临时使用给定的主机间隔，退出时恢复原配置（限速器是进程共享的，不能永久修改）"""
+        intervals = dict(intervals or {})
+        with self.lock:
+            previous = {host: self.intervals.get(host) for host in intervals}
+            self.intervals.update(intervals)
+        try:
+            yield self
+        finally:
+            with self.lock:
+                for host, interval in previous.items():
+                    if interval is None:
+                        self.intervals.pop(host, None)
+                    else:
+                        self.intervals[host] = interval
+
+    def wait(self, url):
+        """为一次请求预约时间槽，必要时等待；返回等待的秒数"""
+        host = self.host_of(url)
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0))
+            self.next_slot[host] = slot + self.interval_for(host)
+            delay = slot - now
+            if delay > 0:
+                self.waited[host] = self.waited.get(host, 0) + delay
+        if delay > 0:
+            self.pause(delay)
+        return delay
+
+    def get_stats(self):
+        with self.lock:
+            return {host: round(seconds, 1) for host, seconds in self.waited.items()}
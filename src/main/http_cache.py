@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 响应压缩与 HTTP 缓存
+- 压缩: 按 Accept-Encoding 协商 br（需安装 brotli）或 gzip，只压缩超过 MIN_COMPRESS_SIZE 的文本/JSON 响应
+- ETag: 响应体只序列化一次，用它的摘要作为强 ETag；压缩后的表示追加 -gzip / -br 后缀（不同编码是不同的表示），
+  比较 If-None-Match 时忽略后缀，命中返回 304，不再传输响应体
+- Cache-Control: 数据库命中的结果允许客户端/CDN 缓存 API_CACHE_MAX_AGE 秒，之后凭 ETag 重新验证
+
+环境变量:
+  API_CACHE_MAX_AGE  数据库命中结果的缓存秒数（默认 300）
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+CACHE_PUBLIC = 'public, max-age={max_age}'
+# 实时爬取的结果没有入库，每次使用前都要重新验证
+CACHE_REVALIDATE = 'no-cache'
+CACHE_NONE = 'no-store'
+
+
+def cache_max_age():
+    return int(os.environ.get('API_CACHE_MAX_AGE', 300))
+
+
+def body_etag(body):
+    """响应体的强 ETag"""
+    return f'"{hashlib.sha1(body).hexdigest()[:32]}"'
+
+
+def _etag_base(tag):
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in ('-gzip', '-br'):
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 中是否有与 etag 相同的标签（忽略编码后缀），返回命中的原始标签或 None"""
+    if not if_none_match:
+        return None
+    base = _etag_base(etag)
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or (tag and _etag_base(tag) == base):
+            return tag
+    return None
+
+
+def negotiate_encoding(accept_encoding):
+    """按 Accept-Encoding 选择压缩方式：br 优先（已安装 brotli 时），否则 gzip，都不接受返回 None"""
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip()] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response, accept_encoding):
+    """after_request 钩子：按协商结果压缩响应体，并给 ETag 加上编码后缀"""
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code < 200 or response.status_code >= 300 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+
+    encoding = negotiate_encoding(accept_encoding)
+    if not encoding:
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+
+    try:
+        response.set_data(compress(body, encoding))
+    except Exception as e:
+        logger.warning(f"压缩响应失败: {str(e)}")
+        return response
+    response.headers['Content-Encoding'] = encoding
+    etag = response.headers.get('ETag')
+    if etag:
+        response.headers['ETag'] = f'"{_etag_base(etag)}-{encoding}"'
+    return response
@@ -9,7 +9,6 @@
 
 import pandas as pd
 import pymongo
-from pymongo import MongoClient
 import requests
 from bs4 import BeautifulSoup
 import json
@@ -18,6 +17,7 @@ import time
 from datetime import datetime
 import os
 import re
+import threading
 from urllib.parse import quote_plus, urljoin
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -25,6 +25,13 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
+from scraper_transport import get_transport
+from device_normalizer import apply_normalization
+from gsmarena_catalog import GSMArenaCatalog, parse_device_links
+from model_code_index import parse_model_codes
+from device_store import open_store
+from scrape_scheduler import get_scheduler, PRIORITY_BULK
+from recovery_pipeline import RecoveryPipeline
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -42,13 +49,19 @@ class HybridDeviceScraper:
         # GSMArena配置
         self.gsmarena_base = "https://www.gsmarena.com"
         
-        # 初始化MongoDB
-        self.mongo_client = MongoClient(mongo_uri)
-        self.db = self.mongo_client[db_name]
-        self.collection = self.db['devices']
+        # 初始化存储（mongodb:// 或 sqlite:///，见 device_store）
+        self.store = open_store(mongo_uri, db_name)
+        self.store.ensure_indexes()
+        # SQLite 后端下为 None
+        self.mongo_client, self.db, self.collection = self.store.client, self.store.db, self.store.collection
+        
+        # GSMArena本地目录（名称 → 详情页URL），保存在MongoDB中；SQLite 后端下每次在线搜索
+        self.catalog = GSMArenaCatalog(self.db) if self.db is not None else None
         
         # 初始化session
         self.session = requests.Session()
+        self.transport = get_transport()
+        self.transport.mount(self.session)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
@@ -57,14 +70,30 @@ class HybridDeviceScraper:
             'Connection': 'keep-alive',
         })
         
-        # 初始化Selenium WebDriver
-        self.driver = None
-        self._init_driver()
+        # 名称发现各层级命中次数
+        self.discovery_stats = {}
+        self.discovery_lock = threading.Lock()
+        
+        # 按主机限速（同一主机两次请求至少间隔 request_delay 秒），与API实时查询共用调度器
+        self.rate_limiter = get_scheduler()
+        self.priority = PRIORITY_BULK
+        
+        # Selenium WebDriver 第一次用到时才创建（流水线的浏览器工作线程各自创建，不用这个）
+        self._driver = None
+        self._driver_created = False
         
         logger.info("🚀 混合策略爬虫初始化完成")
     
-    def _init_driver(self):
-        """初始化Selenium WebDriver"""
+    @property
+    def driver(self):
+        """单线程路径使用的WebDriver（延迟创建，创建失败为 None）"""
+        if not self._driver_created:
+            self._driver_created = True
+            self._driver = self._create_driver()
+        return self._driver
+    
+    def _create_driver(self):
+        """创建一个Selenium WebDriver（流水线的每个浏览器工作线程各用一个）"""
         try:
             chrome_options = Options()
             chrome_options.add_argument('--headless')
@@ -77,85 +106,155 @@ class HybridDeviceScraper:
             chrome_options.add_experimental_option('useAutomationExtension', False)
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            self.driver.set_page_load_timeout(30)
+            driver = self.transport.create_driver(lambda: webdriver.Chrome(options=chrome_options))
+            driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            driver.set_page_load_timeout(30)
             logger.info("✅ Selenium WebDriver初始化成功")
+            return driver
         except Exception as e:
             logger.error(f"❌ WebDriver初始化失败: {str(e)}")
-            self.driver = None
+            return None
     
-    def get_device_name_from_gsmchoice(self, manufacture, model_code):
-        """从GSMChoice获取准确的设备名称（只要名称，不要价格）"""
-        try:
-            search_query = f"{manufacture} {model_code}"
-            encoded_query = quote_plus(search_query)
-            
-            # 方法1: API搜索
-            search_url = f"{self.gsmchoice_search_api}?search={encoded_query}&lang=en&v=3"
-            logger.info(f"🔍 GSMChoice API搜索: {search_query}")
-            
-            time.sleep(self.request_delay)
-            
-            try:
-                response = self.session.get(search_url, timeout=30)
-                response.raise_for_status()
-                results = response.json()
-                
-                if results and len(results) > 0:
-                    first_result = results[0]
-                    device_name = first_result.get('model', '').strip()
-                    if device_name and device_name != 'Unknown':
-                        logger.info(f"✅ GSMChoice API找到设备名称: {device_name}")
-                        return device_name
-            except Exception as e:
-                logger.warning(f"GSMChoice API搜索失败: {str(e)}")
-            
-            # 方法2: 网页搜索
-            if self.driver:
-                try:
-                    search_url = f"{self.gsmchoice_base}/en/search/?sSearch4={encoded_query}"
-                    logger.info(f"🌐 GSMChoice网页搜索: {search_query}")
-                    
-                    self.driver.get(search_url)
-                    time.sleep(3)
-                    
-                    # 查找搜索结果
-                    soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                    device_links = soup.find_all('a', href=re.compile(r'/en/catalogue/.*/.*/'))
-                    
-                    if device_links:
-                        # 访问第一个设备详情页获取名称
-                        first_link = device_links[0]
-                        href = first_link.get('href', '')
-                        
-                        if href:
-                            detail_url = urljoin(self.gsmchoice_base, href)
-                            self.driver.get(detail_url)
-                            time.sleep(2)
-                            
-                            detail_soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                            title_element = detail_soup.find('h1', class_='infoline__title')
-                            
-                            if title_element:
-                                title_span = title_element.find('span')
-                                if title_span:
-                                    device_name = title_span.get_text(strip=True)
-                                    logger.info(f"✅ GSMChoice网页找到设备名称: {device_name}")
-                                    return device_name
-                except Exception as e:
-                    logger.warning(f"GSMChoice网页搜索失败: {str(e)}")
-            
-            logger.warning(f"❌ GSMChoice未找到设备: {manufacture} {model_code}")
+    def _throttle(self, url):
+        """请求前按主机限速"""
+        self.rate_limiter.wait(url, self.priority, self.request_delay)
+    
+    def _gsmchoice_query_variants(self, manufacture, model_code):
+        """GSMChoice API的查询变体: 原始查询、去掉品牌、只用型号、规范化空格"""
+        code = ' '.join(model_code.split())
+        brand_stripped = re.sub(rf'^{re.escape(manufacture)}\s*', '', code, flags=re.IGNORECASE).strip() if manufacture else code
+        # "BV4900Pro" -> "BV4900 Pro"，"SM-A155F" -> "SM A155F"
+        spaced = re.sub(r'(?<=\d)(?=[A-Za-z]{2,})', ' ', brand_stripped.replace('-', ' ').replace('_', ' '))
+        spaced = ' '.join(spaced.split())
+
+        variants = []
+        for query in (f"{manufacture} {code}".strip(), f"{manufacture} {brand_stripped}".strip(),
+                      brand_stripped, f"{manufacture} {spaced}".strip(), spaced):
+            if query and query not in variants:
+                variants.append(query)
+        return variants
+
+    def _count_discovery(self, tier):
+        with self.discovery_lock:
+            self.discovery_stats[tier] = self.discovery_stats.get(tier, 0) + 1
+
+    def get_discovery_stats(self):
+        """名称发现各层级的命中次数"""
+        with self.discovery_lock:
+            return dict(self.discovery_stats)
+
+    def _search_gsmchoice_api(self, query, manufacture, require_brand):
+        """GSMChoice searchy JSON接口；变体查询要求结果品牌一致，避免只用型号时匹配到别的品牌"""
+        search_url = f"{self.gsmchoice_search_api}?search={quote_plus(query)}&lang=en&v=3"
+        logger.info(f"🔍 GSMChoice API搜索: {query}")
+
+        self._throttle(search_url)
+        response = self.session.get(search_url, timeout=30)
+        response.raise_for_status()
+        results = response.json() or []
+
+        for result in results:
+            device_name = (result.get('model') or '').strip()
+            if not device_name or device_name == 'Unknown':
+                continue
+            brand = (result.get('brand') or '').strip()
+            if require_brand and brand and manufacture and brand.lower() != manufacture.lower():
+                continue
+            return device_name
+        return None
+
+    def _search_gsmchoice_html(self, query):
+        """GSMChoice静态搜索页（requests），从结果链接或详情页标题取名称"""
+        search_url = f"{self.gsmchoice_base}/en/search/?sSearch4={quote_plus(query)}"
+        logger.info(f"🌐 GSMChoice搜索页(HTTP): {query}")
+
+        self._throttle(search_url)
+        response = self.session.get(search_url, timeout=30)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.content, 'html.parser')
+
+        device_links = soup.find_all('a', href=re.compile(r'/en/catalogue/.*/.*/'))
+        if not device_links:
             return None
-            
-        except Exception as e:
-            logger.error(f"❌ GSMChoice搜索异常: {str(e)}")
+
+        detail_url = urljoin(self.gsmchoice_base, device_links[0].get('href', ''))
+        self._throttle(detail_url)
+        response = self.session.get(detail_url, timeout=30)
+        response.raise_for_status()
+        return self._parse_gsmchoice_title(BeautifulSoup(response.content, 'html.parser')) \
+            or device_links[0].get_text(' ', strip=True) or None
+
+    @staticmethod
+    def _parse_gsmchoice_title(soup):
+        title_element = soup.find('h1', class_='infoline__title')
+        title_span = title_element.find('span') if title_element else None
+        return title_span.get_text(strip=True) if title_span else None
+
+    def _search_gsmchoice_browser(self, query, driver):
+        """浏览器搜索（最后手段）"""
+        search_url = f"{self.gsmchoice_base}/en/search/?sSearch4={quote_plus(query)}"
+        logger.info(f"🌐 GSMChoice网页搜索: {query}")
+
+        self._throttle(search_url)
+        driver.get(search_url)
+        self.transport.pause(3)
+
+        # 查找搜索结果
+        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        device_links = soup.find_all('a', href=re.compile(r'/en/catalogue/.*/.*/'))
+        if not device_links or not device_links[0].get('href'):
             return None
+
+        # 访问第一个设备详情页获取名称
+        detail_url = urljoin(self.gsmchoice_base, device_links[0].get('href'))
+        self._throttle(detail_url)
+        driver.get(detail_url)
+        self.transport.pause(2)
+        return self._parse_gsmchoice_title(BeautifulSoup(driver.page_source, 'html.parser'))
+
+    def _search_gsmchoice_browser_with(self, query, driver):
+        """浏览器层：前面几层都未命中时才取（必要时创建）WebDriver"""
+        driver = driver if driver is not None else self.driver
+        return self._search_gsmchoice_browser(query, driver) if driver else None
+
+    def get_device_name_from_gsmchoice(self, manufacture, model_code, driver=None):
+        """从GSMChoice获取准确的设备名称（只要名称，不要价格）
+        
+        依次尝试: API原始查询 → API查询变体 → 静态搜索页(HTTP) → 浏览器；
+        每层命中次数记录在 discovery_stats 中
+        """
+        variants = self._gsmchoice_query_variants(manufacture, model_code)
+        search_query = variants[0]
+
+        tiers = [('api', lambda: self._search_gsmchoice_api(search_query, manufacture, False))]
+        for query in variants[1:]:
+            tiers.append(('api_variant', lambda query=query: self._search_gsmchoice_api(query, manufacture, True)))
+        tiers.append(('search_html', lambda: self._search_gsmchoice_html(search_query)))
+        tiers.append(('browser', lambda: self._search_gsmchoice_browser_with(search_query, driver)))
+
+        for tier, search in tiers:
+            try:
+                device_name = search()
+            except Exception as e:
+                logger.warning(f"GSMChoice搜索失败 [{tier}]: {str(e)}")
+                continue
+            if device_name:
+                self._count_discovery(tier)
+                logger.info(f"✅ GSMChoice找到设备名称 [{tier}]: {device_name}")
+                return device_name
+
+        self._count_discovery('miss')
+        logger.warning(f"❌ GSMChoice未找到设备: {manufacture} {model_code}")
+        return None
     
-    def search_gsmarena_by_name(self, device_name):
-        """通过设备名称在GSMArena搜索"""
-        if not self.driver:
+    def search_gsmarena_by_name(self, device_name, manufacture=None, driver=None):
+        """通过设备名称在GSMArena搜索（先查本地目录，置信度不足时在线搜索）"""
+        catalog_url = self.catalog.resolve(device_name, manufacture) if self.catalog else None
+        if catalog_url:
+            return catalog_url
+        
+        driver = driver if driver is not None else self.driver
+        if not driver:
             logger.error("WebDriver未初始化")
             return None
         
@@ -177,8 +276,9 @@ class HybridDeviceScraper:
                 logger.info(f"🔍 GSMArena搜索: {query}")
                 
                 try:
-                    self.driver.get(search_url)
-                    wait = WebDriverWait(self.driver, 15)
+                    self._throttle(search_url)
+                    driver.get(search_url)
+                    wait = WebDriverWait(driver, 15)
                     
                     # 等待解密内容
                     decrypted_element = wait.until(
@@ -187,13 +287,15 @@ class HybridDeviceScraper:
                     
                     # 等待内容加载
                     wait.until(lambda d: decrypted_element.get_attribute('innerHTML').strip() != '')
-                    time.sleep(2)
+                    self.transport.pause(2)
                     
                     decrypted_content = decrypted_element.get_attribute('innerHTML')
                     if not decrypted_content or decrypted_content.strip() == '':
                         continue
                     
                     soup = BeautifulSoup(decrypted_content, 'html.parser')
+                    if self.catalog:
+                        self.catalog.add_many(parse_device_links(soup, self.gsmarena_base), source='search')
                     device_links = []
                     
                     # 查找设备链接
@@ -224,8 +326,6 @@ class HybridDeviceScraper:
                 except Exception as e:
                     logger.warning(f"GSMArena搜索异常: {query} - {str(e)}")
                     continue
-                
-                time.sleep(self.request_delay)
             
             logger.warning(f"❌ GSMArena未找到设备: {device_name}")
             return None
@@ -239,6 +339,7 @@ class HybridDeviceScraper:
         try:
             logger.info(f"📄 提取GSMArena详情: {device_url}")
             
+            self._throttle(device_url)
             response = self.session.get(device_url, timeout=30)
             response.raise_for_status()
             
@@ -295,6 +396,7 @@ class HybridDeviceScraper:
                             elif 'Models' in cell_text and i + 1 < len(cell_texts):
                                 models_info = cell_texts[i + 1]
                                 device_info['model_code'] = models_info
+                                device_info['model_codes'] = parse_model_codes(models_info)
                         
                         # 存储所有规格
                         if len(cell_texts) >= 2:
@@ -311,6 +413,44 @@ class HybridDeviceScraper:
             logger.error(f"❌ GSMArena信息提取失败: {str(e)}")
             return None
     
+    def find_valid_existing(self, model_code):
+        """返回 (已有文档, 是否已有效)；兄弟型号已抓取过也算有效"""
+        existing = self.store.find_exact(model_code)
+        sibling = existing or self.store.find_device(model_code, {"device_name": 1})
+        return existing, bool(sibling and sibling.get('device_name', '') != 'Unknown')
+    
+    def store_recovered_device(self, manufacture, model_code, device_name, gsmarena_url, gsmarena_details, existing):
+        """构建设备文档并写入数据库（已存在的Unknown文档会被更新）"""
+        device_doc = {
+            "model_code": model_code,
+            "device_name": gsmarena_details['name'],  # 使用GSMArena的准确名称
+            "announced_date": gsmarena_details['announced_date'],
+            "release_date": gsmarena_details['release_date'],
+            "price": gsmarena_details['price'],
+            "manufacture": manufacture,
+            "source_url": gsmarena_url,
+            "created_at": datetime.now(),
+            "updated_at": datetime.now(),
+            "specifications": gsmarena_details['specifications'],
+            "model_codes": gsmarena_details.get('model_codes', []),
+            "data_source": "hybrid_gsmchoice_gsmarena",
+            "gsmchoice_name": device_name  # 保存GSMChoice找到的名称作为参考
+        }
+        
+        apply_normalization(device_doc)
+        
+        if existing:
+            self.store.update_device(existing, device_doc)
+            logger.info(f"✅ 更新设备: {model_code} - {gsmarena_details['name']}")
+        else:
+            self.store.insert_device(device_doc)
+            logger.info(f"✅ 混合策略成功处理设备:")
+        logger.info(f"   型号代码: {model_code}")
+        logger.info(f"   GSMChoice发现名称: {device_name}")
+        logger.info(f"   GSMArena确认名称: {gsmarena_details['name']}")
+        logger.info(f"   价格: {gsmarena_details['price']}")
+        logger.info(f"   发布日期: {gsmarena_details['announced_date']}")
+    
     def process_single_device(self, device_info):
         """处理单个设备的混合策略"""
         manufacture = device_info.get('manufacture', '').strip()
@@ -324,8 +464,8 @@ class HybridDeviceScraper:
             logger.info(f"🔄 处理设备: {manufacture} {model_code}")
             
             # 检查数据库中是否已存在且不是Unknown
-            existing = self.collection.find_one({"model_code": model_code})
-            if existing and existing.get('device_name', '') != 'Unknown':
+            existing, valid = self.find_valid_existing(model_code)
+            if valid:
                 logger.info(f"⏭️ 设备已存在且有效: {model_code}")
                 return True
             
@@ -337,7 +477,7 @@ class HybridDeviceScraper:
                 return False
             
             # 步骤2: 使用设备名称在GSMArena搜索并获取完整信息
-            gsmarena_url = self.search_gsmarena_by_name(device_name)
+            gsmarena_url = self.search_gsmarena_by_name(device_name, manufacture)
             
             if not gsmarena_url:
                 logger.warning(f"❌ 无法在GSMArena找到设备: {device_name}")
@@ -350,38 +490,8 @@ class HybridDeviceScraper:
                 logger.warning(f"❌ 无法从GSMArena提取详情: {device_name}")
                 return False
             
-            # 步骤4: 构建最终的设备文档
-            device_doc = {
-                "model_code": model_code,
-                "device_name": gsmarena_details['name'],  # 使用GSMArena的准确名称
-                "announced_date": gsmarena_details['announced_date'],
-                "release_date": gsmarena_details['release_date'],
-                "price": gsmarena_details['price'],
-                "manufacture": manufacture,
-                "source_url": gsmarena_url,
-                "created_at": datetime.now(),
-                "updated_at": datetime.now(),
-                "specifications": gsmarena_details['specifications'],
-                "data_source": "hybrid_gsmchoice_gsmarena",
-                "gsmchoice_name": device_name  # 保存GSMChoice找到的名称作为参考
-            }
-            
-            # 步骤5: 更新或插入数据库
-            if existing:
-                self.collection.update_one(
-                    {"model_code": model_code},
-                    {"$set": device_doc}
-                )
-                logger.info(f"✅ 更新设备: {model_code} - {gsmarena_details['name']}")
-            else:
-                self.collection.insert_one(device_doc)
-                logger.info(f"✅ 混合策略成功处理设备:")
-            logger.info(f"   型号代码: {model_code}")
-            logger.info(f"   GSMChoice发现名称: {device_name}")
-            logger.info(f"   GSMArena确认名称: {gsmarena_details['name']}")
-            logger.info(f"   价格: {gsmarena_details['price']}")
-            logger.info(f"   发布日期: {gsmarena_details['announced_date']}")
-            
+            # 步骤4: 构建设备文档并更新或插入数据库
+            self.store_recovered_device(manufacture, model_code, device_name, gsmarena_url, gsmarena_details, existing)
             return True
             
         except Exception as e:
@@ -426,8 +536,14 @@ class HybridDeviceScraper:
             logger.error(f"读取Unknown设备失败: {str(e)}")
             return []
     
-    def process_failed_and_unknown_devices(self):
-        """处理失败设备和Unknown设备"""
+    def process_failed_and_unknown_devices(self, workers=None, queue_size=20, host_intervals=None):
+        """处理失败设备和Unknown设备（分阶段并发流水线）
+        
+        Args:
+            workers (dict): 各阶段线程数 {'discover', 'resolve', 'detail', 'write'}
+            queue_size (int): 阶段之间队列的容量
+            host_intervals (dict): {主机名: 最小请求间隔（秒）}
+        """
         logger.info("🚀 开始处理失败设备和Unknown设备")
         
         # 读取失败设备
@@ -452,24 +568,14 @@ class HybridDeviceScraper:
         logger.info(f"   Unknown设备: {len(unknown_devices)}")
         logger.info(f"   去重后: {len(devices_to_process)}")
         
-        # 处理设备
-        success_count = 0
-        failed_count = 0
-        still_failed = []
+        if not devices_to_process:
+            return
         
-        for i, device in enumerate(devices_to_process, 1):
-            logger.info(f"📱 进度: {i}/{len(devices_to_process)} ({i/len(devices_to_process)*100:.1f}%)")
-            
-            success = self.process_single_device(device)
-            
-            if success:
-                success_count += 1
-            else:
-                failed_count += 1
-                still_failed.append(device)
-            
-            # 添加延迟避免被封
-            time.sleep(self.request_delay)
+        # 处理设备
+        pipeline = RecoveryPipeline(self, workers=workers, queue_size=queue_size, host_intervals=host_intervals)
+        succeeded, still_failed = pipeline.run(devices_to_process)
+        success_count = len(succeeded)
+        failed_count = len(still_failed)
         
         # 保存仍然失败的设备
         if still_failed:
@@ -490,11 +596,11 @@ class HybridDeviceScraper:
     
     def close(self):
         """关闭连接"""
-        if self.driver:
-            self.driver.quit()
+        if self._driver:
+            self._driver.quit()
             logger.info("🔒 WebDriver已关闭")
-        if self.mongo_client:
-            self.mongo_client.close()
+        if self.store:
+            self.store.close()
             logger.info("🔒 数据库连接已关闭")
 
 def main():
@@ -5,13 +5,13 @@
 
 import pandas as pd
 import pymongo
-from pymongo import MongoClient
 import json
 import logging
 import time
 from datetime import datetime
 import os
 import sys
+import argparse
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +19,10 @@ logger = logging.getLogger(__name__)
 
 # 导入爬虫模块（只导入爬虫类，不导入Flask应用）
 from device_scraper_core import DeviceInfoScraper
+from device_normalizer import apply_normalization
+from model_code_index import canonical_code
+from device_store import open_store
+from work_queue import WorkQueue
 
 class DataImporter:
     def __init__(self, mongo_uri="mongodb://localhost:27017/", db_name="device_info", max_workers=5):
@@ -26,6 +30,7 @@ class DataImporter:
         self.mongo_uri = mongo_uri
         self.db_name = db_name
         self.max_workers = max_workers
+        self.store = None
         self.client = None
         self.db = None
         self.collection = None
@@ -37,17 +42,18 @@ class DataImporter:
         self._init_mongodb()
     
     def _init_mongodb(self):
-        """初始化MongoDB连接"""
+        """初始化存储（mongodb:// 或 sqlite:///，见 device_store）"""
         try:
-            self.client = MongoClient(self.mongo_uri)
-            self.db = self.client[self.db_name]
-            self.collection = self.db['devices']
+            self.store = open_store(self.mongo_uri, self.db_name)
+            # SQLite 后端下为 None
+            self.client, self.db, self.collection = self.store.client, self.store.db, self.store.collection
             
             # 创建索引
-            self.collection.create_index("model_code", unique=True)
-            self.collection.create_index("device_name")
+            self.store.ensure_indexes()
+            # 与 API 服务（另一个进程）共享主机时间槽；SQLite 后端下 db 为 None，只在本进程内限速
+            self.scraper.scheduler.share_via(self.db)
             
-            logger.info(f"MongoDB连接成功: {self.db_name}")
+            logger.info(f"数据库连接成功: {self.db_name}（{self.store.backend}）")
         except Exception as e:
             logger.error(f"MongoDB连接失败: {str(e)}")
             raise
@@ -89,15 +95,18 @@ class DataImporter:
     def filter_existing_devices(self, devices):
         """过滤掉数据库中已存在的设备（考虑型号标准化）"""
         existing_codes = set()
+        sibling_codes = set()
         try:
             # 获取数据库中已存在的型号
-            cursor = self.collection.find({}, {"model_code": 1})
-            for doc in cursor:
+            for model_code in self.store.model_codes():
                 # 标准化已存在的型号代码
-                normalized_code = self.normalize_model_code(doc["model_code"])
+                normalized_code = self.normalize_model_code(model_code)
                 existing_codes.add(normalized_code)
             
             logger.info(f"数据库中已存在 {len(existing_codes)} 个设备")
+            
+            # 已抓取机型的兄弟型号（详情页 Models 行）
+            sibling_codes = self.store.known_codes()
         except Exception as e:
             logger.warning(f"查询已存在设备失败: {str(e)}")
         
@@ -105,7 +114,7 @@ class DataImporter:
         new_devices = []
         for device in devices:
             normalized_code = self.normalize_model_code(device['model_code'])
-            if normalized_code not in existing_codes:
+            if normalized_code not in existing_codes and canonical_code(normalized_code) not in sibling_codes:
                 new_devices.append(device)
             else:
                 logger.info(f"设备已存在，跳过: {device['model_code']} (标准化: {normalized_code})")
@@ -114,9 +123,13 @@ class DataImporter:
         return new_devices
     
     def store_device_batch(self, scrape_results):
-        """批量存储设备信息到数据库"""
+        """批量存储设备信息到数据库
+        
+        Returns:
+            (成功数, 存储失败的结果列表 [(result_data, 错误信息)])
+        """
         success_count = 0
-        error_count = 0
+        failed_results = []
         
         for result_data in scrape_results:
             try:
@@ -135,19 +148,21 @@ class DataImporter:
                     "source_url": data['source_url'],
                     "created_at": datetime.now(),
                     "updated_at": datetime.now(),
-                    "specifications": data['specifications']  # 完整规格信息
+                    "specifications": data['specifications'],  # 完整规格信息
+                    "content_hash": data.get('content_hash')  # 规格区域摘要，刷新时页面未变则跳过
                 }
                 
-                # 插入数据库
-                self.collection.insert_one(device_doc)
+                # 标准化规格字段后插入数据库
+                apply_normalization(device_doc)
+                self.store.insert_device(device_doc)
                 success_count += 1
                 
             except Exception as e:
                 logger.error(f"存储设备 {device_info['model_code']} 失败: {str(e)}")
-                error_count += 1
+                failed_results.append((result_data, str(e)))
         
-        logger.info(f"批量存储完成: 成功 {success_count}, 失败 {error_count}")
-        return success_count, error_count
+        logger.info(f"批量存储完成: 成功 {success_count}, 失败 {len(failed_results)}")
+        return success_count, failed_results
     
     def progress_callback(self, completed, total, success, failed):
         """进度回调函数"""
@@ -182,9 +197,9 @@ class DataImporter:
         
         # 批量存储成功的结果
         if scrape_results:
-            store_success, store_error = self.store_device_batch(scrape_results)
+            store_success, _ = self.store_device_batch(scrape_results)
         else:
-            store_success, store_error = 0, 0
+            store_success = 0
         
         # 保存失败的设备信息
         self.save_failed_devices(failed_devices)
@@ -198,6 +213,65 @@ class DataImporter:
         logger.info(f"爬取失败: {len(failed_devices)}")
         logger.info(f"成功率: {len(scrape_results)/total_count*100:.1f}%")
     
+    def distributed_process_devices(self, csv_file="device_result.csv", enqueue=True, batch_size=None):
+        """多节点导入：设备列表放入 MongoDB 共享队列，各节点领取任务处理，互不重复
+        
+        Args:
+            csv_file (str): 设备CSV（enqueue=False 时不读取）
+            enqueue (bool): 是否把CSV中的新设备入队（重复入队不会产生重复任务）
+            batch_size (int): 每次领取的任务数，默认线程数的2倍
+        """
+        if self.db is None:
+            raise RuntimeError("多节点导入需要MongoDB存储（共享工作队列）")
+        work_queue = WorkQueue(self.db)
+        work_queue.ensure_indexes()
+        batch_size = batch_size or self.max_workers * 2
+        
+        if enqueue:
+            devices = self.read_csv_data(csv_file)
+            new_devices = self.filter_existing_devices(devices) if devices else []
+            work_queue.enqueue(new_devices)
+        
+        logger.info(f"🧵 节点 {work_queue.owner} 开始领取任务，每批 {batch_size} 个")
+        work_queue.start_heartbeat()
+        scraped_total = stored_total = failed_total = 0
+        try:
+            while True:
+                tasks = work_queue.claim_batch(batch_size)
+                if not tasks:
+                    break
+                
+                batch = [dict(task['device'], task_id=task['_id']) for task in tasks]
+                scrape_results, failed_devices = self.scraper.batch_get_device_info(
+                    batch,
+                    progress_callback=self.progress_callback
+                )
+                print()  # 换行
+                
+                store_failed = []
+                if scrape_results:
+                    store_success, store_failed = self.store_device_batch(scrape_results)
+                    stored_total += store_success
+                # 存储失败的任务放回队列（可能是数据库临时故障），不能标记完成
+                failed_ids = set()
+                for result_data, error in store_failed:
+                    task_id = result_data['device_info']['task_id']
+                    failed_ids.add(task_id)
+                    work_queue.fail(task_id, f'存储失败: {error}')
+                for result_data in scrape_results:
+                    if result_data['device_info']['task_id'] not in failed_ids:
+                        work_queue.complete(result_data['device_info']['task_id'])
+                for device in failed_devices:
+                    work_queue.fail(device['task_id'], '爬取失败')
+                
+                scraped_total += len(scrape_results)
+                failed_total += len(failed_devices)
+                logger.info(f"📊 队列状态: {work_queue.get_stats()}")
+        finally:
+            work_queue.stop_heartbeat()
+        
+        logger.info(f"本节点处理完成: 爬取成功 {scraped_total}, 存储成功 {stored_total}, 失败 {failed_total}")
+    
     def save_failed_devices(self, failed_devices):
         """保存查询失败的设备信息"""
         if not failed_devices:
@@ -221,19 +295,8 @@ class DataImporter:
     def get_stats(self):
         """获取数据库统计信息"""
         try:
-            total_count = self.collection.count_documents({})
-            with_price = self.collection.count_documents({"price": {"$ne": ""}})
-            with_date = self.collection.count_documents({"announced_date": {"$ne": ""}})
-            
-            stats = {
-                "total_devices": total_count,
-                "devices_with_price": with_price,
-                "devices_with_date": with_date,
-                "price_coverage": f"{with_price/total_count*100:.1f}%" if total_count > 0 else "0%",
-                "date_coverage": f"{with_date/total_count*100:.1f}%" if total_count > 0 else "0%"
-            }
-            
-            return stats
+            # 读增量维护的计数，不再全表计数
+            return self.store.stats()
         except Exception as e:
             logger.error(f"获取统计信息失败: {str(e)}")
             return {}
@@ -242,15 +305,21 @@ class DataImporter:
         """关闭连接"""
         if self.scraper:
             self.scraper.close()
-        if self.client:
-            self.client.close()
+        if self.store:
+            self.store.close()
             logger.info("数据库连接已关闭")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='设备数据导入')
+    parser.add_argument('--csv', default='device_result.csv', help='设备CSV文件')
+    parser.add_argument('--distributed', action='store_true', help='通过MongoDB共享队列多节点导入')
+    parser.add_argument('--no-enqueue', action='store_true', help='只领取队列中已有的任务，不读取CSV')
+    args = parser.parse_args()
+    
     # 检查CSV文件是否存在
-    csv_file = "device_result.csv"
-    if not os.path.exists(csv_file):
+    csv_file = args.csv
+    if not (args.distributed and args.no_enqueue) and not os.path.exists(csv_file):
         logger.error(f"CSV文件不存在: {csv_file}")
         logger.info("请确保CSV文件存在并包含 'clientmanufacture' 和 'clientmodel' 列")
         return
@@ -269,7 +338,10 @@ def main():
         logger.info("🚀 开始处理设备数据...")
         logger.info("⚙️  配置: 5个线程，每个请求间隔5秒")
         
-        importer.batch_process_devices(csv_file)
+        if args.distributed:
+            importer.distributed_process_devices(csv_file, enqueue=not args.no_enqueue)
+        else:
+            importer.batch_process_devices(csv_file)
         end_time = time.time()
         
         # 输出统计信息
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+型号代码反向索引
+GSMArena 详情页的 Models 行列出了同一机型的全部地区型号（"CPH2387, CPH2389"、
+"SM-A155F, SM-A155F/DS, SM-A155M"），解析为规范化的型号列表写入设备文档的 model_codes，
+并在 model_code_index 集合中保存 型号 → 设备文档 的映射。
+之后查询任意一个兄弟型号都直接从数据库得到结果，不再搜索和抓取。
+"""
+
+import re
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+INDEX_COLLECTION = 'model_code_index'
+
+_SEPARATORS = re.compile(r'\s*(?:,|;|\n|\bor\b|\band\b)\s*', re.IGNORECASE)
+# 型号里至少要有一个数字，排除 "Models" 行里的说明文字
+_CODE_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9\-_/.+]*\d[A-Z0-9\-_/.+]*$')
+
+
+def canonical_code(code):
+    """规范化型号: 大写、去掉空白"""
+    return re.sub(r'\s+', '', str(code or '')).upper()
+
+
+def parse_model_codes(models_text):
+    """解析 Models 字段为型号列表（保持顺序、去重）
+
+    "SM-A155F/DS" 这类带双卡后缀的型号同时收录不带后缀的基础型号
+    """
+    codes = []
+    for part in _SEPARATORS.split(str(models_text or '')):
+        code = canonical_code(part)
+        if not code or not _CODE_PATTERN.match(code):
+            continue
+        candidates = [code]
+        if '/' in code:
+            candidates.append(code.split('/')[0])
+        for candidate in candidates:
+            if candidate not in codes and _CODE_PATTERN.match(candidate):
+                codes.append(candidate)
+    return codes
+
+
+def device_model_codes(device_doc):
+    """设备文档的全部型号: 自身型号 + 详情页 Models 行"""
+    codes = []
+    models_text = (device_doc.get('specifications') or {}).get('Models', '')
+    for code in [canonical_code(device_doc.get('model_code'))] + list(device_doc.get('model_codes') or []) \
+            + parse_model_codes(models_text):
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+
+def ensure_code_index(db):
+    collection = db[INDEX_COLLECTION]
+    collection.create_index([("code", ASCENDING)], unique=True)
+    collection.create_index([("model_code", ASCENDING)])
+    return collection
+
+
+def index_device_codes(db, device_doc):
+    """把设备文档的全部型号写入反向索引"""
+    codes = device_doc.get('model_codes') or device_model_codes(device_doc)
+    if not codes or not device_doc.get('model_code'):
+        return 0
+    now = datetime.now()
+    operations = [
+        UpdateOne(
+            {"code": code},
+            {"$set": {
+                "model_code": device_doc['model_code'],
+                "source_url": device_doc.get('source_url', ''),
+                "updated_at": now,
+            }},
+            upsert=True
+        )
+        for code in codes
+    ]
+    db[INDEX_COLLECTION].bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def find_by_code(db, model_code, projection=None):
+    """按型号查询设备文档；本身不存在时通过反向索引找兄弟型号的文档"""
+    devices = db['devices']
+    device = devices.find_one({"model_code": model_code}, projection)
+    if device:
+        return device
+
+    entry = db[INDEX_COLLECTION].find_one({"code": canonical_code(model_code)})
+    if not entry:
+        return None
+    device = devices.find_one({"model_code": entry['model_code']}, projection)
+    if device:
+        logger.info(f"🔗 型号 {model_code} 通过反向索引命中 {entry['model_code']}")
+    return device
+
+
+def known_codes(db):
+    """反向索引中的全部型号（规范化形式），用于批量导入前过滤"""
+    return {doc['code'] for doc in db[INDEX_COLLECTION].find({}, {"_id": 0, "code": 1})}
+
+
+def backfill_code_index(db, batch_size=500):
+    """为已有设备文档补写 model_codes 字段和反向索引"""
+    devices = db['devices']
+    ensure_code_index(db)
+    projection = {"model_code": 1, "model_codes": 1, "source_url": 1, "specifications.Models": 1}
+
+    operations = []
+    indexed = 0
+    for doc in devices.find({}, projection, batch_size=batch_size):
+        doc['model_codes'] = device_model_codes(doc)
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"model_codes": doc['model_codes']}}))
+        indexed += index_device_codes(db, doc)
+        if len(operations) >= batch_size:
+            devices.bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        devices.bulk_write(operations, ordered=False)
+
+    logger.info(f"型号反向索引回填完成: {indexed} 个型号")
+    return indexed
+
+
+if __name__ == "__main__":
+    from pymongo import MongoClient
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient("mongodb://localhost:27017/")
+    try:
+        backfill_code_index(client["device_info"])
+    finally:
+        client.close()
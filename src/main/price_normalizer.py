@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+价格标准化
+从原始价格字符串中提取所有 (金额, 货币) 对，按静态汇率表换算成参考货币，
+写入 price_value / price_currency 并建索引，价格区间查询和统计不再需要扫描字符串
+
+汇率表可通过环境变量 PRICE_FX_TABLE 指定JSON文件覆盖:
+  {"reference": "EUR", "rates": {"USD": 0.92, "GBP": 1.17, ...}}
+rates 表示 1 单位该货币等于多少参考货币
+"""
+
+import os
+import re
+import json
+import logging
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFERENCE_CURRENCY = 'EUR'
+
+# 1 单位货币 = 多少 EUR
+DEFAULT_FX_RATES = {
+    'EUR': 1.0,
+    'USD': 0.92,
+    'GBP': 1.17,
+    'INR': 0.011,
+    'CNY': 0.13,
+    'JPY': 0.0062,
+    'KRW': 0.00068,
+    'RUB': 0.010,
+    'BRL': 0.17,
+    'CAD': 0.68,
+    'AUD': 0.61,
+    'CHF': 1.04,
+    'PLN': 0.23,
+    'TRY': 0.028,
+    'IDR': 0.000058,
+    'MXN': 0.050,
+    'ZAR': 0.050,
+    'PHP': 0.016,
+    'THB': 0.026,
+    'MYR': 0.20,
+    'VND': 0.000037,
+    'NGN': 0.00060,
+    'PKR': 0.0033,
+    'BDT': 0.0078,
+}
+
+# 符号 → ISO代码（多字符符号放前面，保证优先匹配）
+CURRENCY_SYMBOLS = [
+    ('R$', 'BRL'), ('C$', 'CAD'), ('A$', 'AUD'), ('US$', 'USD'),
+    ('Rp', 'IDR'), ('zł', 'PLN'), ('RM', 'MYR'),
+    ('€', 'EUR'), ('$', 'USD'), ('£', 'GBP'), ('₹', 'INR'), ('¥', 'CNY'),
+    ('₩', 'KRW'), ('₽', 'RUB'), ('₺', 'TRY'), ('₱', 'PHP'), ('฿', 'THB'),
+    ('₫', 'VND'), ('₦', 'NGN'),
+]
+CURRENCY_WORDS = {'DOLLAR': 'USD', 'DOLLARS': 'USD', 'EURO': 'EUR', 'EUROS': 'EUR', 'RS': 'INR', 'RS.': 'INR'}
+
+PRICE_INDEXES = [
+    [("price_value", ASCENDING)],
+    [("manufacture", ASCENDING), ("price_value", ASCENDING)],
+]
+
+_symbol_alternation = '|'.join(re.escape(symbol) for symbol, _ in CURRENCY_SYMBOLS)
+_code_alternation = '|'.join(re.escape(code) for code in sorted(set(DEFAULT_FX_RATES) | set(CURRENCY_WORDS), key=len, reverse=True))
+_amount = r'\d[\d.,\s]*\d|\d'
+
+# 货币在前: "€ 180.00", "USD 199", "Rs. 12,999"；货币在后: "150 EUR", "180,00 €"
+PRICE_PATTERN = re.compile(
+    rf'(?P<pre>{_symbol_alternation}|\b(?:{_code_alternation})(?![A-Za-z]))\s*(?P<pre_amount>{_amount})'
+    rf'|(?P<post_amount>{_amount})\s*(?P<post>{_symbol_alternation}|\b(?:{_code_alternation})(?![A-Za-z]))',
+    re.IGNORECASE
+)
+
+
+def _load_fx_table():
+    path = os.environ.get('PRICE_FX_TABLE')
+    if not path:
+        return DEFAULT_REFERENCE_CURRENCY, dict(DEFAULT_FX_RATES)
+    try:
+        with open(path, encoding='utf-8') as f:
+            table = json.load(f)
+        rates = {code.upper(): float(rate) for code, rate in table['rates'].items()}
+        reference = table.get('reference', DEFAULT_REFERENCE_CURRENCY).upper()
+        rates.setdefault(reference, 1.0)
+        logger.info(f"加载汇率表: {path} (参考货币 {reference}, {len(rates)} 种货币)")
+        return reference, rates
+    except Exception as e:
+        logger.warning(f"汇率表加载失败 {path}: {str(e)}，使用默认汇率")
+        return DEFAULT_REFERENCE_CURRENCY, dict(DEFAULT_FX_RATES)
+
+
+REFERENCE_CURRENCY, FX_RATES = _load_fx_table()
+
+
+def _currency_code(token):
+    for symbol, code in CURRENCY_SYMBOLS:
+        if token == symbol or token.upper() == symbol.upper():
+            return code
+    token = token.upper()
+    return CURRENCY_WORDS.get(token, token)
+
+
+def parse_amount(text):
+    """解析金额字符串: "12,999" / "199.99" / "1.299,00" / "1 299" """
+    text = re.sub(r'\s+', '', text)
+    if ',' in text and '.' in text:
+        # 最后出现的分隔符是小数点
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        parts = text.split(',')
+        if len(parts) == 2 and len(parts[1]) != 3:
+            text = text.replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif text.count('.') > 1:
+        text = text.replace('.', '')
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_price(price_text):
+    """提取价格字符串中的所有 (金额, 货币) 对"""
+    if not price_text:
+        return []
+
+    pairs = []
+    for match in PRICE_PATTERN.finditer(str(price_text)):
+        if match.group('pre'):
+            currency, amount_text = match.group('pre'), match.group('pre_amount')
+        else:
+            currency, amount_text = match.group('post'), match.group('post_amount')
+        amount = parse_amount(amount_text)
+        if amount is not None and amount > 0:
+            pairs.append((amount, _currency_code(currency)))
+    return pairs
+
+
+def to_reference(amount, currency, fx_rates=None):
+    """按汇率表换算成参考货币，未知货币返回None"""
+    rate = (fx_rates or FX_RATES).get(currency)
+    if rate is None:
+        return None
+    return round(amount * rate, 2)
+
+
+def normalize_price(price_text, fx_rates=None, reference=None):
+    """价格标准化字段: price_value（参考货币）、price_currency、price_pairs"""
+    reference = reference or REFERENCE_CURRENCY
+    pairs = parse_price(price_text)
+
+    price_value = None
+    # 优先使用原本就是参考货币的金额，避免汇率误差
+    for amount, currency in sorted(pairs, key=lambda pair: pair[1] != reference):
+        price_value = to_reference(amount, currency, fx_rates)
+        if price_value is not None:
+            break
+
+    return {
+        'price_value': price_value,
+        'price_currency': reference if price_value is not None else None,
+        'price_pairs': [{'amount': amount, 'currency': currency} for amount, currency in pairs],
+    }
+
+
+def ensure_price_indexes(collection):
+    for keys in PRICE_INDEXES:
+        collection.create_index(keys)
+
+
+def backfill_prices(collection, batch_size=1000, only_missing=True):
+    """为已有文档批量补写价格字段（只读取 price 字段）"""
+    query = {"price_value": {"$exists": False}} if only_missing else {}
+
+    operations = []
+    updated = 0
+    for doc in collection.find(query, {"price": 1}, batch_size=batch_size):
+        operations.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": normalize_price(doc.get('price', ''))}
+        ))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+
+    logger.info(f"价格字段回填完成: 更新 {updated} 个文档")
+    return updated
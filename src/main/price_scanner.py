@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GSMChoice 详情页价格扫描
+一次遍历文档树收集已知的价格区域（Amazon购买按钮、price容器、脚本、规格表中的价格行），
+按优先级用同一个预编译的组合正则扫描，遇到第一个可信价格就停止；
+不再对整页 get_text() 跑多个 re.findall。
+"""
+
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 金额+货币 / 货币+金额 / 脚本中的 price: 123 三种写法合成一个正则
+PRICE_PATTERN = re.compile(
+    r'(?P<amount>\d+(?:[.,]\d+)?)\s*(?P<currency>€|EUR|Dollar|\$)'
+    r'|(?P<prefix_currency>€|EUR|USD|\$)\s*(?P<prefix_amount>\d+[.,]\d+)'
+    r'|price["\']?\s*[:=]\s*["\']?(?P<js_amount>\d+(?:[.,]\d+)?)\s*(?P<js_currency>€|EUR|Dollar|\$)?',
+    re.IGNORECASE
+)
+
+ACCESSORY_KEYWORDS = ('Handyhülle', 'Schutzfolien', 'Powerbank', 'Kopfhörer', 'USB-Adapter', 'Speicherkarte')
+
+# 合理价格区间，区间外的数字视为不可信（型号、年份、ID等）
+MIN_PRICE = 10
+MAX_PRICE = 10000
+
+# 扫描顺序
+TIERS = ('amazon', 'container', 'script', 'spec')
+_TIER_LABELS = {
+    'amazon': 'Amazon按钮',
+    'container': '价格容器',
+    'script': 'JavaScript',
+    'spec': '规格表',
+}
+
+
+def _classes(tag):
+    classes = tag.get('class') or []
+    return ' '.join(classes) if isinstance(classes, list) else classes
+
+
+def collect_price_regions(soup):
+    """一次遍历收集价格区域
+
+    Returns:
+        ({tier: [文本, ...]}, 是否存在Amazon购买按钮)
+    """
+    regions = {tier: [] for tier in TIERS}
+    has_amazon = False
+
+    # find_all(True) 走 bs4 的快速路径，比按标签名列表过滤快一个数量级
+    for tag in soup.find_all(True):
+        name = tag.name
+        if name == 'script':
+            text = tag.string
+            # 脚本里没有 price 字样就不用跑正则
+            if text and 'price' in text.lower():
+                regions['script'].append(text)
+        elif name == 'a':
+            if 'amazon-button' not in _classes(tag):
+                continue
+            has_amazon = True
+            text = tag.get_text(strip=True)
+            if any(keyword in text for keyword in ACCESSORY_KEYWORDS):
+                continue
+            if 'search' in tag.get('href', '') and len(text) > 5:
+                regions['amazon'].append(text)
+        elif name == 'div' and 'price' in _classes(tag):
+            regions['container'].append(tag.get_text(strip=True))
+
+    return regions, has_amazon
+
+
+def _match_price(text):
+    """返回文本中第一个可信价格 "金额 货币"，没有返回 None"""
+    for match in PRICE_PATTERN.finditer(text):
+        amount = match.group('amount') or match.group('prefix_amount') or match.group('js_amount')
+        currency = match.group('currency') or match.group('prefix_currency') or match.group('js_currency') or '€'
+        try:
+            value = float(amount.replace(',', '.'))
+        except ValueError:
+            continue
+        if MIN_PRICE <= value <= MAX_PRICE:
+            return f"{amount} {currency}"
+    return None
+
+
+def scan_price(soup, specifications=None):
+    """扫描页面价格
+
+    Args:
+        soup (BeautifulSoup): 详情页
+        specifications (dict): 已解析的规格，键名含 price 的行也参与扫描
+
+    Returns:
+        (价格字符串, 来源)；未找到具体价格时返回 "Available on Amazon" 或 "Price not available"，来源为 None
+    """
+    regions, has_amazon = collect_price_regions(soup)
+    for key, value in (specifications or {}).items():
+        if 'price' in key.lower():
+            regions['spec'].append(value)
+
+    for tier in TIERS:
+        for text in regions[tier]:
+            price = _match_price(text)
+            if price:
+                return price, tier
+
+    if has_amazon:
+        return "Available on Amazon", None
+    return "Price not available", None
+
+
+def tier_label(tier):
+    return _TIER_LABELS.get(tier, tier)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+混合策略恢复流水线
+名称发现 → GSMArena定位 → 详情提取 → 写库，四个阶段各自一组工作线程，
+阶段之间用有界队列连接；每个阶段的线程数单独配置，请求按主机限速（统一调度器 ScrapeScheduler），
+所以访问 GSMChoice 的名称发现和访问 GSMArena 的定位/详情可以重叠进行，
+整体速度不再受单个设备最慢的一步拖累。
+"""
+
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+DEFAULT_WORKERS = {
+    'discover': 2,  # GSMChoice API，必要时用浏览器
+    'resolve': 2,   # 本地目录，必要时用浏览器搜索GSMArena
+    'detail': 3,    # GSMArena详情页（纯HTTP）
+    'write': 1,     # MongoDB写入
+}
+BROWSER_STAGES = ('discover', 'resolve')
+
+
+class _LazyDriver:
+    """工作线程私有的WebDriver代理，第一次真正用到（判断是否可用或调用方法）时才创建浏览器"""
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.driver = None
+        self.created = False
+
+    def _get(self):
+        if not self.created:
+            self.created = True
+            self.driver = self.scraper._create_driver()
+        return self.driver
+
+    def __bool__(self):
+        return self._get() is not None
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def close(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning(f"关闭WebDriver失败: {str(e)}")
+
+
+class RecoveryPipeline:
+    def __init__(self, scraper, workers=None, queue_size=20, host_intervals=None):
+        """初始化恢复流水线
+
+        Args:
+            scraper (HybridDeviceScraper): 提供各阶段的具体实现
+            workers (dict): 各阶段线程数，见 DEFAULT_WORKERS
+            queue_size (int): 阶段之间队列的容量
+            host_intervals (dict): {主机名: 最小请求间隔（秒）}，与 request_delay 取较大值
+        """
+        self.scraper = scraper
+        self.workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        self.queue_size = queue_size
+        # 只在 run() 期间生效，结束后恢复共享调度器的配置
+        self.host_intervals = dict(host_intervals or {})
+        # 各阶段线程共用 scraper.session，连接池按总线程数配置
+        scraper.transport.mount(scraper.session, pool_size=sum(self.workers.values()))
+
+        self.lock = threading.Lock()
+        self.succeeded = []
+        self.failed = []
+        self.total = 0
+        self.stage_counts = {stage: 0 for stage in self.workers}
+        self.next_workers = {}
+
+    # ---- 各阶段处理函数: 返回下一阶段的任务，或 None（任务已结束） ----
+
+    def _discover(self, task, driver):
+        manufacture, model_code = task['manufacture'], task['model_code']
+        existing, valid = self.scraper.find_valid_existing(model_code)
+        if valid:
+            logger.info(f"⏭️ 设备已存在且有效: {model_code}")
+            self._finish(task, True)
+            return None
+        task['existing'] = existing
+
+        device_name = self.scraper.get_device_name_from_gsmchoice(manufacture, model_code, driver)
+        if not device_name:
+            logger.warning(f"❌ 无法从GSMChoice获取设备名称: {manufacture} {model_code}")
+            self._finish(task, False)
+            return None
+        task['device_name'] = device_name
+        return task
+
+    def _resolve(self, task, driver):
+        # 本地目录命中时不会创建浏览器
+        url = self.scraper.search_gsmarena_by_name(task['device_name'], task['manufacture'], driver)
+        if not url:
+            logger.warning(f"❌ 无法在GSMArena找到设备: {task['device_name']}")
+            self._finish(task, False)
+            return None
+        task['gsmarena_url'] = url
+        return task
+
+    def _detail(self, task, driver):
+        details = self.scraper.extract_gsmarena_details(task['gsmarena_url'])
+        if not details:
+            logger.warning(f"❌ 无法从GSMArena提取详情: {task['device_name']}")
+            self._finish(task, False)
+            return None
+        task['details'] = details
+        return task
+
+    def _write(self, task, driver):
+        self.scraper.store_recovered_device(
+            task['manufacture'], task['model_code'], task['device_name'],
+            task['gsmarena_url'], task['details'], task['existing']
+        )
+        self._finish(task, True)
+        return None
+
+    # ---- 流水线框架 ----
+
+    def _finish(self, task, success):
+        with self.lock:
+            (self.succeeded if success else self.failed).append(task['device'])
+            done = len(self.succeeded) + len(self.failed)
+        logger.info(f"📱 进度: {done}/{self.total} ({done / self.total * 100:.1f}%)")
+
+    def _worker(self, stage, handler, in_queue, out_queue, remaining):
+        driver = _LazyDriver(self.scraper) if stage in BROWSER_STAGES else None
+        try:
+            while True:
+                task = in_queue.get()
+                if task is _STOP:
+                    break
+                try:
+                    result = handler(task, driver)
+                except Exception as e:
+                    logger.error(f"❌ [{stage}] 处理设备失败 {task['manufacture']} {task['model_code']}: {str(e)}")
+                    self._finish(task, False)
+                    result = None
+                with self.lock:
+                    self.stage_counts[stage] += 1
+                if result is not None and out_queue is not None:
+                    out_queue.put(result)
+        finally:
+            if driver is not None:
+                driver.close()
+            # 本阶段最后一个线程退出时通知下一阶段的所有线程
+            with self.lock:
+                remaining[stage] -= 1
+                last = remaining[stage] == 0
+            if last and out_queue is not None:
+                for _ in range(self.next_workers[stage]):
+                    out_queue.put(_STOP)
+
+    def run(self, devices):
+        """运行流水线
+
+        Args:
+            devices (list): [{'manufacture', 'model_code'}]
+
+        Returns:
+            (成功的设备列表, 失败的设备列表)
+        """
+        stages = [('discover', self._discover), ('resolve', self._resolve),
+                  ('detail', self._detail), ('write', self._write)]
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        remaining = {stage: self.workers[stage] for stage, _ in stages}
+        self.next_workers = {
+            stage: self.workers[stages[i + 1][0]] if i + 1 < len(stages) else 0
+            for i, (stage, _) in enumerate(stages)
+        }
+
+        tasks = []
+        for device in devices:
+            manufacture = str(device.get('manufacture', '') or '').strip()
+            model_code = str(device.get('model_code', '') or '').strip()
+            task = {'device': device, 'manufacture': manufacture, 'model_code': model_code}
+            if manufacture and model_code:
+                tasks.append(task)
+            else:
+                logger.warning(f"设备信息不完整: {device}")
+                self.failed.append(device)
+        self.total = len(devices)
+
+        logger.info(f"🚀 启动恢复流水线: {len(tasks)} 个设备, 线程数 {self.workers}, 队列容量 {self.queue_size}")
+
+        with self.scraper.rate_limiter.override_intervals(self.host_intervals):
+            threads = []
+            for i, (stage, handler) in enumerate(stages):
+                out_queue = queues[i + 1] if i + 1 < len(stages) else None
+                for n in range(self.workers[stage]):
+                    thread = threading.Thread(
+                        target=self._worker, args=(stage, handler, queues[i], out_queue, remaining),
+                        name=f"{stage}-{n}", daemon=True
+                    )
+                    thread.start()
+                    threads.append(thread)
+
+            # 有界队列: 第一阶段处理不过来时这里会阻塞
+            for task in tasks:
+                queues[0].put(task)
+            for _ in range(self.workers['discover']):
+                queues[0].put(_STOP)
+
+            for thread in threads:
+                thread.join()
+
+        logger.info(f"📊 各阶段处理数: {self.stage_counts}")
+        logger.info(f"⏳ 各主机限速等待(秒): {self.scraper.rate_limiter.get_stats()}")
+        logger.info(f"🚦 各优先级等待: {self.scraper.rate_limiter.get_class_stats()}")
+        logger.info(f"🔌 连接复用: {self.scraper.transport.connection_stats()}")
+        logger.info(f"🔎 名称发现各层级命中: {self.scraper.get_discovery_stats()}")
+        return self.succeeded, self.failed
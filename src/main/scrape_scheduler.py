@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统一抓取调度
+所有爬虫发请求前都向调度器申请该主机的时间槽，按优先级分三类:
+  interactive  API 实时查询未命中（权重最高）
+  refresh      后台刷新已有数据
+  bulk         批量导入 / 恢复
+同一主机排队的请求按加权公平队列（WFQ）放行：每个请求到达时打上虚拟完成时间
+max(主机虚拟时间, 该类上一个请求的完成时间) + 1/权重，时间槽空出来时放行标签最小的请求，
+所以大批量导入进行时，实时查询最多只需等一个请求间隔，而批量任务也不会被完全饿死。
+优先级只决定谁拿到下一个时间槽，不改变主机被访问的频率：每放行一个请求（不论哪一类），
+该主机的下一个时间槽都推后 主机间隔 = max(主机配置, 最近 CALLER_INTERVAL_TTL 秒内各类调用方要求的间隔)，
+实时查询不传间隔时也要占用批量导入声明的间隔，不会插在两个批量请求之间额外多打一次。
+
+跨进程共享:
+  API 服务和导入脚本是不同的进程，共用一个出口IP，此时每个主机的下一个可用时间存在 MongoDB
+  （scrape_schedule 集合），用比较并交换预约时间槽；有 interactive 请求在等待时，其它进程的
+  refresh/bulk 请求暂缓预约，把下一个时间槽让给实时查询。
+  API 服务和导入脚本连上 MongoDB 存储后默认用同一个库共享（share_via）；
+  其它脚本需设置环境变量 SCRAPE_SCHEDULER_MONGO=mongodb://...，否则只在本进程内限速。
+
+其它环境变量:
+  SCRAPE_HOST_INTERVAL   未单独配置的主机的最小请求间隔（秒，默认 2）
+  SCRAPE_HOST_INTERVALS  {主机名: 间隔} 的JSON
+"""
+
+import os
+import json
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+from pymongo import MongoClient
+
+from host_rate_limiter import HostRateLimiter
+from scraper_transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_REFRESH = 'refresh'
+PRIORITY_BULK = 'bulk'
+
+DEFAULT_WEIGHTS = {
+    PRIORITY_INTERACTIVE: 16,
+    PRIORITY_REFRESH: 4,
+    PRIORITY_BULK: 1,
+}
+# 未单独配置的主机的最小间隔，实际间隔取 主机配置 与 调用方要求 的较大值
+DEFAULT_HOST_INTERVAL = 2
+# 调用方要求的间隔在最后一次请求后保留多久（秒），批量任务停止后主机间隔回到配置值
+CALLER_INTERVAL_TTL = 60
+
+SCHEDULE_COLLECTION = 'scrape_schedule'
+# interactive 等待标记的有效期（进程崩溃时自动失效）
+INTERACTIVE_HOLD_SECONDS = 30
+
+
+class _HostQueue:
+    def __init__(self, priorities):
+        self.heap = []
+        self.next_slot = 0
+        self.virtual_time = 0.0
+        self.last_finish = {priority: 0.0 for priority in priorities}
+        # {优先级: (调用方要求的间隔, 最后一次请求的时间)}
+        self.caller_intervals = {}
+
+    def spacing(self, host_interval, now):
+        """该主机两次请求之间的间隔：主机配置与最近各类调用方要求的间隔取较大值"""
+        recent = [interval for interval, seen in self.caller_intervals.values()
+                  if now - seen <= CALLER_INTERVAL_TTL]
+        return max([host_interval] + recent)
+
+
+class MongoSlotLedger:
+    def __init__(self, db, name=SCHEDULE_COLLECTION):
+        """跨进程的主机时间槽账本
+
+        Args:
+            db: pymongo Database
+            name (str): 集合名
+        """
+        self.collection = db[name]
+
+    def reserve(self, host, interval, priority, pause):
+        """预约该主机的下一个时间槽并等到该时间，返回等待秒数"""
+        interactive = priority == PRIORITY_INTERACTIVE
+        started = time.time()
+        update = {"$setOnInsert": {"next_slot": 0}}
+        if interactive:
+            update["$inc"] = {"interactive_waiting": 1}
+            update["$max"] = {"interactive_deadline": started + INTERACTIVE_HOLD_SECONDS}
+        self.collection.update_one({"_id": host}, update, upsert=True)
+
+        try:
+            while True:
+                now = time.time()
+                doc = self.collection.find_one({"_id": host})
+                if (not interactive and doc.get("interactive_waiting", 0) > 0
+                        and doc.get("interactive_deadline", 0) > now):
+                    # 其它进程有实时查询在等待，先让出时间槽
+                    pause(min(interval, 0.5) or 0.1)
+                    continue
+
+                # 比较并交换：next_slot 没被其它进程改过才算预约成功
+                slot = max(now, doc["next_slot"])
+                result = self.collection.update_one(
+                    {"_id": host, "next_slot": doc["next_slot"]},
+                    {"$set": {"next_slot": slot + interval}}
+                )
+                if result.modified_count:
+                    break
+        finally:
+            if interactive:
+                self.collection.update_one({"_id": host}, {"$inc": {"interactive_waiting": -1}})
+
+        delay = slot - time.time()
+        if delay > 0:
+            pause(delay)
+        return time.time() - started
+
+
+class ScrapeScheduler(HostRateLimiter):
+    def __init__(self, default_interval=DEFAULT_HOST_INTERVAL, intervals=None, weights=None,
+                 pause=None, ledger=None, enabled=True):
+        """初始化调度器
+
+        Args:
+            default_interval (float): 未单独配置的主机的最小请求间隔（秒）
+            intervals (dict): {主机名: 最小请求间隔}
+            weights (dict): {优先级: 权重}，见 DEFAULT_WEIGHTS
+            pause (callable): 等待函数，默认 time.sleep
+            ledger (MongoSlotLedger): 跨进程共享时间槽，None 表示只在本进程内调度
+            enabled (bool): False 时不做任何等待（磁带回放）
+        """
+        super().__init__(default_interval, intervals, pause)
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.ledger = ledger
+        self.enabled = enabled
+        self.condition = threading.Condition(self.lock)
+        self.queues = {}
+        self.sequence = itertools.count()
+        self.class_stats = {priority: {'requests': 0, 'waited': 0.0, 'max_wait': 0.0}
+                            for priority in self.weights}
+
+    def _queue_for(self, host):
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = _HostQueue(self.weights)
+        return queue
+
+    def wait(self, url, priority=PRIORITY_BULK, interval=None):
+        """申请一次请求的时间槽，轮到本请求且到了时间后返回；返回等待的秒数
+
+        Args:
+            url (str): 请求地址（按主机调度）
+            priority (str): interactive / refresh / bulk
+            interval (float): 调用方要求的最小间隔，与主机配置取较大值
+        """
+        if not self.enabled:
+            return 0
+        if priority not in self.weights:
+            raise ValueError(f"未知的优先级: {priority}")
+
+        host = self.host_of(url)
+        started = time.monotonic()
+
+        with self.condition:
+            queue = self._queue_for(host)
+            if interval:
+                queue.caller_intervals[priority] = (interval, started)
+            tag = max(queue.virtual_time, queue.last_finish[priority]) + 1.0 / self.weights[priority]
+            queue.last_finish[priority] = tag
+            ticket = (tag, next(self.sequence))
+            heapq.heappush(queue.heap, ticket)
+
+            while True:
+                if queue.heap[0] == ticket:
+                    remaining = queue.next_slot - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                else:
+                    self.condition.wait()
+
+            heapq.heappop(queue.heap)
+            queue.virtual_time = tag
+            # 不论本请求是哪一类，都按主机间隔推后下一个时间槽
+            now = time.monotonic()
+            spacing = queue.spacing(self.interval_for(host), now)
+            queue.next_slot = now + spacing
+            self.condition.notify_all()
+
+        # 本进程内已轮到，再向跨进程账本预约
+        if self.ledger is not None:
+            try:
+                self.ledger.reserve(host, spacing, priority, self.pause)
+            except Exception as e:
+                logger.warning(f"共享限速账本不可用，仅按本进程限速: {str(e)}")
+
+        waited = time.monotonic() - started
+        with self.lock:
+            self.waited[host] = self.waited.get(host, 0) + waited
+            stats = self.class_stats[priority]
+            stats['requests'] += 1
+            stats['waited'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+        return waited
+
+    def share_via(self, db):
+        """用给定的 MongoDB 库跨进程共享主机时间槽（已配置 SCRAPE_SCHEDULER_MONGO 或磁带回放时不变）"""
+        if self.ledger is None and self.enabled and db is not None:
+            self.ledger = MongoSlotLedger(db)
+            logger.info("抓取调度: 使用MongoDB共享主机时间槽")
+
+    def get_class_stats(self):
+        """各优先级的请求数、平均等待和最长等待（秒）"""
+        with self.lock:
+            return {
+                priority: {
+                    'requests': stats['requests'],
+                    'avg_wait': round(stats['waited'] / stats['requests'], 2) if stats['requests'] else 0,
+                    'max_wait': round(stats['max_wait'], 2),
+                }
+                for priority, stats in self.class_stats.items()
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _create_scheduler():
+    transport = get_transport()
+    intervals = json.loads(os.environ['SCRAPE_HOST_INTERVALS']) if os.environ.get('SCRAPE_HOST_INTERVALS') else None
+    ledger = None
+    mongo_uri = os.environ.get('SCRAPE_SCHEDULER_MONGO')
+    if mongo_uri:
+        try:
+            client = MongoClient(mongo_uri, serverSelectionTimeoutMS=3000)
+            ledger = MongoSlotLedger(client[os.environ.get('SCRAPE_SCHEDULER_DB', 'device_info')])
+            logger.info("抓取调度: 使用MongoDB共享主机时间槽")
+        except Exception as e:
+            logger.warning(f"连接共享限速账本失败，仅按本进程限速: {str(e)}")
+    return ScrapeScheduler(
+        default_interval=float(os.environ.get('SCRAPE_HOST_INTERVAL', DEFAULT_HOST_INTERVAL)),
+        intervals=intervals,
+        pause=transport.pause,
+        ledger=ledger,
+        enabled=not transport.replaying,
+    )
+
+
+def get_scheduler():
+    """获取进程内的全局调度器（首次调用时按环境变量初始化）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = _create_scheduler()
+    return _scheduler
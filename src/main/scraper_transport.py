@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫传输层 - 所有 requests.Session 和 Selenium 页面获取都经过这里
+
+模式（环境变量 SCRAPER_TRANSPORT，或调用 configure_transport）:
+  live    直接访问网络（默认）
+  record  访问网络，同时把 请求 → 响应 写入磁带（cassette）
+  replay  只从磁带回放，不访问网络；等待/休眠全部跳过
+
+磁带是一个SQLite文件（环境变量 SCRAPER_CASSETTE），响应体用zlib压缩。
+Selenium 页面记录的是 JS 执行后的 page_source，回放时用 BeautifulSoup 模拟元素查找。
+
+连接池（mount 时配置）:
+  每个主机的连接池大小默认等于调用方的线程数（环境变量 SCRAPER_POOL_SIZE 可覆盖），
+  连接保持 keep-alive 复用；connection_stats() 给出每个主机的请求数、握手数（新建的TCP/TLS连接）和连接复用数。
+  SCRAPER_HTTP2=1 且安装了 httpx[http2] 时，live 模式改用 HTTP/2，详情页请求在同一条连接上多路复用。
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+MODE_LIVE = 'live'
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+MODES = (MODE_LIVE, MODE_RECORD, MODE_REPLAY)
+
+DEFAULT_CASSETTE = 'cassettes/scraper.cassette'
+
+DEFAULT_POOL_SIZE = 10
+# 每个adapter缓存的主机连接池数量
+DEFAULT_POOL_HOSTS = 10
+
+# 响应体已解压，回放时不能再带这些头
+_DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+
+def normalize_url(url):
+    """规范化URL（查询参数排序），保证同一请求得到同一个键"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ''))
+
+
+class CassetteStore:
+    def __init__(self, path):
+        """初始化磁带存储
+
+        Args:
+            path (str): SQLite磁带文件路径
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS interactions ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " method TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " recorded_at TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(kind, method, url, body=None):
+        """生成请求键: 类型 + 方法 + 规范化URL + 请求体摘要"""
+        digest = hashlib.sha1()
+        digest.update(f"{kind} {method.upper()} {normalize_url(url)}".encode('utf-8'))
+        if body:
+            digest.update(body if isinstance(body, bytes) else str(body).encode('utf-8'))
+        return digest.hexdigest()
+
+    def put(self, kind, method, url, status, headers, body, request_body=None):
+        """写入一条交互记录（已存在则覆盖）"""
+        key = self.make_key(kind, method, url, request_body)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO interactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, method.upper(), url, status, json.dumps(headers),
+                 zlib.compress(body, 6), datetime.now().isoformat())
+            )
+            self.conn.commit()
+
+    def get(self, kind, method, url, request_body=None):
+        """读取一条交互记录，未命中返回None"""
+        key = self.make_key(kind, method, url, request_body)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, headers, body FROM interactions WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            'status': row[0],
+            'headers': json.loads(row[1]),
+            'body': zlib.decompress(row[2])
+        }
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM interactions").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _counting_pool_classes(on_connect):
+    """生成每次建立连接（TCP/TLS握手）都会回调 on_connect(host) 的连接池类"""
+    class CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            super().connect()
+            on_connect(self.host)
+
+    class CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            super().connect()
+            on_connect(self.host)
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {'http': CountingHTTPConnectionPool, 'https': CountingHTTPSConnectionPool}
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    def __init__(self, **kwargs):
+        """按主机连接池的适配器，统计每个主机的请求数和握手数"""
+        self.stats_lock = threading.Lock()
+        self.requests_by_host = {}
+        self.handshakes_by_host = {}
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self._on_connect)
+
+    def _on_connect(self, host):
+        with self.stats_lock:
+            self.handshakes_by_host[host] = self.handshakes_by_host.get(host, 0) + 1
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname or ''
+        with self.stats_lock:
+            self.requests_by_host[host] = self.requests_by_host.get(host, 0) + 1
+        return super().send(request, **kwargs)
+
+    def connection_stats(self):
+        """{主机: {'requests', 'handshakes', 'reused'}}"""
+        with self.stats_lock:
+            stats = {}
+            for host, count in self.requests_by_host.items():
+                handshakes = self.handshakes_by_host.get(host, 0)
+                stats[host] = {'requests': count, 'handshakes': handshakes,
+                               'reused': max(count - handshakes, 0)}
+            return stats
+
+
+class CassetteAdapter(PooledHTTPAdapter):
+    def __init__(self, transport, **kwargs):
+        """requests适配器：record模式边请求边记录，replay模式只读磁带"""
+        self.transport = transport
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        transport = self.transport
+
+        if transport.mode == MODE_REPLAY:
+            entry = transport.store.get('http', request.method, request.url, request.body)
+            if entry is None:
+                transport.count('http_miss')
+                raise requests.exceptions.ConnectionError(
+                    f"磁带中没有该请求: {request.method} {request.url}", request=request
+                )
+            transport.count('http_hit')
+            return self._build_replay_response(request, entry)
+
+        response = super().send(request, **kwargs)
+
+        if transport.mode == MODE_RECORD:
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS}
+            transport.store.put('http', request.method, request.url, response.status_code,
+                                headers, response.content, request.body)
+            transport.count('http_recorded')
+
+        return response
+
+    def _build_replay_response(self, request, entry):
+        """用磁带内容构造 requests.Response"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = 'Replayed'
+        response.connection = self
+        return response
+
+
+class HTTP2Adapter(HTTPAdapter):
+    def __init__(self, pool_size, **kwargs):
+        """基于 httpx 的 HTTP/2 适配器：同一主机的并发请求在一条连接上多路复用"""
+        super().__init__(**kwargs)
+        self.client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        self.lock = threading.Lock()
+        self.requests_by_host = {}
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        try:
+            upstream = self.client.request(
+                request.method, request.url, headers=dict(request.headers),
+                content=request.body, timeout=timeout
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e), request=request)
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e), request=request)
+
+        with self.lock:
+            entry = self.requests_by_host.setdefault(upstream.url.host, {'requests': 0, 'http2': 0})
+            entry['requests'] += 1
+            if upstream.http_version == 'HTTP/2':
+                entry['http2'] += 1
+
+        # httpx 已经解压了响应体
+        response = requests.Response()
+        response.status_code = upstream.status_code
+        response.headers = CaseInsensitiveDict(
+            {k: v for k, v in upstream.headers.items() if k.lower() not in _DROP_HEADERS}
+        )
+        response._content = upstream.content
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = str(upstream.url)
+        response.request = request
+        response.reason = upstream.reason_phrase
+        response.connection = self
+        return response
+
+    def connection_stats(self):
+        """{主机: {'requests', 'http2'}}"""
+        with self.lock:
+            return {host: dict(entry) for host, entry in self.requests_by_host.items()}
+
+    def close(self):
+        self.client.close()
+        super().close()
+
+
+class RecordingDriver:
+    def __init__(self, driver, transport):
+        """Selenium代理：离开页面前把渲染后的page_source写入磁带"""
+        self._driver = driver
+        self._transport = transport
+        self._current_url = None
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def _snapshot(self):
+        if not self._current_url:
+            return
+        try:
+            page_source = self._driver.page_source
+            self._transport.store.put('browser', 'GET', self._current_url, 200, {},
+                                      page_source.encode('utf-8'))
+            self._transport.count('browser_recorded')
+        except Exception as e:
+            logger.warning(f"记录页面失败 {self._current_url}: {str(e)}")
+
+    def get(self, url):
+        self._snapshot()
+        self._current_url = url
+        return self._driver.get(url)
+
+    def quit(self):
+        self._snapshot()
+        self._current_url = None
+        return self._driver.quit()
+
+
+class ReplayElement:
+    def __init__(self, tag):
+        self._tag = tag
+
+    @property
+    def text(self):
+        return self._tag.get_text(strip=True)
+
+    def get_attribute(self, name):
+        if name == 'innerHTML':
+            return self._tag.decode_contents()
+        if name == 'outerHTML':
+            return str(self._tag)
+        if name == 'textContent':
+            return self._tag.get_text()
+        value = self._tag.get(name)
+        if isinstance(value, list):
+            return ' '.join(value)
+        return value
+
+
+class ReplayDriver:
+    def __init__(self, transport):
+        """无浏览器的Selenium替身：页面内容全部来自磁带"""
+        self._transport = transport
+        self._soup = None
+        self.current_url = None
+        self.page_source = ''
+
+    def get(self, url):
+        entry = self._transport.store.get('browser', 'GET', url)
+        if entry is None:
+            self._transport.count('browser_miss')
+            raise WebDriverException(f"磁带中没有该页面: {url}")
+        self._transport.count('browser_hit')
+        self.current_url = url
+        self.page_source = entry['body'].decode('utf-8')
+        self._soup = None
+
+    def _select(self, by, value):
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.page_source, 'html.parser')
+        if by == By.ID:
+            return self._soup.find_all(id=value)
+        if by == By.CLASS_NAME:
+            return self._soup.find_all(class_=value)
+        if by == By.TAG_NAME:
+            return self._soup.find_all(value)
+        if by == By.CSS_SELECTOR:
+            return self._soup.select(value)
+        raise WebDriverException(f"回放模式不支持的定位方式: {by}")
+
+    def find_element(self, by=By.ID, value=None):
+        tags = self._select(by, value)
+        if not tags:
+            raise NoSuchElementException(f"{by}={value}")
+        return ReplayElement(tags[0])
+
+    def find_elements(self, by=By.ID, value=None):
+        return [ReplayElement(tag) for tag in self._select(by, value)]
+
+    def execute_script(self, script, *args):
+        return None
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        self._soup = None
+
+
+class ScraperTransport:
+    def __init__(self, mode=MODE_LIVE, cassette_path=DEFAULT_CASSETTE, pool_size=None, http2=False):
+        """初始化传输层
+
+        Args:
+            mode (str): live / record / replay
+            cassette_path (str): 磁带文件路径（live模式不使用）
+            pool_size (int): 每个主机的连接池大小，覆盖 mount 时传入的值
+            http2 (bool): live 模式下使用 HTTP/2（需要 httpx[http2]）
+        """
+        if mode not in MODES:
+            raise ValueError(f"未知的传输模式: {mode}")
+
+        self.mode = mode
+        self.cassette_path = cassette_path
+        self.store = CassetteStore(cassette_path) if mode != MODE_LIVE else None
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+        self.pool_size = pool_size
+        self.adapters = []
+
+        if http2 and httpx is None:
+            logger.warning("未安装 httpx[http2]，继续使用 HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+
+        if mode != MODE_LIVE:
+            logger.info(f"传输层模式: {mode}, 磁带: {cassette_path} ({self.store.count()} 条记录)")
+
+    @property
+    def replaying(self):
+        return self.mode == MODE_REPLAY
+
+    def count(self, name):
+        with self.counters_lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def get_stats(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+    def mount(self, session, pool_size=None):
+        """给session挂上适配器：按主机的连接池 + keep-alive 复用；record/replay 模式挂磁带适配器
+
+        Args:
+            session (requests.Session): 要配置的session
+            pool_size (int): 每个主机的连接数，通常等于共用该session的线程数
+        """
+        pool_size = self.pool_size or pool_size or DEFAULT_POOL_SIZE
+        pool_kwargs = {
+            'pool_connections': DEFAULT_POOL_HOSTS,
+            'pool_maxsize': pool_size,
+            # 只重试建连失败，不重复发送已经发出的请求
+            'max_retries': Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5),
+        }
+        if self.mode != MODE_LIVE:
+            adapter = CassetteAdapter(self, **pool_kwargs)
+        elif self.http2:
+            adapter = HTTP2Adapter(pool_size, **pool_kwargs)
+        else:
+            adapter = PooledHTTPAdapter(**pool_kwargs)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        with self.counters_lock:
+            self.adapters.append(adapter)
+        return session
+
+    def connection_stats(self):
+        """所有已挂载adapter的连接统计，按主机汇总"""
+        with self.counters_lock:
+            adapters = list(self.adapters)
+        totals = {}
+        for adapter in adapters:
+            for host, entry in adapter.connection_stats().items():
+                total = totals.setdefault(host, {})
+                for name, value in entry.items():
+                    total[name] = total.get(name, 0) + value
+        return totals
+
+    def create_driver(self, factory):
+        """创建WebDriver
+
+        Args:
+            factory (callable): 创建真实WebDriver的函数（replay模式不会调用）
+        """
+        if self.mode == MODE_REPLAY:
+            return ReplayDriver(self)
+        driver = factory()
+        if self.mode == MODE_RECORD:
+            return RecordingDriver(driver, self)
+        return driver
+
+    def pause(self, seconds):
+        """请求间隔/页面等待；回放模式下直接跳过"""
+        if self.mode != MODE_REPLAY and seconds > 0:
+            time.sleep(seconds)
+
+    def close(self):
+        if self.adapters:
+            logger.info(f"连接统计: {self.connection_stats()}")
+        if self.store:
+            logger.info(f"传输层统计: {self.get_stats()}")
+            self.store.close()
+            self.store = None
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def _create_transport(mode=None, cassette_path=None, pool_size=None, http2=None):
+    mode = mode or os.environ.get('SCRAPER_TRANSPORT', MODE_LIVE)
+    cassette_path = cassette_path or os.environ.get('SCRAPER_CASSETTE', DEFAULT_CASSETTE)
+    if pool_size is None and os.environ.get('SCRAPER_POOL_SIZE'):
+        pool_size = int(os.environ['SCRAPER_POOL_SIZE'])
+    if http2 is None:
+        http2 = os.environ.get('SCRAPER_HTTP2', '').lower() in ('1', 'true', 'yes')
+    return ScraperTransport(mode, cassette_path, pool_size, http2)
+
+
+def configure_transport(mode=None, cassette_path=None, pool_size=None, http2=None):
+    """显式配置全局传输层（未指定的参数读取环境变量）"""
+    global _transport
+    with _transport_lock:
+        if _transport:
+            _transport.close()
+        _transport = _create_transport(mode, cassette_path, pool_size, http2)
+    return _transport
+
+
+def get_transport():
+    """获取全局传输层（首次调用时按环境变量初始化）"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = _create_transport()
+    return _transport
@@ -22,6 +22,11 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
 import random
+from scraper_transport import get_transport
+from scrape_scheduler import get_scheduler, PRIORITY_BULK
+from device_normalizer import apply_normalization, ensure_normalized_indexes
+from model_code_index import canonical_code, known_codes, index_device_codes, parse_model_codes
+from device_stats import record_insert
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +38,9 @@ class SimpleDeviceScraper:
         self.base_url = "https://www.gsmarena.com"
         self.request_delay = request_delay
         self.session = requests.Session()
+        self.transport = get_transport()
+        self.scheduler = get_scheduler()
+        self.transport.mount(self.session)
         
         # 随机User-Agent池
         self.user_agents = [
@@ -108,7 +116,7 @@ class SimpleDeviceScraper:
             # 添加随机的浏览器特征
             chrome_options.add_argument('--disable-blink-features=AutomationControlled')
             
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = self.transport.create_driver(lambda: webdriver.Chrome(options=chrome_options))
             
             # 执行JavaScript隐藏webdriver特征
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -119,12 +127,13 @@ class SimpleDeviceScraper:
             logger.error(f"WebDriver初始化失败: {str(e)}")
             self.driver = None
     
-    def _random_delay(self):
-        """随机延迟"""
+    def _random_delay(self, url):
+        """随机间隔：经统一调度器按主机限速（bulk 优先级，实时查询优先放行）"""
         base_delay = self.request_delay
         random_delay = random.uniform(base_delay * 0.8, base_delay * 1.5)
-        logger.info(f"等待 {random_delay:.1f} 秒...")
-        time.sleep(random_delay)
+        waited = self.scheduler.wait(url, PRIORITY_BULK, random_delay)
+        if waited >= 1:
+            logger.info(f"等待 {waited:.1f} 秒...")
     
     def _maybe_update_headers(self):
         """偶尔更新请求头"""
@@ -140,13 +149,13 @@ class SimpleDeviceScraper:
             return self.try_direct_access(model_code)
         
         try:
-            # 随机延迟和更新头信息
-            self._random_delay()
-            self._maybe_update_headers()
-            
             # URL编码优化：空格转换为+号
             encoded_model = quote_plus(model_code)
             search_url = f"{self.base_url}/res.php3?sSearch={encoded_model}"
+            
+            # 随机延迟和更新头信息
+            self._random_delay(search_url)
+            self._maybe_update_headers()
             logger.info(f"搜索设备: {model_code}")
             
             self.driver.get(search_url)
@@ -163,7 +172,7 @@ class SimpleDeviceScraper:
                 
                 # 随机等待时间
                 random_wait = random.uniform(1.5, 3.0)
-                time.sleep(random_wait)
+                self.transport.pause(random_wait)
                 
                 decrypted_content = decrypted_element.get_attribute('innerHTML')
                 if not decrypted_content or decrypted_content.strip() == '':
@@ -244,9 +253,8 @@ class SimpleDeviceScraper:
     def extract_device_details(self, device_url):
         """提取设备详细信息（增强伪装）"""
         try:
-            # 随机延迟
-            random_delay = random.uniform(0.8, 1.5)
-            time.sleep(random_delay)
+            # 随机间隔，经统一调度器按主机限速
+            self.scheduler.wait(device_url, PRIORITY_BULK, random.uniform(0.8, 1.5))
             
             # 偶尔更新请求头
             self._maybe_update_headers()
@@ -305,6 +313,7 @@ class SimpleDeviceScraper:
                             elif 'Models' in cell_text and i + 1 < len(cell_texts):
                                 models_info = cell_texts[i + 1]
                                 device_info['model_code'] = models_info
+                                device_info['model_codes'] = parse_model_codes(models_info)
                         
                         if len(cell_texts) >= 2:
                             key = next((text for text in cell_texts if text), '')
@@ -343,6 +352,7 @@ class SimpleDeviceScraper:
                     'search_model': model_code,
                     'device_name': device_details['name'],
                     'model_code': device_details['model_code'],
+                    'model_codes': device_details.get('model_codes', []),
                     'announced_date': device_details['announced_date'],
                     'release_date': device_details['release_date'],
                     'price': device_details['price'],
@@ -392,6 +402,7 @@ class SimpleDataImporter:
             # 创建索引
             self.collection.create_index("model_code", unique=True)
             self.collection.create_index("device_name")
+            ensure_normalized_indexes(self.collection)
             
             logger.info(f"MongoDB连接成功: {self.db_name}")
         except Exception as e:
@@ -430,6 +441,7 @@ class SimpleDataImporter:
     def filter_existing_devices(self, devices):
         """过滤掉数据库中已存在的设备"""
         existing_codes = set()
+        sibling_codes = set()
         try:
             cursor = self.collection.find({}, {"model_code": 1})
             for doc in cursor:
@@ -437,13 +449,16 @@ class SimpleDataImporter:
                 existing_codes.add(normalized_code)
             
             logger.info(f"数据库中已存在 {len(existing_codes)} 个设备")
+            
+            # 已抓取机型的兄弟型号（详情页 Models 行）
+            sibling_codes = known_codes(self.db)
         except Exception as e:
             logger.warning(f"查询已存在设备失败: {str(e)}")
         
         new_devices = []
         for device in devices:
             normalized_code = self.normalize_model_code(device['model_code'])
-            if normalized_code not in existing_codes:
+            if normalized_code not in existing_codes and canonical_code(normalized_code) not in sibling_codes:
                 new_devices.append(device)
             else:
                 logger.info(f"设备已存在，跳过: {device['model_code']}")
@@ -475,7 +490,10 @@ class SimpleDataImporter:
                     "specifications": data['specifications']
                 }
                 
+                apply_normalization(device_doc)
                 self.collection.insert_one(device_doc)
+                index_device_codes(self.db, device_doc)
+                record_insert(self.db, device_doc)
                 logger.info(f"✅ 成功存储: {model_code} - {data['device_name']}")
                 logger.info(f"   价格: {data['price']}")
                 return True
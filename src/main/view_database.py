@@ -8,7 +8,11 @@ import pymongo
 from pymongo import MongoClient
 import json
 from datetime import datetime
-import pandas as pd
+from device_search import DeviceSearchIndex
+from device_exporter import DeviceExporter
+from device_stats import device_stats
+
+search_index = DeviceSearchIndex()
 
 def connect_db():
     """连接数据库"""
@@ -27,24 +31,21 @@ def show_stats(collection):
     print("📊 数据库统计信息")
     print("=" * 60)
     
-    total_count = collection.count_documents({})
-    with_price = collection.count_documents({"price": {"$ne": ""}})
-    with_date = collection.count_documents({"announced_date": {"$ne": ""}})
+    # 读增量维护的汇总文档，不再全表计数
+    stats = device_stats(collection.database)
+    total_count = stats['total_devices']
+    with_price = stats['devices_with_price']
+    with_date = stats['devices_with_date']
     
     print(f"📱 总设备数: {total_count}")
-    print(f"💰 有价格信息: {with_price} ({with_price/total_count*100:.1f}%)" if total_count > 0 else "💰 有价格信息: 0")
-    print(f"📅 有日期信息: {with_date} ({with_date/total_count*100:.1f}%)" if total_count > 0 else "📅 有日期信息: 0")
+    print(f"💰 有价格信息: {with_price} ({stats['price_coverage']})")
+    print(f"📅 有日期信息: {with_date} ({stats['date_coverage']})")
+    print(f"🔄 上次对账: {stats['reconciled_at'] or 'N/A'}")
     
     # 品牌分布
     print(f"\n🏭 品牌分布:")
-    brand_pipeline = [
-        {"$group": {"_id": "$manufacture", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    brands = list(collection.aggregate(brand_pipeline))
-    for brand in brands:
-        print(f"  {brand['_id']}: {brand['count']} 台")
+    for brand in stats['brands']:
+        print(f"  {brand['manufacture']}: {brand['count']} 台")
 
 def show_recent_devices(collection, limit=5):
     """显示最近添加的设备"""
@@ -67,16 +68,9 @@ def search_device(collection, keyword):
     print(f"\n🔍 搜索关键词: {keyword}")
     print("=" * 60)
     
-    # 在设备名称和型号中搜索
-    query = {
-        "$or": [
-            {"device_name": {"$regex": keyword, "$options": "i"}},
-            {"model_code": {"$regex": keyword, "$options": "i"}},
-            {"manufacture": {"$regex": keyword, "$options": "i"}}
-        ]
-    }
-    
-    devices = list(collection.find(query).limit(10))
+    # 在设备名称、型号和制造商中搜索（内存索引，首次调用时加载）
+    search_index.refresh(collection)
+    devices = search_index.search(keyword, limit=10)
     
     if not devices:
         print("❌ 未找到匹配的设备")
@@ -88,6 +82,7 @@ def search_device(collection, keyword):
         print(f"   型号: {device.get('model_code', 'N/A')}")
         print(f"   制造商: {device.get('manufacture', 'N/A')}")
         print(f"   价格: {device.get('price', 'N/A')}")
+        print(f"   匹配度: {device['score']}")
 
 def show_device_details(collection, model_code):
     """显示设备详细信息"""
@@ -116,33 +111,18 @@ def show_device_details(collection, model_code):
             if spec in specs:
                 print(f"  {spec}: {specs[spec]}")
 
-def export_to_csv(collection, filename="devices_export.csv"):
-    """导出到CSV文件"""
+def export_to_csv(collection, filename="devices_export.csv", spec_keys=None):
+    """导出到文件（按扩展名支持 CSV / NDJSON / Parquet，流式写入）"""
     print(f"📤 正在导出到 {filename}...")
     
-    # 获取所有设备的基本信息
-    pipeline = [
-        {
-            "$project": {
-                "_id": 0,
-                "model_code": 1,
-                "device_name": 1,
-                "manufacture": 1,
-                "announced_date": 1,
-                "release_date": 1,
-                "price": 1,
-                "source_url": 1,
-                "created_at": 1
-            }
-        }
-    ]
-    
-    devices = list(collection.aggregate(pipeline))
+    try:
+        count = DeviceExporter(collection, spec_keys=spec_keys).export(filename)
+    except Exception as e:
+        print(f"❌ 导出失败: {e}")
+        return
     
-    if devices:
-        df = pd.DataFrame(devices)
-        df.to_csv(filename, index=False, encoding='utf-8')
-        print(f"✅ 成功导出 {len(devices)} 台设备到 {filename}")
+    if count:
+        print(f"✅ 成功导出 {count} 台设备到 {filename}")
     else:
         print("❌ 没有数据可导出")
 
@@ -160,7 +140,7 @@ def main():
             print("2. 🕒 查看最近添加的设备")
             print("3. 🔍 搜索设备")
             print("4. 📱 查看设备详情")
-            print("5. 📤 导出到CSV")
+            print("5. 📤 导出 (CSV / NDJSON / Parquet)")
             print("6. 🚪 退出")
             
             choice = input("\n请选择操作 (1-6): ").strip()
@@ -186,7 +166,8 @@ def main():
             elif choice == '5':
                 filename = input("导出文件名 (默认devices_export.csv): ").strip()
                 filename = filename if filename else "devices_export.csv"
-                export_to_csv(collection, filename)
+                spec_keys = input("展开为列的规格键 (逗号分隔，可留空): ").strip()
+                export_to_csv(collection, filename, spec_keys)
             
             elif choice == '6':
                 print("👋 再见!")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MongoDB 共享工作队列
+多台机器同时导入时，设备列表只入队一次（_id 为标准化型号，重复入队不会产生新任务），
+各节点用 find_one_and_update 原子地领取任务并加租约（lease），处理期间后台线程定期续约（心跳），
+完成后标记 done；节点崩溃时租约过期，任务会被其它节点重新领取，超过最大尝试次数标记 failed。
+
+任务状态: pending → leased → done / failed
+"""
+
+import os
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, UpdateOne, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUE_COLLECTION = 'import_queue'
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+STATUS_PENDING = 'pending'
+STATUS_LEASED = 'leased'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def task_key(model_code):
+    """任务键：与导入时的型号标准化一致（合并多余空格）"""
+    return ' '.join(str(model_code).strip().split())
+
+
+def default_owner():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    def __init__(self, db, name=QUEUE_COLLECTION, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, owner=None):
+        """初始化工作队列
+
+        Args:
+            db: pymongo Database
+            name (str): 队列集合名
+            lease_seconds (int): 租约时长，超过该时间没有心跳的任务可被其它节点领取
+            max_attempts (int): 每个任务最多被领取的次数
+            owner (str): 本节点标识，默认 主机名-进程号
+        """
+        self.collection = db[name]
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = owner or default_owner()
+
+        self.held = set()
+        self.held_lock = threading.Lock()
+        self.heartbeat_stop = threading.Event()
+        self.heartbeat_thread = None
+
+    def ensure_indexes(self):
+        self.collection.create_index([("status", ASCENDING), ("lease_expires", ASCENDING)])
+        self.collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+
+    def enqueue(self, devices):
+        """入队（已存在的任务不变），返回新入队的任务数
+
+        Args:
+            devices (list): [{'manufacture', 'model_code', ...}]
+        """
+        now = datetime.now()
+        operations = []
+        for device in devices:
+            key = task_key(device['model_code'])
+            if not key:
+                continue
+            operations.append(UpdateOne(
+                {"_id": key},
+                {"$setOnInsert": {
+                    "device": device,
+                    "status": STATUS_PENDING,
+                    "attempts": 0,
+                    "created_at": now,
+                    "updated_at": now,
+                }},
+                upsert=True
+            ))
+        if not operations:
+            return 0
+        result = self.collection.bulk_write(operations, ordered=False)
+        logger.info(f"📥 入队 {result.upserted_count} 个新任务（提交 {len(operations)} 个）")
+        return result.upserted_count
+
+    def _lease_fields(self, now):
+        return {
+            "status": STATUS_LEASED,
+            "lease_owner": self.owner,
+            "lease_expires": now + timedelta(seconds=self.lease_seconds),
+            "heartbeat_at": now,
+            "updated_at": now,
+        }
+
+    def reap_expired(self):
+        """租约过期且已用完尝试次数的任务标记为 failed"""
+        now = datetime.now()
+        result = self.collection.update_many(
+            {"status": STATUS_LEASED, "lease_expires": {"$lt": now}, "attempts": {"$gte": self.max_attempts}},
+            {"$set": {"status": STATUS_FAILED, "last_error": "租约过期", "updated_at": now},
+             "$unset": {"lease_owner": "", "lease_expires": ""}}
+        )
+        return result.modified_count
+
+    def claim(self):
+        """原子地领取一个任务：pending 的，或租约已过期的；没有可领取的任务返回 None"""
+        now = datetime.now()
+        task = self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": STATUS_PENDING},
+                    {"status": STATUS_LEASED, "lease_expires": {"$lt": now}},
+                ],
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {"$set": self._lease_fields(now), "$inc": {"attempts": 1}},
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        if task:
+            with self.held_lock:
+                self.held.add(task["_id"])
+        return task
+
+    def claim_batch(self, size):
+        """领取最多 size 个任务"""
+        self.reap_expired()
+        tasks = []
+        while len(tasks) < size:
+            task = self.claim()
+            if not task:
+                break
+            tasks.append(task)
+        return tasks
+
+    def heartbeat(self):
+        """为本节点持有的所有任务续约，返回续约的任务数"""
+        with self.held_lock:
+            held = list(self.held)
+        if not held:
+            return 0
+        now = datetime.now()
+        result = self.collection.update_many(
+            {"_id": {"$in": held}, "status": STATUS_LEASED, "lease_owner": self.owner},
+            {"$set": {"lease_expires": now + timedelta(seconds=self.lease_seconds), "heartbeat_at": now}}
+        )
+        if result.modified_count < len(held):
+            logger.warning(f"⚠️ {len(held) - result.modified_count} 个任务的租约已被其它节点接管")
+        return result.modified_count
+
+    def _release(self, task_id):
+        with self.held_lock:
+            self.held.discard(task_id)
+
+    def complete(self, task_id):
+        """标记任务完成（租约已被其它节点接管时返回 False）"""
+        self._release(task_id)
+        result = self.collection.update_one(
+            {"_id": task_id, "lease_owner": self.owner},
+            {"$set": {"status": STATUS_DONE, "updated_at": datetime.now()},
+             "$unset": {"lease_owner": "", "lease_expires": ""}}
+        )
+        return result.modified_count == 1
+
+    def fail(self, task_id, error=''):
+        """任务失败：还有尝试次数则放回 pending，否则标记 failed"""
+        self._release(task_id)
+        now = datetime.now()
+        owned = {"_id": task_id, "lease_owner": self.owner}
+        unset = {"lease_owner": "", "lease_expires": ""}
+        result = self.collection.update_one(
+            dict(owned, attempts={"$gte": self.max_attempts}),
+            {"$set": {"status": STATUS_FAILED, "last_error": error, "updated_at": now}, "$unset": unset}
+        )
+        if result.modified_count == 0:
+            self.collection.update_one(
+                owned,
+                {"$set": {"status": STATUS_PENDING, "last_error": error, "updated_at": now}, "$unset": unset}
+            )
+
+    def _heartbeat_loop(self, interval):
+        while not self.heartbeat_stop.wait(interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.warning(f"续约失败: {str(e)}")
+
+    def start_heartbeat(self, interval=None):
+        """启动后台续约线程（默认每 1/3 租约时长一次）"""
+        if self.heartbeat_thread:
+            return
+        self.heartbeat_stop.clear()
+        self.heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, args=(interval or self.lease_seconds / 3,),
+            name='work-queue-heartbeat', daemon=True
+        )
+        self.heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        if self.heartbeat_thread:
+            self.heartbeat_stop.set()
+            self.heartbeat_thread.join(timeout=5)
+            self.heartbeat_thread = None
+
+    def get_stats(self):
+        """各状态的任务数"""
+        stats = {status: 0 for status in (STATUS_PENDING, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)}
+        for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            stats[row["_id"]] = row["count"]
+        return stats
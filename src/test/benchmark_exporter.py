@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导出内存基准测试
+用内存中生成的假游标（每次迭代现造文档，不占用集合本身的内存），对比
+改造前 list(aggregate) + DataFrame.to_csv 与 DeviceExporter 流式写入的峰值内存（tracemalloc）
+
+用法:
+  python benchmark_exporter.py --sizes 10000,50000 --spec-keys Chipset,OS
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_DIR = os.path.abspath(os.path.join(TEST_DIR, '..', 'main'))
+sys.path.append(MAIN_DIR)
+
+import pandas as pd
+from device_exporter import DeviceExporter, DEFAULT_EXPORT_FIELDS
+
+
+def make_doc(i):
+    return {
+        'model_code': f'SM-A{i:06d}',
+        'device_name': f'Samsung Galaxy A{i}',
+        'manufacture': 'Samsung',
+        'announced_date': '2024, January 15',
+        'release_date': 'Released 2024, February 01',
+        'price': '€ 199.99',
+        'source_url': f'https://www.gsmarena.com/samsung_galaxy_a{i}-{i}.php',
+        'created_at': datetime(2024, 1, 1),
+        'specifications': {f'Key {k}': 'x' * 40 for k in range(40)},
+    }
+
+
+class FakeCollection:
+    """按需生成文档的集合，find / aggregate 只做投影"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def _project(self, doc, projection):
+        row = {k: v for k, v in doc.items() if projection.get(k)}
+        specs = {k.split('.', 1)[1]: doc['specifications'].get(k.split('.', 1)[1])
+                 for k in projection if k.startswith('specifications.')}
+        if specs:
+            row['specifications'] = specs
+        return row
+
+    def find(self, query, projection, batch_size=None):
+        return (self._project(make_doc(i), projection) for i in range(self.size))
+
+    def aggregate(self, pipeline):
+        projection = pipeline[0]['$project']
+        return (self._project(make_doc(i), projection) for i in range(self.size))
+
+
+def legacy_export(collection, path):
+    """改造前 view_database.export_to_csv 的做法"""
+    projection = dict({field: 1 for field in DEFAULT_EXPORT_FIELDS}, _id=0)
+    devices = list(collection.aggregate([{'$project': projection}]))
+    pd.DataFrame(devices).to_csv(path, index=False, encoding='utf-8')
+    return len(devices)
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出峰值内存对比')
+    parser.add_argument('--sizes', default='10000,50000', help='集合大小（逗号分隔）')
+    parser.add_argument('--spec-keys', default='Key 1,Key 2', help='流式导出时展开的规格键')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            collection = FakeCollection(size)
+            path = os.path.join(directory, 'export.csv')
+            results = [
+                ('list + DataFrame', lambda: legacy_export(collection, path)),
+                ('流式 CSV', lambda: DeviceExporter(collection).export(path)),
+                ('流式 CSV + 规格列', lambda: DeviceExporter(collection, spec_keys=args.spec_keys).export(path)),
+                ('流式 NDJSON', lambda: DeviceExporter(collection).export(os.path.join(directory, 'export.ndjson'))),
+            ]
+            print(f"\n集合大小 {size}:")
+            for name, func in results:
+                count, elapsed, peak = measure(func)
+                print(f"  {name:<20} {count} 行  {elapsed:6.2f} 秒  峰值 {peak:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
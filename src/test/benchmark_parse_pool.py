@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+详情页解析吞吐基准测试
+用替身服务器的 GSMArena 详情页模板生成页面，分别用线程池和进程池运行 parse_device_details，
+输出不同并发数下的 页面/秒，观察解析吞吐随核数的扩展情况（线程池受GIL限制基本不随线程数增长）
+
+用法:
+  python benchmark_parse_pool.py --pages 400 --workers 1,2,4,8
+"""
+
+import os
+import sys
+import time
+import multiprocessing
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_DIR = os.path.abspath(os.path.join(TEST_DIR, '..', 'main'))
+sys.path.append(MAIN_DIR)
+sys.path.append(TEST_DIR)
+
+from mock_site_server import RecordedPages
+from device_scraper_core import parse_device_details
+
+
+def run(executor_cls, workers, pages, **kwargs):
+    start = time.perf_counter()
+    with executor_cls(max_workers=workers, **kwargs) as executor:
+        parsed = sum(1 for info in executor.map(parse_device_details, pages, chunksize=4) if info)
+    elapsed = time.perf_counter() - start
+    return parsed, len(pages) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='详情页解析吞吐基准测试')
+    parser.add_argument('--pages', type=int, default=400, help='解析的页面数')
+    parser.add_argument('--workers', default='1,2,4,8', help='逗号分隔的并发数列表')
+    args = parser.parse_args()
+
+    recorded = RecordedPages()
+    pages = [recorded.render_gsmarena_detail(f'oppo_a{i}-{10000 + i}') for i in range(args.pages)]
+    worker_counts = [int(n) for n in args.workers.split(',') if n.strip()]
+
+    print(f"CPU核数: {os.cpu_count()}, 页面数: {len(pages)}")
+    print(f"{'并发数':>6} {'线程池 页/秒':>14} {'进程池 页/秒':>14}")
+    for workers in worker_counts:
+        _, thread_rate = run(ThreadPoolExecutor, workers, pages)
+        # 与 batch_get_device_info 一致用 spawn 启动解析进程（计入进程启动开销）
+        parsed, process_rate = run(ProcessPoolExecutor, workers, pages,
+                                   mp_context=multiprocessing.get_context('spawn'))
+        assert parsed == len(pages), f"解析失败 {len(pages) - parsed} 页"
+        print(f"{workers:>6} {thread_rate:>14.1f} {process_rate:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+价格提取基准测试
+在保存的 GSMChoice 详情页（默认 blackview_bv4900pro_soup.html）上对比
+旧的四策略提取（整页 get_text + 多个 re.findall）和 price_scanner 的单次区域扫描
+
+用法:
+  python benchmark_price_scanner.py --html ../../blackview_bv4900pro_soup.html --rounds 200
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_DIR = os.path.abspath(os.path.join(TEST_DIR, '..', 'main'))
+sys.path.append(MAIN_DIR)
+
+from bs4 import BeautifulSoup
+from price_scanner import scan_price
+
+DEFAULT_HTML = os.path.abspath(os.path.join(TEST_DIR, '..', '..', 'blackview_bv4900pro_soup.html'))
+
+
+def legacy_extract_price(soup):
+    """改造前 _extract_price_enhanced 的扫描方式（去掉日志），作为对照"""
+    amazon_buttons = soup.find_all('a', class_=re.compile(r'amazon-button'))
+    for button in amazon_buttons:
+        text = button.get_text(strip=True)
+        if any(k in text for k in ['Handyhülle', 'Schutzfolien', 'Powerbank', 'Kopfhörer', 'USB-Adapter', 'Speicherkarte']):
+            continue
+        if 'search' in button.get('href', '') and len(text) > 5:
+            match = re.search(r'(\d+[.,]\d+|\d+)\s*(€|EUR|Dollar|\$)', text)
+            if match:
+                return match.group(0)
+
+    for container in soup.find_all('div', class_=re.compile(r'price')):
+        match = re.search(r'(\d+[.,]\d+|\d+)\s*(€|EUR|Dollar|\$)', container.get_text(strip=True))
+        if match:
+            return match.group(0)
+
+    for script in soup.find_all('script'):
+        if script.string:
+            match = re.search(r'price["\']?\s*[:=]\s*["\']?(\d+[.,]\d+|\d+)\s*(€|EUR|Dollar|\$)?["\']?',
+                              script.string, re.IGNORECASE)
+            if match:
+                return f"{match.group(1)} {match.group(2) or '€'}"
+
+    all_text = soup.get_text()
+    for pattern in [r'(\d+[.,]\d+)\s*€', r'€\s*(\d+[.,]\d+)', r'(\d+[.,]\d+)\s*EUR',
+                    r'USD\s*(\d+[.,]\d+)', r'\$(\d+[.,]\d+)']:
+        for match in re.findall(pattern, all_text):
+            if 50 <= float(match.replace(',', '.')) <= 5000:
+                return f"{match} €"
+
+    return "Available on Amazon" if amazon_buttons else "Price not available"
+
+
+def timed(func, soup, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(soup)
+    return result, (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='价格提取基准测试')
+    parser.add_argument('--html', default=DEFAULT_HTML, help='详情页HTML文件')
+    parser.add_argument('--rounds', type=int, default=200, help='重复次数')
+    args = parser.parse_args()
+
+    with open(args.html, encoding='utf-8') as f:
+        html = f.read()
+
+    start = time.perf_counter()
+    soup = BeautifulSoup(html, 'html.parser')
+    parse_ms = (time.perf_counter() - start) * 1000
+
+    legacy_price, legacy_ms = timed(legacy_extract_price, soup, args.rounds)
+    (price, tier), scan_ms = timed(scan_price, soup, args.rounds)
+
+    print(f"页面: {os.path.basename(args.html)} ({len(html) / 1024:.0f} KB), 解析 {parse_ms:.1f} ms")
+    print(f"旧提取:   {legacy_ms:.2f} ms/页 -> {legacy_price}")
+    print(f"区域扫描: {scan_ms:.2f} ms/页 -> {price} (来源: {tier})")
+    print(f"加速: {legacy_ms / scan_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
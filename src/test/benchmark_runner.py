@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线端到端压测脚本
+在本地替身服务器上驱动 DeviceInfoScraper / EnhancedGSMChoiceScraper / HybridDeviceScraper，
+输出 设备数/分钟、CPU 时间 和 峰值RSS
+
+用法:
+  python benchmark_runner.py --scraper all --devices 50 --latency-ms 200 --error-rate 0.05
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import resource
+import subprocess
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_DIR = os.path.abspath(os.path.join(TEST_DIR, '..', 'main'))
+sys.path.append(MAIN_DIR)
+sys.path.append(TEST_DIR)
+
+from mock_site_server import MockSiteServer, MockSiteConfig
+
+SCRAPERS = ['core', 'gsmchoice', 'hybrid']
+
+
+def load_model_codes(limit):
+    """从 model_codes.csv 读取压测用的型号列表"""
+    codes = []
+    with open(os.path.join(MAIN_DIR, 'model_codes.csv'), encoding='utf-8') as f:
+        next(f, None)
+        for line in f:
+            code = line.strip()
+            if code:
+                codes.append(code)
+    while len(codes) < limit:
+        codes = codes + codes
+    return codes[:limit]
+
+
+def peak_rss_mb():
+    """当前进程（及已退出子进程）的峰值RSS，单位MB"""
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux 单位是KB，macOS 单位是字节
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return self_rss / divisor, child_rss / divisor
+
+
+def cpu_seconds():
+    """本进程和子进程（WebDriver）累计的CPU时间"""
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (usage_self.ru_utime + usage_self.ru_stime,
+            usage_children.ru_utime + usage_children.ru_stime)
+
+
+def run_core(base_url, codes, workers):
+    """DeviceInfoScraper：批量并行"""
+    from device_scraper_core import DeviceInfoScraper
+
+    scraper = DeviceInfoScraper(max_workers=workers, timeout=30, request_delay=0)
+    scraper.base_url = base_url
+    try:
+        devices = [{'manufacture': 'Benchmark', 'model_code': code} for code in codes]
+        results, failed = scraper.batch_get_device_info(devices)
+        return len(results), len(failed)
+    finally:
+        scraper.close()
+
+
+def run_gsmchoice(base_url, codes, workers):
+    """EnhancedGSMChoiceScraper：单线程顺序"""
+    from gsmchoice_scraper import EnhancedGSMChoiceScraper
+
+    scraper = EnhancedGSMChoiceScraper(request_delay=0, use_selenium=True)
+    scraper.base_url = base_url
+    scraper.search_api = f"{base_url}/js/searchy.xhtml"
+    success, failed = 0, 0
+    try:
+        for code in codes:
+            result = scraper.get_device_info('Blackview', code)
+            if result['success']:
+                success += 1
+            else:
+                failed += 1
+        return success, failed
+    finally:
+        scraper.close()
+
+
+def run_hybrid(base_url, codes, workers):
+    """HybridDeviceScraper：名称发现 → GSMArena搜索 → 详情提取（不写库）"""
+    from hybrid_device_scraper import HybridDeviceScraper
+
+    scraper = HybridDeviceScraper(request_delay=0)
+    scraper.gsmchoice_base = base_url
+    scraper.gsmchoice_search_api = f"{base_url}/js/searchy.xhtml"
+    scraper.gsmarena_base = base_url
+    success, failed = 0, 0
+    try:
+        for code in codes:
+            device_name = scraper.get_device_name_from_gsmchoice('Blackview', code)
+            url = scraper.search_gsmarena_by_name(device_name, 'Blackview') if device_name else None
+            details = scraper.extract_gsmarena_details(url) if url else None
+            if details:
+                success += 1
+            else:
+                failed += 1
+        return success, failed
+    finally:
+        scraper.close()
+
+
+RUNNERS = {
+    'core': run_core,
+    'gsmchoice': run_gsmchoice,
+    'hybrid': run_hybrid,
+}
+
+
+def run_single(args):
+    """在当前进程中压测单个爬虫，返回结果字典"""
+    config = MockSiteConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed
+    )
+    server = MockSiteServer(port=0, config=config).start()
+    codes = load_model_codes(args.devices)
+
+    # 在临时目录中运行，避免爬虫的调试文件污染工作目录
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    old_cwd = os.getcwd()
+    os.chdir(work_dir)
+
+    cpu_self_start, cpu_children_start = cpu_seconds()
+    start_time = time.time()
+    try:
+        success, failed = RUNNERS[args.scraper](server.url, codes, args.workers)
+    finally:
+        elapsed = time.time() - start_time
+        os.chdir(old_cwd)
+        server.stop()
+    cpu_self_end, cpu_children_end = cpu_seconds()
+    rss_self, rss_children = peak_rss_mb()
+
+    return {
+        'scraper': args.scraper,
+        'devices': len(codes),
+        'success': success,
+        'failed': failed,
+        'elapsed_seconds': round(elapsed, 2),
+        'devices_per_minute': round(len(codes) / elapsed * 60, 1) if elapsed > 0 else 0,
+        'cpu_seconds': round(cpu_self_end - cpu_self_start, 2),
+        'cpu_seconds_children': round(cpu_children_end - cpu_children_start, 2),
+        'peak_rss_mb': round(rss_self, 1),
+        'peak_rss_children_mb': round(rss_children, 1),
+        'server_requests': server.snapshot(),
+    }
+
+
+def print_report(results):
+    """打印压测结果表"""
+    print("\n" + "=" * 90)
+    print("📊 压测结果")
+    print("=" * 90)
+    print(f"{'爬虫':<12}{'设备数':>8}{'成功':>8}{'失败':>8}{'耗时(s)':>10}{'设备/分钟':>12}{'CPU(s)':>10}{'峰值RSS(MB)':>14}")
+    for r in results:
+        cpu_total = r['cpu_seconds'] + r['cpu_seconds_children']
+        print(f"{r['scraper']:<12}{r['devices']:>8}{r['success']:>8}{r['failed']:>8}"
+              f"{r['elapsed_seconds']:>10}{r['devices_per_minute']:>12}{cpu_total:>10.2f}{r['peak_rss_mb']:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫离线压测')
+    parser.add_argument('--scraper', choices=SCRAPERS + ['all'], default='all')
+    parser.add_argument('--devices', type=int, default=20, help='压测设备数')
+    parser.add_argument('--workers', type=int, default=5, help='DeviceInfoScraper 线程数')
+    parser.add_argument('--latency-ms', type=int, default=100)
+    parser.add_argument('--jitter-ms', type=int, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='只输出JSON（供子进程汇总）')
+    args = parser.parse_args()
+
+    if args.scraper != 'all':
+        result = run_single(args)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_report([result])
+        return
+
+    # 每个爬虫在独立子进程中运行，保证峰值RSS互不干扰
+    results = []
+    for name in SCRAPERS:
+        print(f"🚀 压测 {name} ...")
+        cmd = [sys.executable, os.path.abspath(__file__), '--scraper', name, '--json',
+               '--devices', str(args.devices), '--workers', str(args.workers),
+               '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+               '--error-rate', str(args.error_rate), '--seed', str(args.seed)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [line for line in proc.stdout.strip().split('\n') if line.startswith('{')]
+        if proc.returncode != 0 or not lines:
+            error_lines = proc.stderr.strip().splitlines()
+            print(f"❌ {name} 压测失败: {error_lines[-1] if error_lines else proc.returncode}")
+            continue
+        results.append(json.loads(lines[-1]))
+
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
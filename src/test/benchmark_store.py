@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储后端基准测试
+对比 MongoDB 与内嵌 SQLite（WAL）两个后端的批量写入和按型号查询吞吐:
+  bulk_upsert   每批 batch 个文档，共 N 个（新文档），再整体覆盖写一遍（已有文档）
+  find_device   随机型号的单点查询（含轻量投影），以及走反向索引的兄弟型号查询
+  stats         统计接口
+MongoDB 连接不上时只测 SQLite。MongoDB 使用临时库 device_store_benchmark，测完删除。
+
+用法:
+  python benchmark_store.py --devices 20000 --lookups 5000
+  python benchmark_store.py --mongo-uri mongodb://localhost:27017/ --sqlite /tmp/devices_bench.db
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_DIR = os.path.abspath(os.path.join(TEST_DIR, '..', 'main'))
+sys.path.append(MAIN_DIR)
+
+from pymongo import MongoClient
+from device_store import MongoDeviceStore, SQLiteDeviceStore
+from device_query import lookup_projection
+
+BENCHMARK_DB = 'device_store_benchmark'
+
+
+def make_doc(i):
+    code = f'SM-B{i:06d}'
+    return {
+        'model_code': code,
+        'model_codes': [code, f'{code}/DS'],
+        'device_name': f'Samsung Galaxy B{i}',
+        'manufacture': random.choice(['Samsung', 'Xiaomi', 'Apple', 'Oppo']),
+        'announced_date': '2024, January 15' if i % 3 else '',
+        'release_date': 'Released 2024, February 01',
+        'price': '€ 199.99' if i % 2 else '',
+        'source_url': f'https://www.gsmarena.com/samsung_galaxy_b{i}-{i}.php',
+        'created_at': datetime(2024, 1, 1),
+        'updated_at': datetime(2024, 1, 1),
+        'specifications': {f'Key {k}': 'x' * 40 for k in range(40)},
+    }
+
+
+def timed(count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    return count / elapsed if elapsed else float('inf')
+
+
+def run(name, store, devices, lookups, batch):
+    store.ensure_indexes()
+    docs = [make_doc(i) for i in range(devices)]
+
+    def bulk_write():
+        for start in range(0, len(docs), batch):
+            store.bulk_upsert(docs[start:start + batch])
+
+    insert_rate = timed(devices, bulk_write)
+    update_rate = timed(devices, bulk_write)
+
+    codes = [random.randrange(devices) for _ in range(lookups)]
+    projection = lookup_projection(None)
+    exact_rate = timed(lookups, lambda: [store.find_device(f'SM-B{i:06d}', projection) for i in codes])
+    sibling_rate = timed(lookups, lambda: [store.find_device(f'SM-B{i:06d}/DS', projection) for i in codes])
+    stats_rate = timed(200, lambda: [store.stats() for _ in range(200)])
+
+    print(f"\n{name}:")
+    print(f"  bulk_upsert 新文档   {insert_rate:10.0f} 文档/秒")
+    print(f"  bulk_upsert 覆盖     {update_rate:10.0f} 文档/秒")
+    print(f"  find_device 精确     {exact_rate:10.0f} 次/秒")
+    print(f"  find_device 兄弟型号 {sibling_rate:10.0f} 次/秒")
+    print(f"  stats                {stats_rate:10.0f} 次/秒  （{store.stats()['total_devices']} 台）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='存储后端吞吐对比')
+    parser.add_argument('--devices', type=int, default=20000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=500, help='bulk_upsert 每批文档数')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--sqlite', help='SQLite 文件（默认临时目录）')
+    args = parser.parse_args()
+
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.sqlite or os.path.join(directory, 'devices.db')
+        if os.path.exists(path):
+            os.remove(path)
+        store = SQLiteDeviceStore(path)
+        try:
+            run(f'SQLite（WAL，{path}）', store, args.devices, args.lookups, args.batch)
+        finally:
+            store.close()
+
+    try:
+        MongoClient(args.mongo_uri, serverSelectionTimeoutMS=2000).admin.command('ping')
+    except Exception as e:
+        print(f"\nMongoDB 不可用，跳过: {e.__class__.__name__}")
+        return
+
+    store = MongoDeviceStore(args.mongo_uri, BENCHMARK_DB)
+    try:
+        store.client.drop_database(BENCHMARK_DB)
+        run(f'MongoDB（{args.mongo_uri}）', store, args.devices, args.lookups, args.batch)
+    finally:
+        store.client.drop_database(BENCHMARK_DB)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
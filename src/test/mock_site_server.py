@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GSMArena / GSMChoice 本地替身服务器
+用录制的页面模拟线上站点，支持可配置的延迟和错误注入，用于离线压测爬虫
+
+路由:
+  /res.php3?sSearch=...              GSMArena 加密搜索页（test.html）
+  /js/decrypt.js                     本地版解密脚本（WebCrypto AES-CBC）
+  /<slug>.php                        GSMArena 详情页（fixtures/gsmarena_detail_template.html）
+  /js/searchy.xhtml?search=...       GSMChoice 搜索 JSON
+  /en/search/?sSearch4=...           GSMChoice 网页搜索结果
+  /en/catalogue/<sbrand>/<smodel>/   GSMChoice 详情页（blackview_bv4900pro_soup.html）
+  /__stats                           替身服务器自身的请求统计
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from string import Template
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(TEST_DIR, '..', '..'))
+FIXTURES_DIR = os.path.join(TEST_DIR, 'fixtures')
+
+# 与线上decrypt.js行为一致：KEY/IV/DATA均为base64，AES-CBC + PKCS7
+DECRYPT_JS = """
+function decryptData(iv, key, data, onSuccess, onError) {
+    const b64 = (s) => Uint8Array.from(atob(s), (c) => c.charCodeAt(0));
+    crypto.subtle.importKey('raw', b64(key), {name: 'AES-CBC'}, false, ['decrypt'])
+        .then((k) => crypto.subtle.decrypt({name: 'AES-CBC', iv: b64(iv)}, k, b64(data)))
+        .then((buf) => onSuccess(new TextDecoder().decode(buf)))
+        .catch(onError);
+}
+"""
+
+GSMCHOICE_SEARCH_TEMPLATE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"/><title>Search - GSMChoice.com</title></head>
+<body>
+<div class="search-results">
+<a href="/en/catalogue/blackview/bv4900pro/">Blackview BV4900 Pro</a>
+</div>
+</body></html>
+"""
+
+
+class MockSiteConfig:
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=503, seed=None):
+        """替身服务器配置
+
+        Args:
+            latency_ms (int): 每个响应的固定延迟（毫秒）
+            jitter_ms (int): 在固定延迟基础上叠加的随机抖动上限（毫秒）
+            error_rate (float): 注入错误响应的概率（0-1）
+            error_status (int): 注入错误时返回的HTTP状态码
+            seed (int): 随机种子，便于复现
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def next_delay(self):
+        """计算本次响应的延迟（秒）"""
+        with self.random_lock:
+            jitter = self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self):
+        """判断本次响应是否注入错误"""
+        if self.error_rate <= 0:
+            return False
+        with self.random_lock:
+            return self.random.random() < self.error_rate
+
+
+class RecordedPages:
+    def __init__(self):
+        """加载录制页面"""
+        with open(os.path.join(REPO_ROOT, 'test.html'), encoding='utf-8') as f:
+            search_page = f.read()
+        with open(os.path.join(REPO_ROOT, 'blackview_bv4900pro_soup.html'), encoding='utf-8') as f:
+            self.gsmchoice_detail = f.read().encode('utf-8')
+        with open(os.path.join(FIXTURES_DIR, 'gsmarena_detail_template.html'), encoding='utf-8') as f:
+            self.gsmarena_detail = Template(f.read())
+
+        # 去掉外部脚本和样式，离线时浏览器不会卡在第三方资源上；解密脚本换成本地版本
+        search_page = re.sub(r'<script[^>]*\ssrc="https?://[^"]*"[^>]*>\s*</script>', '', search_page)
+        search_page = re.sub(r'<link[^>]*\shref="https?://[^"]*"[^>]*/?>', '', search_page)
+        search_page = search_page.replace(
+            '<script>\n    window.addEventListener("DOMContentLoaded"',
+            '<script src="/js/decrypt.js" type="text/javascript"></script>\n'
+            '<script>\n    window.addEventListener("DOMContentLoaded"',
+            1
+        )
+        self.gsmarena_search = search_page.encode('utf-8')
+
+    def render_gsmarena_detail(self, slug):
+        """根据URL slug渲染GSMArena详情页"""
+        name_part = re.sub(r'-\d+$', '', slug)
+        name = ' '.join(word.capitalize() if not word.startswith('(') else word
+                        for word in name_part.split('_'))
+        seed = sum(ord(c) for c in slug)
+        html = self.gsmarena_detail.substitute(
+            name=name,
+            announced=f"{2015 + seed % 10}, September {1 + seed % 28}. Released {2015 + seed % 10}, October",
+            status=f"Available. Released {2015 + seed % 10}, October",
+            models=f"CPH{1900 + seed % 100}, CPH{2000 + seed % 100}",
+            price=f"About {100 + seed % 400} EUR",
+        )
+        return html.encode('utf-8')
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        """静默访问日志，避免压测时刷屏"""
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        path = parsed.path
+        query = parse_qs(parsed.query)
+
+        route, content_type, body = self._route(path, query)
+        server.count(route)
+
+        delay = server.config.next_delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        if route != '__stats' and server.config.should_fail():
+            server.count('injected_error')
+            self._send(server.config.error_status, 'text/plain; charset=utf-8', b'injected error')
+            return
+
+        if body is None:
+            self._send(404, 'text/plain; charset=utf-8', b'not found')
+            return
+
+        self._send(200, content_type, body)
+
+    def _route(self, path, query):
+        """返回 (路由名, Content-Type, 响应体)"""
+        pages = self.server.pages
+
+        if path == '/res.php3':
+            return 'gsmarena_search', 'text/html; charset=utf-8', pages.gsmarena_search
+        if path == '/js/decrypt.js':
+            return 'decrypt_js', 'application/javascript', DECRYPT_JS.encode('utf-8')
+        if path == '/js/searchy.xhtml':
+            search = query.get('search', [''])[0]
+            results = [{
+                'brand': 'Blackview',
+                'model': 'BV4900 Pro',
+                'sbrand': 'blackview',
+                'smodel': 'bv4900pro',
+                'query': search
+            }]
+            return 'gsmchoice_api', 'application/json', json.dumps(results).encode('utf-8')
+        if path.startswith('/en/search'):
+            return 'gsmchoice_search', 'text/html; charset=utf-8', GSMCHOICE_SEARCH_TEMPLATE.encode('utf-8')
+        if path.startswith('/en/catalogue/'):
+            return 'gsmchoice_detail', 'text/html; charset=utf-8', pages.gsmchoice_detail
+        if path == '/__stats':
+            return '__stats', 'application/json', json.dumps(self.server.snapshot()).encode('utf-8')
+        if path.endswith('.php'):
+            slug = path.lstrip('/')[:-len('.php')]
+            return 'gsmarena_detail', 'text/html; charset=utf-8', pages.render_gsmarena_detail(slug)
+        return 'not_found', None, None
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockSiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        """初始化替身服务器（port=0 表示自动分配端口）"""
+        super().__init__((host, port), MockSiteHandler)
+        self.config = config or MockSiteConfig()
+        self.pages = RecordedPages()
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, route):
+        with self.counters_lock:
+            self.counters[route] = self.counters.get(route, 0) + 1
+
+    def snapshot(self):
+        with self.counters_lock:
+            return dict(self.counters)
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GSMArena/GSMChoice 本地替身服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=int, default=0, help='固定响应延迟（毫秒）')
+    parser.add_argument('--jitter-ms', type=int, default=0, help='随机抖动上限（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='错误注入概率（0-1）')
+    parser.add_argument('--error-status', type=int, default=503, help='注入错误的状态码')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    config = MockSiteConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+    server = MockSiteServer(args.host, args.port, config)
+
+    print(f"🧪 替身服务器已启动: {server.url}")
+    print(f"   延迟: {args.latency_ms}ms (+0~{args.jitter_ms}ms) | 错误率: {args.error_rate:.0%} ({args.error_status})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())